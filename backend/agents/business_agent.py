@@ -1,4 +1,4 @@
-\"\"\"
+"""
 Business Agent - Enterprise Photo Booth Assistant
 
 Dedicated to business tier users, focusing on:
@@ -6,11 +6,11 @@ Dedicated to business tier users, focusing on:
 - Organization & Staff management
 - Advanced analytics & business metrics
 - Enterprise-grade troubleshooting
-\"\"\"
+"""
 
 import os
 import json
-from typing import Optional
+from typing import AsyncIterator, Optional
 from dataclasses import dataclass
 from pathlib import Path
 
@@ -20,6 +20,9 @@ env_path = Path(__file__).parent.parent / '.env'
 if env_path.exists():
     load_dotenv(env_path)
 
+from services.chat_history import chat_history, to_model_messages
+from services.llm_clients import llm_clients, OPENAI
+
 # Configuration
 AKITO_MODEL = os.getenv("AKITO_MODEL", "openai:gpt-4o-mini")
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
@@ -38,7 +41,7 @@ except ImportError:
 
 @dataclass
 class BusinessContext:
-    \"\"\"Context passed to Business Assist for each interaction\"\"\"
+    """Context passed to Business Assist for each interaction"""
     user_id: Optional[str] = None
     user_role: Optional[str] = None
     current_page: Optional[str] = None
@@ -47,7 +50,7 @@ class BusinessContext:
 
 # ===== System Prompt =====
 
-BUSINESS_SYSTEM_PROMPT = \"\"\"You are Business Assist, the specialized AI partner for PictureMe.Now Enterprise and Business clients.
+BUSINESS_SYSTEM_PROMPT = """You are Business Assist, the specialized AI partner for PictureMe.Now Enterprise and Business clients.
 
 Your personality:
 - Highly professional, efficient, and operationally focused
@@ -100,7 +103,7 @@ Use these when relevant to help business users:
 - Format: [[analytics_summary:recent]] - used to suggest they check their metrics.
 
 Always prioritize operational efficiency and help the user manage their business smoothly!
-\"\"\"
+"""
 
 
 # ===== Pydantic AI Agent =====
@@ -109,14 +112,14 @@ business_agent = None
 
 if PYDANTIC_AI_AVAILABLE:
     business_agent = Agent(
-        AKITO_MODEL,
+        llm_clients.agent_model(AKITO_MODEL),
         deps_type=BusinessContext,
         instructions=BUSINESS_SYSTEM_PROMPT,
     )
     
     @business_agent.tool
     async def get_business_navigation(ctx: RunContext[BusinessContext], intent: str) -> str:
-        \"\"\"Get the navigation path for business operations.\"\"\"
+        """Get the navigation path for business operations."""
         navigation_map = {
             "organization": "/admin/organization",
             "staff": "/admin/organization",
@@ -134,31 +137,32 @@ if PYDANTIC_AI_AVAILABLE:
         for key, path in navigation_map.items():
             if key in intent_lower:
                 return f"Path for {key}: {path}"
-        return \"Available business sections: organization, analytics, business settings, events.\"
+        return "Available business sections: organization, analytics, business settings, events."
 
 
 # ===== Direct API Calls (Fallback) =====
 
+def _openai_payload(messages: list) -> dict:
+    model = AKITO_MODEL.replace("openai:", "") if "openai:" in AKITO_MODEL else "gpt-4o-mini"
+    return {"model": model, "messages": messages, "temperature": 0.5}
+
+
 async def _call_llm(messages: list) -> str:
-    \"\"\"Call LLM API directly\"\"\"
-    import httpx
-    
+    """Call LLM API directly"""
     if OPENAI_API_KEY:
-        model = AKITO_MODEL.replace(\"openai:\", \"\") if \"openai:\" in AKITO_MODEL else \"gpt-4o-mini\"
-        url = \"https://api.openai.com/v1/chat/completions\"
-        headers = {\"Authorization\": f\"Bearer {OPENAI_API_KEY}\", \"Content-Type\": \"application/json\"}
-        payload = {\"model\": model, \"messages\": messages, \"temperature\": 0.5}
+        url = "/v1/chat/completions"
+        headers = {"Authorization": f"Bearer {OPENAI_API_KEY}", "Content-Type": "application/json"}
+        payload = _openai_payload(messages)
     elif GOOGLE_API_KEY:
         # Simplified Gemini fallback (contents format required)
-        return \"Gemini fallback not implemented in this draft for brevity\"
+        return "Gemini fallback not implemented in this draft for brevity"
     else:
-        return \"No API key available for Business Assist.\"
+        return "No API key available for Business Assist."
 
-    async with httpx.AsyncClient() as client:
-        response = await client.post(url, headers=headers, json=payload, timeout=30.0)
-        response.raise_for_status()
-        data = response.json()
-        return data[\"choices\"][0][\"message\"][\"content\"]
+    response = await llm_clients.client(OPENAI).post(url, headers=headers, json=payload)
+    response.raise_for_status()
+    data = response.json()
+    return data["choices"][0]["message"]["content"]
 
 
 # ===== Main Chat Function =====
@@ -171,15 +175,16 @@ async def chat_with_business_agent(
     user_name: Optional[str] = None,
     message_history: list = None
 ) -> str:
-    \"\"\"
+    """
     Send a message to Business Assist and get a response.
-    \"\"\"
+    """
     context = BusinessContext(
         user_id=user_id,
         user_role=user_role,
         current_page=current_page,
         user_name=user_name
     )
+    history = (await chat_history.compact(message_history)).messages
     
     # Use Pydantic AI if available
     if PYDANTIC_AI_AVAILABLE and business_agent:
@@ -187,20 +192,80 @@ async def chat_with_business_agent(
             result = await business_agent.run(
                 message,
                 deps=context,
-                message_history=message_history or []
+                message_history=to_model_messages(history)
             )
             return result.output
         except Exception as e:
-            print(f\"❌ Business Agent error, falling back to direct API: {e}\")
+            print(f"❌ Business Agent error, falling back to direct API: {e}")
     
     # Fallback to direct API calls
-    messages = [{\"role\": \"system\", \"content\": BUSINESS_SYSTEM_PROMPT}]
-    if message_history:
-        messages.extend(message_history)
-    messages.append({\"role\": \"user\", \"content\": message})
+    messages = _fallback_messages(message, history)
     
     try:
         return await _call_llm(messages)
     except Exception as e:
-        print(f\"❌ Business Assist API error: {e}\")
-        return f\"Sorry, I encountered an operational error. Please try again or contact support.\"
+        print(f"❌ Business Assist API error: {e}")
+        return f"Sorry, I encountered an operational error. Please try again or contact support."
+
+
+async def stream_with_business_agent(
+    message: str,
+    user_id: Optional[str] = None,
+    user_role: Optional[str] = None,
+    current_page: Optional[str] = None,
+    user_name: Optional[str] = None,
+    message_history: list = None
+) -> AsyncIterator[str]:
+    """
+    Like chat_with_business_agent, but yields the answer as text deltas.
+    """
+    context = BusinessContext(
+        user_id=user_id,
+        user_role=user_role,
+        current_page=current_page,
+        user_name=user_name
+    )
+    history = (await chat_history.compact(message_history)).messages
+    
+    if PYDANTIC_AI_AVAILABLE and business_agent:
+        streamed = False
+        try:
+            async with business_agent.run_stream(
+                message,
+                deps=context,
+                message_history=to_model_messages(history)
+            ) as result:
+                async for delta in result.stream_text(delta=True, debounce_by=None):
+                    streamed = True
+                    yield delta
+            return
+        except Exception as e:
+            if streamed:
+                raise
+            print(f"❌ Business Agent stream error, falling back to direct API: {e}")
+    
+    if not OPENAI_API_KEY:
+        # Same answers as the blocking fallback, sent as one chunk
+        yield await _call_llm(_fallback_messages(message, history))
+        return
+    
+    streamed = False
+    try:
+        async for delta in llm_clients.stream_openai_chat(
+            _openai_payload(_fallback_messages(message, history)), OPENAI_API_KEY
+        ):
+            streamed = True
+            yield delta
+    except Exception as e:
+        if streamed:
+            raise
+        print(f"❌ Business Assist streaming API error: {e}")
+        yield "Sorry, I encountered an operational error. Please try again or contact support."
+
+
+def _fallback_messages(message: str, message_history: Optional[list]) -> list:
+    messages = [{"role": "system", "content": BUSINESS_SYSTEM_PROMPT}]
+    if message_history:
+        messages.extend(message_history)
+    messages.append({"role": "user", "content": message})
+    return messages
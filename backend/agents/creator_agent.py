@@ -6,13 +6,13 @@ The Creator Agent is an intelligent partner that helps users:
 - Generate stunning images and videos all in one chat
 - Understand platform models and token capabilities
 - Access creations seamlessly via the user's Gallery
-"""
+
 Supports both Pydantic AI v1.0+ and fallback to direct API calls.
 """
 
 import os
 import json
-from typing import Optional
+from typing import AsyncIterator, Optional
 from dataclasses import dataclass
 from pathlib import Path
 
@@ -22,10 +22,18 @@ env_path = Path(__file__).parent.parent / '.env'
 if env_path.exists():
     load_dotenv(env_path)
 
+from services.chat_history import chat_history, to_model_messages
+from services.llm_clients import llm_clients, OPENAI, GOOGLE
+
 # Configuration
 AKITO_MODEL = os.getenv("AKITO_MODEL", "openai:gpt-4o-mini")
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
+GEMINI_MODEL = "gemini-2.0-flash"
+
+# Replies sent when no model answered (never worth caching)
+NO_MODEL_REPLY = "Lo siento, no tengo acceso a un modelo de AI. Por favor configura OPENAI_API_KEY o GOOGLE_API_KEY."
+ERROR_REPLY = "Lo siento, hubo un error. Por favor intenta de nuevo."
 
 # Try to import pydantic-ai, fallback to direct API calls
 PYDANTIC_AI_AVAILABLE = False
@@ -128,7 +136,7 @@ creator_agent = None
 
 if PYDANTIC_AI_AVAILABLE:
     creator_agent = Agent(
-        AKITO_MODEL,
+        llm_clients.agent_model(AKITO_MODEL),
         deps_type=AssistantContext,
         instructions=ASSISTANT_SYSTEM_PROMPT,
     )
@@ -174,10 +182,10 @@ def _get_token_costs() -> str:
 
 def _get_plan_info(plan_name: Optional[str] = None) -> str:
     plans = {
-        "free": "**Free** - Basic access\\n- Test our models, limited monthly use.",
-        "spark": "**Spark** - $9/month\\n- 50 tokens/month\\n- Base Models (Nano)\\n- Standard Speed\\n- Personal License",
-        "vibe": "**Vibe** - $19/month\\n- 100 tokens/month\\n- Custom Backgrounds\\n- Priority Generation\\n- No Watermark\\n- Commercial License",
-        "studio": "**Studio** - $39/month\\n- 200 tokens/month\\n- Faceswap Models\\n- Template Selling\\n- API Access\\n- Priority Support",
+        "free": "**Free** - Basic access\n- Test our models, limited monthly use.",
+        "spark": "**Spark** - $9/month\n- 50 tokens/month\n- Base Models (Nano)\n- Standard Speed\n- Personal License",
+        "vibe": "**Vibe** - $19/month\n- 100 tokens/month\n- Custom Backgrounds\n- Priority Generation\n- No Watermark\n- Commercial License",
+        "studio": "**Studio** - $39/month\n- 200 tokens/month\n- Faceswap Models\n- Template Selling\n- API Access\n- Priority Support",
     }
     
     if plan_name:
@@ -185,7 +193,7 @@ def _get_plan_info(plan_name: Optional[str] = None) -> str:
             if key in plan_name.lower():
                 return info
     
-    return "**Individual Plans:**\\n\\n" + "\\n\\n".join(plans.values())
+    return "**Individual Plans:**\n\n" + "\n\n".join(plans.values())
 
 
 def _enhance_prompt(current_prompt: str, style: Optional[str] = None) -> str:
@@ -205,7 +213,7 @@ def _enhance_prompt(current_prompt: str, style: Optional[str] = None) -> str:
     if style and style.lower() in style_additions:
         enhanced += style_additions[style.lower()]
     
-    return f"Enhanced prompt: \\\"{enhanced}\\\""
+    return f"Enhanced prompt: \"{enhanced}\""
 
 
 def _get_context_instructions(ctx: AssistantContext) -> str:
@@ -245,53 +253,29 @@ The user is NOT logged in or is on the public landing page.
     if ctx.current_page:
         instructions.append(f"Current page: {ctx.current_page}")
     
-    return "\\n".join(instructions)
+    return "\n".join(instructions)
 
 
 # ===== Direct API Calls (Fallback) =====
 
-async def _call_openai(messages: list) -> str:
-    \"\"\"Call OpenAI API directly\"\"\"
-    import httpx
-    
-    if not OPENAI_API_KEY:
-        raise ValueError("OPENAI_API_KEY not set")
-    
+def _openai_payload(messages: list) -> dict:
     model = AKITO_MODEL.replace("openai:", "") if "openai:" in AKITO_MODEL else "gpt-4o-mini"
-    
-    async with httpx.AsyncClient() as client:
-        response = await client.post(
-            "https://api.openai.com/v1/chat/completions",
-            headers={
-                "Authorization": f"Bearer {OPENAI_API_KEY}",
-                "Content-Type": "application/json"
-            },
-            json={
-                "model": model,
-                "messages": messages,
-                "temperature": 0.7,
-                "max_tokens": 1000
-            },
-            timeout=30.0
-        )
-        response.raise_for_status()
-        data = response.json()
-        return data["choices"][0]["message"]["content"]
+    return {
+        "model": model,
+        "messages": messages,
+        "temperature": 0.7,
+        "max_tokens": 1000
+    }
 
 
-async def _call_google(messages: list) -> str:
-    \"\"\"Call Google Gemini API directly\"\"\"
-    import httpx
-    
-    if not GOOGLE_API_KEY:
-        raise ValueError("GOOGLE_API_KEY not set")
-    
+def _gemini_payload(messages: list) -> dict:
     # Convert messages to Gemini format
     contents = []
     system_msg = None
     for msg in messages:
         if msg["role"] == "system":
-            system_msg = msg["content"]
+            # The system prompt, then the history summary if there is one
+            system_msg = f"{system_msg}\n\n{msg['content']}" if system_msg else msg["content"]
             continue
         role = "user" if msg["role"] == "user" else "model"
         contents.append({
@@ -300,22 +284,46 @@ async def _call_google(messages: list) -> str:
         })
     
     if system_msg and contents:
-        contents[0]["parts"][0]["text"] = f"{system_msg}\\n\\nUser: {contents[0]['parts'][0]['text']}"
+        contents[0]["parts"][0]["text"] = f"{system_msg}\n\nUser: {contents[0]['parts'][0]['text']}"
+    
+    return {
+        "contents": contents,
+        "generationConfig": {"temperature": 0.7, "maxOutputTokens": 1000}
+    }
+
+
+async def _call_openai(messages: list) -> str:
+    """Call OpenAI API directly"""
+    if not OPENAI_API_KEY:
+        raise ValueError("OPENAI_API_KEY not set")
+    
+    response = await llm_clients.client(OPENAI).post(
+        "/v1/chat/completions",
+        headers={
+            "Authorization": f"Bearer {OPENAI_API_KEY}",
+            "Content-Type": "application/json"
+        },
+        json=_openai_payload(messages)
+    )
+    response.raise_for_status()
+    data = response.json()
+    return data["choices"][0]["message"]["content"]
+
+
+async def _call_google(messages: list) -> str:
+    """Call Google Gemini API directly"""
+    if not GOOGLE_API_KEY:
+        raise ValueError("GOOGLE_API_KEY not set")
     
-    async with httpx.AsyncClient() as client:
-        response = await client.post(
-            "https://generativelanguage.googleapis.com/v1beta/models/gemini-2.0-flash:generateContent",
-            headers={"Content-Type": "application/json"},
-            params={"key": GOOGLE_API_KEY},
-            json={
-                "contents": contents,
-                "generationConfig": {"temperature": 0.7, "maxOutputTokens": 1000}
-            },
-            timeout=30.0
-        )
-        response.raise_for_status()
-        data = response.json()
-        return data["candidates"][0]["content"]["parts"][0]["text"]
+    response = await llm_clients.client(GOOGLE).post(
+        f"/v1beta/models/{GEMINI_MODEL}:generateContent",
+        headers={"Content-Type": "application/json"},
+        params={"key": GOOGLE_API_KEY},
+        json=_gemini_payload(messages)
+    )
+    response.raise_for_status()
+    data = response.json()
+    return data["candidates"][0]["content"]["parts"][0]["text"]
 
 
 # ===== Main Chat Function =====
@@ -329,20 +337,11 @@ async def chat_with_creator_agent(
     message_history: list = None,
     is_authenticated: bool = False
 ) -> str:
-    \"\"\"
+    """
     Send a message to Assistant and get a response.
-    \"\"\"
-    # Override authentication based on explicit flag
-    effective_user_id = user_id if is_authenticated else None
-    effective_user_role = user_role if is_authenticated else "guest"
-    effective_user_name = user_name if is_authenticated else None
-    
-    context = AssistantContext(
-        user_id=effective_user_id,
-        user_role=effective_user_role,
-        current_page=current_page,
-        user_name=effective_user_name
-    )
+    """
+    context = _build_context(user_id, user_role, current_page, user_name, is_authenticated)
+    history = (await chat_history.compact(message_history)).messages
     
     # Use Pydantic AI if available
     if PYDANTIC_AI_AVAILABLE and creator_agent:
@@ -350,25 +349,14 @@ async def chat_with_creator_agent(
             result = await creator_agent.run(
                 message,
                 deps=context,
-                message_history=message_history or []
+                message_history=to_model_messages(history)
             )
             return result.output
         except Exception as e:
             print(f"❌ Pydantic AI error, falling back to direct API: {e}")
     
     # Fallback to direct API calls
-    system_prompt = ASSISTANT_SYSTEM_PROMPT + "\\n\\n" + _get_context_instructions(context)
-    
-    messages = [{"role": "system", "content": system_prompt}]
-    
-    if message_history:
-        for msg in message_history:
-            role = msg.get("role", "user")
-            content = msg.get("content", "")
-            if role in ["user", "assistant"]:
-                messages.append({"role": role, "content": content})
-    
-    messages.append({"role": "user", "content": message})
+    messages = _fallback_messages(context, message, history)
     
     try:
         if OPENAI_API_KEY:
@@ -376,7 +364,7 @@ async def chat_with_creator_agent(
         elif GOOGLE_API_KEY:
             return await _call_google(messages)
         else:
-            return "Lo siento, no tengo acceso a un modelo de AI. Por favor configura OPENAI_API_KEY o GOOGLE_API_KEY."
+            return NO_MODEL_REPLY
     except Exception as e:
         print(f"❌ Assistant API error: {e}")
         # Try fallback
@@ -385,7 +373,99 @@ async def chat_with_creator_agent(
                 return await _call_google(messages)
         except:
             pass
-        return f"Lo siento, hubo un error. Por favor intenta de nuevo."
+        return ERROR_REPLY
+
+
+async def stream_with_creator_agent(
+    message: str,
+    user_id: Optional[str] = None,
+    user_role: Optional[str] = None,
+    current_page: Optional[str] = None,
+    user_name: Optional[str] = None,
+    message_history: list = None,
+    is_authenticated: bool = False
+) -> AsyncIterator[str]:
+    """
+    Like chat_with_creator_agent, but yields the answer as text deltas as soon
+    as the model produces them. Falls back to the next provider only while
+    nothing has been sent yet.
+    """
+    context = _build_context(user_id, user_role, current_page, user_name, is_authenticated)
+    history = (await chat_history.compact(message_history)).messages
+    
+    if PYDANTIC_AI_AVAILABLE and creator_agent:
+        streamed = False
+        try:
+            async with creator_agent.run_stream(
+                message,
+                deps=context,
+                message_history=to_model_messages(history)
+            ) as result:
+                async for delta in result.stream_text(delta=True, debounce_by=None):
+                    streamed = True
+                    yield delta
+            return
+        except Exception as e:
+            if streamed:
+                raise
+            print(f"❌ Pydantic AI stream error, falling back to direct API: {e}")
+    
+    messages = _fallback_messages(context, message, history)
+    streams = []
+    if OPENAI_API_KEY:
+        streams.append(lambda: llm_clients.stream_openai_chat(_openai_payload(messages), OPENAI_API_KEY))
+    if GOOGLE_API_KEY:
+        streams.append(lambda: llm_clients.stream_gemini(GEMINI_MODEL, _gemini_payload(messages), GOOGLE_API_KEY))
+    if not streams:
+        yield NO_MODEL_REPLY
+        return
+    
+    for stream in streams:
+        streamed = False
+        try:
+            async for delta in stream():
+                streamed = True
+                yield delta
+            return
+        except Exception as e:
+            if streamed:
+                raise
+            print(f"❌ Assistant streaming API error: {e}")
+    yield ERROR_REPLY
+
+
+def _build_context(
+    user_id: Optional[str],
+    user_role: Optional[str],
+    current_page: Optional[str],
+    user_name: Optional[str],
+    is_authenticated: bool
+) -> AssistantContext:
+    # Override authentication based on explicit flag
+    return AssistantContext(
+        user_id=user_id if is_authenticated else None,
+        user_role=user_role if is_authenticated else "guest",
+        current_page=current_page,
+        user_name=user_name if is_authenticated else None
+    )
+
+
+def _fallback_messages(context: AssistantContext, message: str, message_history: Optional[list]) -> list:
+    """Chat messages for the direct API calls (system prompt + history + message)"""
+    system_prompt = ASSISTANT_SYSTEM_PROMPT + "\n\n" + _get_context_instructions(context)
+    
+    messages = [{"role": "system", "content": system_prompt}]
+    
+    if message_history:
+        for msg in message_history:
+            role = msg.get("role", "user")
+            content = msg.get("content", "")
+            # "system" carries the summary of compacted older turns
+            if role in ["system", "user", "assistant"]:
+                messages.append({"role": role, "content": content})
+    
+    messages.append({"role": "user", "content": message})
+    return messages
 
 
 def chat_with_creator_agent_sync(
@@ -396,7 +476,7 @@ def chat_with_creator_agent_sync(
     user_name: Optional[str] = None,
     message_history: list = None
 ) -> str:
-    \"\"\"Synchronous version of chat_with_creator_agent.\"\"\"
+    """Synchronous version of chat_with_creator_agent."""
     import asyncio
     return asyncio.run(chat_with_creator_agent(
         message=message,
@@ -1,5 +1,6 @@
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from contextlib import asynccontextmanager
 import os
 import logging
 from dotenv import load_dotenv
@@ -23,7 +24,38 @@ if os.path.exists(root_env):
     load_dotenv(root_env, override=False)  # Don't override backend/.env values
     print(f"📁 Loaded .env from: {root_env}")
 
-app = FastAPI(title="AI Photo Booth - AI Microservice", version="2.0.0")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Shared clients are created once per worker and closed on shutdown
+    from services.storage import storage
+    from services.image_prep import image_prep
+    from services.rehost import result_rehoster
+    from services.derivatives import derivative_worker
+    from services.image_pool import image_pool
+    from services.job_queue import job_queue
+    from services.llm_clients import llm_clients
+    from services.chat_sessions import chat_sessions
+    from services.faq_cache import faq_cache
+    storage.start()
+    llm_clients.start()
+    # Image preparation and derivatives share one process pool
+    if image_prep.enabled or derivative_worker.enabled:
+        image_pool.start()
+    # Durable jobs: this process only enqueues, scripts/run_generation_worker.py runs them
+    await job_queue.start()
+    await chat_sessions.start()
+    # Loads (or generates) the guest FAQ answers in the background
+    faq_cache.start()
+    yield
+    await faq_cache.close()
+    await chat_sessions.close()
+    await job_queue.close()
+    await llm_clients.close()
+    image_pool.shutdown()
+    await result_rehoster.close()
+    storage.shutdown()
+
+app = FastAPI(title="AI Photo Booth - AI Microservice", version="2.0.0", lifespan=lifespan)
 
 # CORS - Allow all pictureme.now subdomains and localhost
 # Read additional origins from environment variable for flexibility in deployment
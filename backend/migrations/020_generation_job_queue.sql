@@ -0,0 +1,37 @@
+-- Migration 020: Generation Job Queue
+-- Durable queue for background FAL generations (see backend/services/job_queue.py).
+-- The API enqueues rows; worker processes claim them with FOR UPDATE SKIP LOCKED
+-- and hold a lease (locked_by / locked_until) while the job runs.
+-- Times are epoch seconds, matching the job status API.
+
+CREATE TABLE IF NOT EXISTS generation_queue (
+    id VARCHAR(64) PRIMARY KEY,
+    kind VARCHAR(32) NOT NULL,
+    model_id VARCHAR(255) NOT NULL,
+    fal_model_id VARCHAR(255) NOT NULL,
+    arguments JSONB NOT NULL,
+    timeout_seconds DOUBLE PRECISION,
+    status VARCHAR(32) NOT NULL DEFAULT 'queued',
+    queue_position INTEGER,
+    fal_request_id VARCHAR(255),
+    logs JSONB NOT NULL DEFAULT '[]',
+    result JSONB,
+    error TEXT,
+    webhook_body JSONB,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    locked_by VARCHAR(255),
+    locked_until DOUBLE PRECISION,
+    version INTEGER NOT NULL DEFAULT 0,
+    created_at DOUBLE PRECISION NOT NULL,
+    updated_at DOUBLE PRECISION NOT NULL
+);
+
+-- Dequeue scans only unfinished jobs, oldest first
+CREATE INDEX IF NOT EXISTS idx_generation_queue_pending
+ON generation_queue(created_at)
+WHERE status NOT IN ('completed', 'failed');
+
+-- Retention cleanup of finished jobs
+CREATE INDEX IF NOT EXISTS idx_generation_queue_finished
+ON generation_queue(updated_at)
+WHERE status IN ('completed', 'failed');
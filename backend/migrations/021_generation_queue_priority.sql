@@ -0,0 +1,18 @@
+-- Migration 021: Generation Queue Priority Classes
+-- Jobs are scheduled by a priority class derived from the organization's plan
+-- (business tiers running live events ahead of creator free-tier jobs).
+-- started_at records the first claim, for per-class queue wait metrics.
+
+ALTER TABLE generation_queue
+ADD COLUMN IF NOT EXISTS priority_class VARCHAR(32) NOT NULL DEFAULT 'standard',
+ADD COLUMN IF NOT EXISTS organization_id VARCHAR(64),
+ADD COLUMN IF NOT EXISTS started_at DOUBLE PRECISION;
+
+-- Per-class dequeue: oldest unfinished job of one class
+CREATE INDEX IF NOT EXISTS idx_generation_queue_class_pending
+ON generation_queue(priority_class, created_at)
+WHERE status NOT IN ('completed', 'failed');
+
+-- Queue wait stats over recent claims
+CREATE INDEX IF NOT EXISTS idx_generation_queue_started
+ON generation_queue(started_at);
@@ -0,0 +1,25 @@
+-- Migration 022: Assistant Chat Sessions
+-- Server-side conversation history for /api/akito/chat session mode
+-- (see backend/services/chat_sessions.py). One row per message, appended per turn.
+-- Roles are stored as one-letter codes: 'u' (user), 'a' (assistant).
+-- Times are epoch seconds.
+
+CREATE TABLE IF NOT EXISTS chat_sessions (
+    id VARCHAR(64) PRIMARY KEY,
+    owner VARCHAR(255),
+    message_count INTEGER NOT NULL DEFAULT 0,
+    expires_at DOUBLE PRECISION NOT NULL,
+    created_at DOUBLE PRECISION NOT NULL
+);
+
+-- Cleanup of expired sessions
+CREATE INDEX IF NOT EXISTS idx_chat_sessions_expires
+ON chat_sessions(expires_at);
+
+CREATE TABLE IF NOT EXISTS chat_session_messages (
+    session_id VARCHAR(64) NOT NULL REFERENCES chat_sessions(id) ON DELETE CASCADE,
+    seq INTEGER NOT NULL,
+    role CHAR(1) NOT NULL,
+    content TEXT NOT NULL,
+    PRIMARY KEY (session_id, seq)
+);
@@ -2,17 +2,45 @@
 Assistant API Router
 
 Provides endpoints for the AI assistant and CopilotKit integration.
+`/chat/stream` sends the answer as Server-Sent Events while the model writes it.
+
+Session mode: a chat body with a `session_id` key (null to start) keeps the
+conversation server-side (services/chat_sessions.py). The response carries the
+session id to send with the next message, and `message_history` is ignored.
+Sessions are bound to the user of the request's session token (never to the
+`user_id` in the body), so only they can resume or delete them.
+
+Guest FAQ questions (including the guest suggestion chips) are answered from
+pre-generated answers (services/faq_cache.py) without calling the model.
 """
 
-from fastapi import APIRouter, HTTPException, Request
+import json
+import time
+
+from fastapi import APIRouter, Depends, HTTPException, Request
 from pydantic import BaseModel, Field
-from typing import Optional, List, Any
+from sse_starlette.sse import EventSourceResponse
+from typing import Optional, List, Any, Dict
+
+from services.auth import AuthenticatedUser, current_user
+from services.chat_sessions import chat_sessions
+from services.faq_cache import faq_cache
+from services.metrics import Histogram
 
 router = APIRouter(
     prefix="/api/akito",
     tags=["Assistant"],
 )
 
+# Streaming chat latency: time to the first token and to the full answer
+stream_metrics = {
+    "streams": 0,
+    "errors": 0,
+    "disconnects": 0,
+    "time_to_first_token": Histogram(),
+    "total_time": Histogram(),
+}
+
 
 class ChatMessage(BaseModel):
     """A chat message"""
@@ -28,6 +56,7 @@ class ChatRequest(BaseModel):
     current_page: Optional[str] = None
     user_name: Optional[str] = None
     message_history: Optional[List[ChatMessage]] = None
+    session_id: Optional[str] = None  # Session mode: history is kept server-side
     
     class Config:
         extra = "ignore"  # Ignore extra fields from frontend
@@ -37,6 +66,7 @@ class ChatResponse(BaseModel):
     """Response from Assistant"""
     response: str
     suggestions: List[str] = Field(default_factory=list)
+    session_id: Optional[str] = None
 
 
 class ActionRequest(BaseModel):
@@ -49,7 +79,7 @@ class ActionRequest(BaseModel):
 
 
 @router.post("/chat", response_model=ChatResponse)
-async def chat_with_assistant_endpoint(request: Request):
+async def chat_with_assistant_endpoint(request: Request, user: Optional[AuthenticatedUser] = Depends(current_user)):
     """
     Chat with the AI assistant.
     
@@ -61,61 +91,23 @@ async def chat_with_assistant_endpoint(request: Request):
     - Troubleshooting
     """
     try:
-        # Parse raw body for debugging
-        body = await request.json()
-        print(f"🤖 Assistant received: {body}")
-        
-        # Validate manually
-        message = body.get("message", "").strip()
-        if not message:
-            raise HTTPException(status_code=422, detail="Message is required")
-        
-        user_id = body.get("user_id")
-        user_role = body.get("user_role")
-        current_page = body.get("current_page")
-        user_name = body.get("user_name")
-        is_authenticated = body.get("is_authenticated", False)
-        agent_tier = body.get("agent_tier", "standard")
-        raw_history = body.get("message_history", [])
-        
-        # Log status
-        print(f"   🔐 Auth status: {'Authenticated' if is_authenticated else 'Guest'} | Agent: {agent_tier} | User: {user_id} | Role: {user_role}")
-        
-        # Convert message history to the format expected by the agent
-        history = None
-        if raw_history:
-            history = []
-            for msg in raw_history:
-                if isinstance(msg, dict):
-                    history.append({"role": msg.get("role", "user"), "content": msg.get("content", "")})
+        chat = _parse_chat_body(await request.json())
+        await _open_session(chat, user)
         
         # Select agent based on tier
-        if agent_tier == "business":
+        response = _cached_guest_answer(chat)
+        if response is None and chat["agent_tier"] == "business":
             from agents.business_agent import chat_with_business_agent
-            response = await chat_with_business_agent(
-                message=message,
-                user_id=user_id,
-                user_role=user_role,
-                current_page=current_page,
-                user_name=user_name,
-                message_history=history
-            )
-        else:
+            response = await chat_with_business_agent(**_business_args(chat))
+        elif response is None:
             from agents.creator_agent import chat_with_creator_agent
-            response = await chat_with_creator_agent(
-                message=message,
-                user_id=user_id,
-                user_role=user_role,
-                current_page=current_page,
-                user_name=user_name,
-                message_history=history,
-                is_authenticated=is_authenticated
-            )
+            response = await chat_with_creator_agent(**_creator_args(chat))
         
         # Generate contextual suggestions based on auth status
-        suggestions = _generate_suggestions(message, current_page, is_authenticated)
+        suggestions = _generate_suggestions(chat["message"], chat["current_page"], chat["is_authenticated"])
         
-        return ChatResponse(response=response, suggestions=suggestions)
+        await _save_turn(chat, response)
+        return ChatResponse(response=response, suggestions=suggestions, session_id=chat["session_id"])
     except Exception as e:
         print(f"❌ Error in Assistant chat: {e}")
         import traceback
@@ -123,6 +115,164 @@ async def chat_with_assistant_endpoint(request: Request):
         raise HTTPException(status_code=500, detail=f"Failed to chat with Assistant: {str(e)}")
 
 
+@router.post("/chat/stream")
+async def stream_chat_with_assistant_endpoint(request: Request, user: Optional[AuthenticatedUser] = Depends(current_user)):
+    """
+    Chat with the AI assistant, streamed as Server-Sent Events.
+    
+    Takes the same body as `/chat`. Emits `token` events (`{"text": ...}`) as
+    the model writes the answer, then one `done` event with the full response
+    and the suggestions (the `/chat` response shape), or an `error` event.
+    """
+    chat = _parse_chat_body(await request.json())
+    await _open_session(chat, user)
+    
+    cached = _cached_guest_answer(chat)
+    if cached is not None:
+        tokens = _single_chunk(cached)
+    elif chat["agent_tier"] == "business":
+        from agents.business_agent import stream_with_business_agent
+        tokens = stream_with_business_agent(**_business_args(chat))
+    else:
+        from agents.creator_agent import stream_with_creator_agent
+        tokens = stream_with_creator_agent(**_creator_args(chat))
+    
+    async def event_generator():
+        started = time.perf_counter()
+        stream_metrics["streams"] += 1
+        parts = []
+        try:
+            async for delta in tokens:
+                if not parts:
+                    first_token = time.perf_counter() - started
+                    stream_metrics["time_to_first_token"].observe(first_token)
+                    print(f"   ⚡ First token after {first_token * 1000:.0f} ms")
+                parts.append(delta)
+                yield {"event": "token", "data": json.dumps({"text": delta})}
+                if await request.is_disconnected():
+                    stream_metrics["disconnects"] += 1
+                    return
+        except Exception as e:
+            stream_metrics["errors"] += 1
+            print(f"❌ Error in Assistant chat stream: {e}")
+            yield {"event": "error", "data": json.dumps({"detail": f"Failed to chat with Assistant: {str(e)}"})}
+            return
+        finally:
+            await tokens.aclose()
+        
+        stream_metrics["total_time"].observe(time.perf_counter() - started)
+        done = ChatResponse(
+            response="".join(parts),
+            suggestions=_generate_suggestions(chat["message"], chat["current_page"], chat["is_authenticated"]),
+            session_id=chat["session_id"],
+        )
+        await _save_turn(chat, done.response)
+        yield {"event": "done", "data": done.model_dump_json()}
+    
+    return EventSourceResponse(event_generator())
+
+
+@router.delete("/sessions/{session_id}")
+async def delete_chat_session(session_id: str, user: Optional[AuthenticatedUser] = Depends(current_user)):
+    """Forget a server-side chat session (e.g. on "new conversation" or logout)"""
+    if not await chat_sessions.delete(session_id, user.id if user else None):
+        # Unknown and foreign sessions look the same, so ids can't be probed
+        raise HTTPException(status_code=404, detail="Chat session not found")
+    return {"deleted": True}
+
+
+@router.get("/metrics")
+async def get_assistant_metrics():
+    """Streaming chat latency (seconds), history compaction savings (tokens) and sessions"""
+    from services.chat_history import chat_history
+    return {
+        "stream": {
+            name: value.snapshot() if isinstance(value, Histogram) else value
+            for name, value in stream_metrics.items()
+        },
+        "history": chat_history.stats(),
+        "sessions": await chat_sessions.stats(),
+        "faq": faq_cache.stats(),
+    }
+
+
+def _parse_chat_body(body: Dict[str, Any]) -> Dict[str, Any]:
+    """Validate a chat request body and normalize its message history (unless in session mode)"""
+    message = (body.get("message") or "").strip()
+    if not message:
+        raise HTTPException(status_code=422, detail="Message is required")
+    
+    chat = {
+        "message": message,
+        "user_id": body.get("user_id"),
+        "user_role": body.get("user_role"),
+        "current_page": body.get("current_page"),
+        "user_name": body.get("user_name"),
+        "is_authenticated": body.get("is_authenticated", False),
+        "agent_tier": body.get("agent_tier", "standard"),
+        "use_session": "session_id" in body,
+        "session_id": body.get("session_id"),
+        "message_history": None,
+    }
+    
+    # Log status
+    print(f"🤖 Assistant received: {message[:80]!r} ({len(message)} chars)")
+    print(f"   🔐 Auth status: {'Authenticated' if chat['is_authenticated'] else 'Guest'} | Agent: {chat['agent_tier']} | User: {chat['user_id']} | Role: {chat['user_role']}")
+    
+    if chat["use_session"]:
+        return chat
+    
+    # Convert message history to the format expected by the agent
+    raw_history = body.get("message_history", [])
+    if raw_history:
+        history = []
+        for msg in raw_history:
+            if isinstance(msg, dict):
+                history.append({"role": msg.get("role", "user"), "content": msg.get("content", "")})
+        chat["message_history"] = history
+    return chat
+
+
+async def _open_session(chat: Dict[str, Any], user: Optional[AuthenticatedUser]) -> None:
+    """In session mode, load the conversation so far (or start one) for the authenticated user"""
+    if not chat["use_session"]:
+        return
+    owner = user.id if user else None
+    chat["session_id"], chat["message_history"] = await chat_sessions.open(chat["session_id"], owner)
+    print(f"   💬 Session {chat['session_id'][:8]}… with {len(chat['message_history'])} messages")
+
+
+def _cached_guest_answer(chat: Dict[str, Any]) -> Optional[str]:
+    """Pre-generated answer when a guest asks a known FAQ question"""
+    if chat["is_authenticated"] or chat["agent_tier"] == "business":
+        return None
+    started = time.perf_counter()
+    answer = faq_cache.get(chat["message"])
+    if answer is not None:
+        print(f"   📚 FAQ cache hit in {(time.perf_counter() - started) * 1e6:.0f} µs")
+    return answer
+
+
+async def _single_chunk(text: str):
+    yield text
+
+
+async def _save_turn(chat: Dict[str, Any], response: str) -> None:
+    if chat["use_session"]:
+        await chat_sessions.append_turn(chat["session_id"], chat["message"], response)
+
+
+def _business_args(chat: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        key: chat[key]
+        for key in ("message", "user_id", "user_role", "current_page", "user_name", "message_history")
+    }
+
+
+def _creator_args(chat: Dict[str, Any]) -> Dict[str, Any]:
+    return {**_business_args(chat), "is_authenticated": chat["is_authenticated"]}
+
+
 @router.post("/action")
 async def execute_action(request: ActionRequest):
     """
@@ -0,0 +1,85 @@
+"""
+Derivatives throughput benchmark
+
+Renders the thumb/medium/full WebP set for a batch of images through the
+image process pool at increasing worker counts and reports images/sec
+and images/sec/core. Nothing is written to storage.
+
+Usage:
+    python scripts/bench_derivatives.py generated/*.png
+    python scripts/bench_derivatives.py --synthetic 64 --size 2048x1536 --workers 1 2 4
+"""
+
+import argparse
+import asyncio
+import io
+import os
+import sys
+import time
+
+# Allow running from backend/ or backend/scripts/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image
+
+from services.derivatives import DerivativeWorker
+from services.image_pool import ImagePool
+
+
+def _synthetic_images(count: int, width: int, height: int) -> list:
+    images = []
+    for i in range(count):
+        # Noise compresses like a photo; a flat color would flatter the encoder
+        image = Image.frombytes("RGB", (width, height), os.urandom(width * height * 3))
+        output = io.BytesIO()
+        image.save(output, format="PNG", compress_level=1)
+        images.append(output.getvalue())
+        print(f"\r🔹 Generated {i + 1}/{count} synthetic images", end="", flush=True)
+    print()
+    return images
+
+
+async def bench(images: list, workers: int, quality: int) -> float:
+    pool = ImagePool(workers=workers)
+    worker = DerivativeWorker(enabled=True, pool=pool, quality=quality, concurrency=workers * 2)
+    pool.start()
+    # Warm the pool so process start-up isn't counted
+    await asyncio.gather(*[worker.render(images[0]) for _ in range(workers)])
+
+    started = time.perf_counter()
+    await asyncio.gather(*[worker.render(data) for data in images])
+    elapsed = time.perf_counter() - started
+    pool.shutdown()
+    return len(images) / elapsed
+
+
+async def run(args) -> None:
+    if args.images:
+        images = []
+        for path in args.images:
+            with open(path, "rb") as f:
+                images.append(f.read())
+    else:
+        width, height = (int(v) for v in args.size.lower().split("x"))
+        images = _synthetic_images(args.synthetic, width, height)
+
+    cores = os.cpu_count() or 1
+    worker_counts = args.workers or sorted({1, max(1, cores // 2), cores})
+    print(f"📊 {len(images)} images, {cores} cores available\n")
+    for workers in worker_counts:
+        rate = await bench(images, workers, args.quality)
+        print(f"   {workers:>2} workers: {rate:6.2f} images/sec, {rate / workers:6.2f} images/sec/core")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Derivatives rendering throughput benchmark")
+    parser.add_argument("images", nargs="*")
+    parser.add_argument("--synthetic", type=int, default=32, help="Synthetic images to render when no files are given")
+    parser.add_argument("--size", default="2048x1536")
+    parser.add_argument("--workers", type=int, nargs="+")
+    parser.add_argument("--quality", type=int, default=80)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Image preparation benchmark
+
+Measures what input normalization buys: bytes saved and local prepare time for
+each image. With --fal-model it also uploads the original and the normalized
+copy and runs the same FAL request on both, so FAL-side fetch+prepare time
+saved shows up as the end-to-end difference. Uploaded objects are written
+under temp/bench/ and deleted afterwards.
+
+Usage (uses the same FAL_KEY / VITE_MINIO_* settings as the backend):
+    python scripts/bench_image_prep.py photos/*.jpg --max-pixels 2000000
+    python scripts/bench_image_prep.py photo.jpg --fal-model fal-ai/bytedance/seedream/v4/edit --runs 3
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+import uuid
+
+# Allow running from backend/ or backend/scripts/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dotenv import load_dotenv
+load_dotenv(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), '.env'))
+
+import fal_client
+
+from services.image_prep import ImagePreparer
+from services.storage import MINIO_BUCKET, public_url, storage
+
+
+async def _time_fal(model: str, image_url: str, prompt: str, runs: int) -> float:
+    durations = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        handler = await fal_client.submit_async(model, arguments={"prompt": prompt, "image_url": image_url})
+        await handler.get()
+        durations.append(time.perf_counter() - started)
+    return statistics.median(durations)
+
+
+async def run(args) -> None:
+    preparer = ImagePreparer(enabled=True, max_pixels=args.max_pixels, fmt=args.format, quality=args.quality)
+    preparer.start()
+    created = []
+    prepare_times = []
+    total_in = total_out = 0
+
+    for path in args.images:
+        with open(path, "rb") as f:
+            data = f.read()
+        started = time.perf_counter()
+        prepared = await preparer.normalize(data)
+        elapsed = time.perf_counter() - started
+        prepare_times.append(elapsed)
+        total_in += len(data)
+        total_out += len(prepared.data)
+        saved = 1 - len(prepared.data) / len(data)
+        print(f"🔹 {os.path.basename(path)}: {len(data) / 1024:.0f} KB -> {len(prepared.data) / 1024:.0f} KB "
+              f"({saved:.0%} saved), {prepared.width}x{prepared.height}, prepared in {elapsed * 1000:.0f} ms")
+
+        if args.fal_model:
+            urls = {}
+            for label, body, content_type in (("original", data, "image/jpeg"), ("normalized", prepared.data, prepared.content_type)):
+                key = f"temp/bench/{uuid.uuid4().hex}"
+                await storage.put_object(key, body, content_type)
+                created.append(key)
+                urls[label] = public_url(key)
+            original = await _time_fal(args.fal_model, urls["original"], args.prompt, args.runs)
+            normalized = await _time_fal(args.fal_model, urls["normalized"], args.prompt, args.runs)
+            print(f"   FAL median: original {original:.2f}s, normalized {normalized:.2f}s "
+                  f"(saved {original - normalized:.2f}s)")
+
+    preparer.shutdown()
+    if created:
+        print("\n🧹 Cleaning up benchmark objects")
+        await storage.run("delete_objects", Bucket=MINIO_BUCKET, Delete={"Objects": [{"Key": k} for k in created], "Quiet": True})
+        storage.shutdown()
+
+    print(f"\n📊 Total: {total_in / 1024:.0f} KB -> {total_out / 1024:.0f} KB "
+          f"({(1 - total_out / max(total_in, 1)):.0%} saved)")
+    print(f"   Prepare time p50: {statistics.median(prepare_times) * 1000:.0f} ms")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Input image normalization benchmark")
+    parser.add_argument("images", nargs="+")
+    parser.add_argument("--max-pixels", type=int, default=2_000_000)
+    parser.add_argument("--format", choices=["jpeg", "webp"], default="jpeg")
+    parser.add_argument("--quality", type=int, default=88)
+    parser.add_argument("--fal-model", help="FAL edit endpoint to compare end-to-end latency on")
+    parser.add_argument("--prompt", default="make it look like a vintage postcard")
+    parser.add_argument("--runs", type=int, default=3)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
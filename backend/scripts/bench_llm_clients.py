@@ -0,0 +1,87 @@
+"""
+LLM client latency benchmark
+
+Compares the old call pattern (new httpx client per call, so every chat turn
+pays a TCP + TLS handshake) with the pooled per-provider clients. It sends
+sequential requests, like turns in a conversation, to the provider's model
+listing endpoint. That endpoint is authenticated but costs no tokens.
+
+Usage (uses OPENAI_API_KEY / GOOGLE_API_KEY from the backend's .env):
+    python scripts/bench_llm_clients.py -n 20
+    python scripts/bench_llm_clients.py --provider google -n 20
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+# Allow running from backend/ or backend/scripts/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dotenv import load_dotenv
+load_dotenv(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), '.env'))
+
+import httpx
+
+from services.llm_clients import GOOGLE, OPENAI, PROVIDER_BASE_URLS, llm_clients
+
+
+def _request_args(provider: str) -> dict:
+    if provider == OPENAI:
+        return {"url": "/v1/models", "headers": {"Authorization": f"Bearer {os.getenv('OPENAI_API_KEY')}"}}
+    return {"url": "/v1beta/models", "params": {"key": os.getenv("GOOGLE_API_KEY")}}
+
+
+async def bench_unpooled(provider: str, count: int) -> list:
+    timings = []
+    for _ in range(count):
+        started = time.perf_counter()
+        async with httpx.AsyncClient(base_url=PROVIDER_BASE_URLS[provider]) as client:
+            response = await client.get(**_request_args(provider))
+        response.raise_for_status()
+        timings.append(time.perf_counter() - started)
+    return timings
+
+
+async def bench_pooled(provider: str, count: int) -> list:
+    timings = []
+    client = llm_clients.client(provider)
+    for _ in range(count):
+        started = time.perf_counter()
+        response = await client.get(**_request_args(provider))
+        response.raise_for_status()
+        timings.append(time.perf_counter() - started)
+    return timings
+
+
+async def run(args) -> None:
+    key = os.getenv("OPENAI_API_KEY" if args.provider == OPENAI else "GOOGLE_API_KEY")
+    if not key:
+        print(f"❌ No API key set for {args.provider}")
+        sys.exit(1)
+
+    results = {}
+    for name, bench in (("before (client per call)", bench_unpooled), ("after (pooled client)", bench_pooled)):
+        print(f"🔹 {name}: {args.count} sequential requests to {args.provider}")
+        timings = await bench(args.provider, args.count)
+        results[name] = statistics.median(timings)
+        print(f"   first {timings[0] * 1000:.0f} ms | median {results[name] * 1000:.0f} ms | max {max(timings) * 1000:.0f} ms")
+    http_version = (await llm_clients.client(args.provider).get(**_request_args(args.provider))).http_version
+    await llm_clients.close()
+
+    before, after = results.values()
+    print(f"\n📊 Median saved per call: {(before - after) * 1000:.0f} ms ({before / after:.2f}x), pooled client speaks {http_version}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="LLM provider connection reuse benchmark")
+    parser.add_argument("--provider", choices=[OPENAI, GOOGLE], default=OPENAI)
+    parser.add_argument("-n", "--count", type=int, default=20)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
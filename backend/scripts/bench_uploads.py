@@ -0,0 +1,92 @@
+"""
+Upload throughput benchmark
+
+Compares the old upload path (new boto3 client per upload, put_object called
+directly on the event loop) with the pooled path (shared client, calls offloaded
+to the storage thread pool). Objects are written under temp/bench/ and deleted
+afterwards.
+
+Usage (uses the same VITE_MINIO_* settings as the backend):
+    python scripts/bench_uploads.py -n 200 -c 16 --size-kb 512
+"""
+
+import argparse
+import asyncio
+import io
+import os
+import sys
+import time
+import uuid
+
+# Allow running from backend/ or backend/scripts/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dotenv import load_dotenv
+load_dotenv(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), '.env'))
+
+from services.storage import MINIO_BUCKET, create_s3_client, storage
+
+
+async def bench_unpooled(payload: bytes, count: int, concurrency: int) -> list:
+    keys = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def upload() -> None:
+        async with semaphore:
+            key = f"temp/bench/{uuid.uuid4().hex}.bin"
+            client = create_s3_client()
+            client.put_object(Bucket=MINIO_BUCKET, Key=key, Body=io.BytesIO(payload), ContentType="application/octet-stream")
+            keys.append(key)
+
+    await asyncio.gather(*[upload() for _ in range(count)])
+    return keys
+
+
+async def bench_pooled(payload: bytes, count: int, concurrency: int) -> list:
+    keys = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def upload() -> None:
+        async with semaphore:
+            key = f"temp/bench/{uuid.uuid4().hex}.bin"
+            await storage.put_object(key, io.BytesIO(payload), "application/octet-stream")
+            keys.append(key)
+
+    await asyncio.gather(*[upload() for _ in range(count)])
+    return keys
+
+
+async def run(args) -> None:
+    payload = os.urandom(args.size_kb * 1024)
+    storage.start()
+    results = {}
+    created = []
+
+    for name, bench in (("before (client per upload, on loop)", bench_unpooled), ("after (shared client, thread pool)", bench_pooled)):
+        print(f"🔹 {name}: {args.count} uploads of {args.size_kb} KB, concurrency {args.concurrency}")
+        started = time.perf_counter()
+        created += await bench(payload, args.count, args.concurrency)
+        elapsed = time.perf_counter() - started
+        results[name] = args.count / elapsed
+        print(f"   {results[name]:.1f} uploads/sec ({elapsed:.2f}s)")
+
+    print("\n🧹 Cleaning up benchmark objects")
+    for start in range(0, len(created), 1000):
+        batch = created[start:start + 1000]
+        await storage.run("delete_objects", Bucket=MINIO_BUCKET, Delete={"Objects": [{"Key": k} for k in batch], "Quiet": True})
+    storage.shutdown()
+
+    before, after = results.values()
+    print(f"\n📊 Speedup: {after / before:.2f}x")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="S3/MinIO upload throughput benchmark")
+    parser.add_argument("-n", "--count", type=int, default=100)
+    parser.add_argument("-c", "--concurrency", type=int, default=16)
+    parser.add_argument("--size-kb", type=int, default=512)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
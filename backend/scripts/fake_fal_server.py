@@ -0,0 +1,200 @@
+"""
+Fake FAL queue server
+
+A local stand-in for FAL's queue API (submit, status, result, cancel) that
+"runs" every request for a fixed latency and then POSTs the webhook. It lets
+the webhook completion mode be exercised end to end without network access or
+FAL credits.
+
+Usage:
+    # Serve on localhost:9100 (point a patched fal_client at it yourself)
+    python scripts/fake_fal_server.py --port 9100
+
+    # Full submit -> webhook -> resolve round trip against the generate router
+    # and a generation worker, over a throwaway SQLite job queue
+    # (tests/test_fal_webhooks.py runs this too)
+    python scripts/fake_fal_server.py --roundtrip
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+import uuid
+from typing import Any, Dict, Tuple
+
+# Allow running from backend/ or backend/scripts/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+import uvicorn
+from fastapi import FastAPI, HTTPException, Request
+
+
+def create_fake_fal_app(latency_seconds: float = 1.0) -> FastAPI:
+    app = FastAPI(title="Fake FAL queue")
+    requests: Dict[str, Dict[str, Any]] = {}
+    tasks: set = set()
+
+    def fake_result(app_path: str) -> Dict[str, Any]:
+        if "video" in app_path:
+            return {"video": {"url": f"https://fake.fal.media/{uuid.uuid4().hex}.mp4"}, "seed": 42}
+        return {"images": [{"url": f"https://fake.fal.media/{uuid.uuid4().hex}.png", "width": 1024, "height": 768}], "seed": 42}
+
+    async def run_request(request_id: str) -> None:
+        entry = requests[request_id]
+        await asyncio.sleep(latency_seconds / 2)
+        entry["status"] = "IN_PROGRESS"
+        await asyncio.sleep(latency_seconds / 2)
+        if entry["status"] == "CANCELLED":
+            return
+        entry["status"] = "COMPLETED"
+        entry["result"] = fake_result(entry["app_path"])
+        if entry["webhook"]:
+            body = {"request_id": request_id, "gateway_request_id": request_id, "status": "OK", "payload": entry["result"]}
+            async with httpx.AsyncClient() as client:
+                response = await client.post(entry["webhook"], json=body)
+                print(f"🔔 Webhook for {request_id} -> {response.status_code}")
+
+    @app.post("/{app_path:path}")
+    async def submit(app_path: str, request: Request):
+        request_id = uuid.uuid4().hex
+        requests[request_id] = {
+            "app_path": app_path,
+            "arguments": await request.json(),
+            "webhook": request.query_params.get("fal_webhook"),
+            "status": "IN_QUEUE",
+            "submitted_at": time.time(),
+        }
+        task = asyncio.create_task(run_request(request_id))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+        base = f"{str(request.base_url).rstrip('/')}/{app_path}/requests/{request_id}"
+        return {
+            "request_id": request_id,
+            "response_url": base,
+            "status_url": f"{base}/status",
+            "cancel_url": f"{base}/cancel",
+        }
+
+    def get_entry(request_id: str) -> Dict[str, Any]:
+        if request_id not in requests:
+            raise HTTPException(status_code=404, detail="Unknown request")
+        return requests[request_id]
+
+    @app.get("/{app_path:path}/requests/{request_id}/status")
+    async def status(app_path: str, request_id: str):
+        entry = get_entry(request_id)
+        if entry["status"] == "IN_QUEUE":
+            return {"status": "IN_QUEUE", "queue_position": 0}
+        return {"status": "COMPLETED" if entry["status"] == "CANCELLED" else entry["status"], "logs": []}
+
+    @app.get("/{app_path:path}/requests/{request_id}")
+    async def result(app_path: str, request_id: str):
+        entry = get_entry(request_id)
+        if entry["status"] != "COMPLETED":
+            raise HTTPException(status_code=400, detail="Request is still in progress")
+        return entry["result"]
+
+    @app.put("/{app_path:path}/requests/{request_id}/cancel")
+    async def cancel(app_path: str, request_id: str):
+        get_entry(request_id)["status"] = "CANCELLED"
+        return {"status": "CANCELLATION_REQUESTED"}
+
+    return app
+
+
+async def _serve(app: FastAPI, port: int) -> Tuple[uvicorn.Server, asyncio.Task]:
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    task = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.05)
+    return server, task
+
+
+async def _stop(*servers: Tuple[uvicorn.Server, asyncio.Task]) -> None:
+    """Let each server finish its shutdown (cancelling them mid-serve prints tracebacks)"""
+    for server, _ in servers:
+        server.should_exit = True
+    await asyncio.gather(*[task for _, task in servers], return_exceptions=True)
+
+
+async def roundtrip(args) -> None:
+    """Submit a video job in webhook mode and wait for the webhook to resolve it"""
+    backend_url = f"http://127.0.0.1:{args.backend_port}"
+    queue_dir = tempfile.TemporaryDirectory()
+    os.environ.update({
+        # Webhook mode is only used by durable jobs
+        "JOB_QUEUE_URL": f"sqlite:///{queue_dir.name}/jobs.db",
+        "FAL_KEY": "fake-key:fake-secret",
+        "FAL_WEBHOOK_BASE_URL": backend_url,
+        "FAL_WEBHOOK_SECRET": "local-roundtrip-secret",
+        # Long enough that only the webhook (not the safety-net poll) can finish the job
+        "FAL_WEBHOOK_RECHECK_SECONDS": "300",
+        "REHOST_ENABLED": "false",
+        "DERIVATIVES_ENABLED": "false",
+    })
+
+    import fal_client.client
+    from routers import generate
+    from services.fal_webhooks import fal_webhooks
+    from services.generation_worker import GenerationWorker
+    from services.job_queue import job_queue
+
+    # fal_client only knows https://queue.fal.run; send submits to the fake instead
+    fal_client.client.QUEUE_URL_FORMAT = f"http://127.0.0.1:{args.port}/"
+
+    backend = FastAPI()
+    backend.include_router(generate.router)
+    fake_server = await _serve(create_fake_fal_app(args.latency), args.port)
+    backend_server = await _serve(backend, args.backend_port)
+    await job_queue.start()
+    worker = GenerationWorker(idle_poll_seconds=0.1)
+    worker_task = asyncio.create_task(worker.run())
+
+    try:
+        async with httpx.AsyncClient(base_url=backend_url) as client:
+            started = time.perf_counter()
+            response = await client.post("/api/generate/video", json={"prompt": "roundtrip", "model_id": "kling-pro"})
+            response.raise_for_status()
+            job = response.json()
+            status_url = job["status_url"]
+            print(f"🚀 Submitted job {job['job_id']}")
+            while job["status"] not in ("completed", "failed"):
+                await asyncio.sleep(0.1)
+                job = (await client.get(status_url)).json()
+            elapsed = time.perf_counter() - started
+    finally:
+        worker.stop()
+        await asyncio.gather(worker_task, return_exceptions=True)
+        await _stop(backend_server, fake_server)
+        await job_queue.close()
+        queue_dir.cleanup()
+
+    # The worker runs in this process, so these are its webhook counters
+    webhooks = fal_webhooks.stats()
+    print(f"📊 Job {job['status']} in {elapsed:.2f}s: {job.get('result') or job.get('error')}")
+    print(f"   Webhooks: {webhooks}")
+    if job["status"] != "completed" or webhooks["delivered"] != 1:
+        print("❌ Round trip failed")
+        sys.exit(1)
+    print("✅ submit -> webhook -> resolve round trip works")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Local fake of the FAL queue API")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--latency", type=float, default=1.0, help="Seconds each fake request takes")
+    parser.add_argument("--roundtrip", action="store_true", help="Run the webhook round trip against the generate router")
+    parser.add_argument("--backend-port", type=int, default=9101)
+    args = parser.parse_args()
+    if args.roundtrip:
+        asyncio.run(roundtrip(args))
+    else:
+        uvicorn.run(create_fake_fal_app(args.latency), host="127.0.0.1", port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+Generation load test
+
+Fires N concurrent generation requests at a single backend worker and probes
+/health while they are in flight. With a non-blocking FAL path the batch should
+finish in roughly the time of a single generation and /health should stay fast.
+/video answers 202 with a job id; its status URL is polled until the job
+finishes, so video latencies are end to end, not just job acceptance.
+
+Usage:
+    python scripts/load_test_generate.py --base-url http://localhost:3001 -n 8
+    python scripts/load_test_generate.py --endpoint video --model-id kling-pro \\
+        --image-url https://.../photo.jpg -n 4
+"""
+
+import argparse
+import asyncio
+import time
+
+import httpx
+
+
+async def _generate(client: httpx.AsyncClient, base_url: str, url: str, payload: dict, poll_interval: float) -> float:
+    started = time.perf_counter()
+    response = await client.post(url, json=payload)
+    ok = response.status_code == 200
+    detail = f"❌ {response.status_code}"
+    if response.status_code == 202:
+        # Background job: follow it to the end
+        status_url = f"{base_url}{response.json()['status_url']}"
+        while True:
+            await asyncio.sleep(poll_interval)
+            status = await client.get(status_url)
+            if status.status_code != 200:
+                detail = f"❌ job status {status.status_code}"
+                break
+            job = status.json()
+            if job["status"] in ("completed", "failed"):
+                ok = job["status"] == "completed"
+                detail = f"❌ job {job['status']}: {job.get('error')}"
+                break
+    elapsed = time.perf_counter() - started
+    print(f"   {'✅' if ok else detail} generation finished in {elapsed:.2f}s")
+    return elapsed
+
+async def _probe_health(client: httpx.AsyncClient, url: str, stop: asyncio.Event) -> list:
+    latencies = []
+    while not stop.is_set():
+        started = time.perf_counter()
+        try:
+            await client.get(url)
+            latencies.append(time.perf_counter() - started)
+        except httpx.HTTPError:
+            latencies.append(float("inf"))
+        await asyncio.sleep(0.25)
+    return latencies
+
+
+async def run(args) -> None:
+    url = f"{args.base_url}/api/generate/{args.endpoint}"
+    payload = {"prompt": args.prompt, "model_id": args.model_id}
+    if args.image_url:
+        key = "image_url" if args.endpoint == "image" else "start_image_url"
+        payload[key] = args.image_url
+
+    timeout = httpx.Timeout(args.timeout)
+    limits = httpx.Limits(max_connections=args.concurrency + 2)
+    async with httpx.AsyncClient(timeout=timeout, limits=limits) as client:
+        print(f"🔹 Baseline: 1 request to {url}")
+        single = await _generate(client, args.base_url, url, payload, args.poll_interval)
+
+        print(f"🔹 Load: {args.concurrency} concurrent requests")
+        stop = asyncio.Event()
+        probe = asyncio.create_task(_probe_health(client, f"{args.base_url}/health", stop))
+        started = time.perf_counter()
+        await asyncio.gather(*[
+            _generate(client, args.base_url, url, payload, args.poll_interval) for _ in range(args.concurrency)
+        ])
+        wall = time.perf_counter() - started
+        stop.set()
+        health = await probe
+
+    print("\n📊 Results")
+    print(f"   Single generation:        {single:.2f}s")
+    print(f"   {args.concurrency} concurrent (wall time): {wall:.2f}s ({wall / single:.2f}x single)")
+    if health:
+        print(f"   /health probes:           {len(health)} (max {max(health) * 1000:.0f}ms)")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Concurrent generation load test")
+    parser.add_argument("--base-url", default="http://localhost:3001")
+    parser.add_argument("--endpoint", choices=["image", "video"], default="image")
+    parser.add_argument("--model-id", default="seedream-t2i")
+    parser.add_argument("--prompt", default="A photo booth portrait with neon lights")
+    parser.add_argument("--image-url", default=None)
+    parser.add_argument("-n", "--concurrency", type=int, default=8)
+    parser.add_argument("--timeout", type=float, default=600.0)
+    parser.add_argument("--poll-interval", type=float, default=1.0, help="Seconds between job status polls")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+Generation worker process
+
+Claims durable generation jobs from the job queue (JOB_QUEUE_URL) and runs them.
+The API only enqueues when JOB_QUEUE_URL is set, so run at least one of these
+next to it; add more processes (or machines) to raise throughput. SIGTERM stops
+claiming, lets running jobs finish for the grace period and hands the rest back
+to the queue for another worker to resume.
+
+Usage:
+    JOB_QUEUE_URL=sqlite:///tmp/jobs.db python scripts/run_generation_worker.py
+    python scripts/run_generation_worker.py --concurrency 16
+"""
+
+import argparse
+import asyncio
+import os
+import signal
+import sys
+
+# Allow running from backend/ or backend/scripts/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dotenv import load_dotenv
+load_dotenv(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), '.env'))
+
+# Registers the job kinds (result builders) and configures the FAL key
+from routers import generate  # noqa: F401
+from services.derivatives import derivative_worker
+from services.generation_worker import GenerationWorker, JOB_WORKER_CONCURRENCY
+from services.image_pool import image_pool
+from services.job_queue import job_queue
+from services.rehost import result_rehoster
+from services.storage import storage
+
+
+async def main(args) -> None:
+    if not job_queue.enabled:
+        print("❌ JOB_QUEUE_URL is not set, nothing to work on")
+        sys.exit(1)
+
+    storage.start()
+    if derivative_worker.enabled:
+        image_pool.start()
+    await job_queue.start()
+
+    worker = GenerationWorker(concurrency=args.concurrency)
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, worker.stop)
+
+    try:
+        await worker.run()
+    finally:
+        print(f"📊 Worker stats: {worker.stats()}")
+        await job_queue.close()
+        image_pool.shutdown()
+        await result_rehoster.close()
+        storage.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run durable generation jobs")
+    parser.add_argument("--concurrency", type=int, default=JOB_WORKER_CONCURRENCY, help="Jobs run at once")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,187 @@
+"""
+Temp upload sweeper
+
+Deletes expired objects under temp/ prefixes (guest uploads, prepared inputs,
+orphaned staging objects). Listing is paged with list_objects_v2 and streamed
+through a bounded queue to parallel delete workers, each sending 1000-key
+delete_objects batches. Memory stays flat no matter how many keys the prefix
+holds. Multipart uploads abandoned before the cutoff are aborted as well.
+
+Age is taken from LastModified. Deduplicated uploads and prepared inputs that
+are still being reused get re-stamped by the upload index, so they are not
+swept. The workers' memos (upload index, image_prep's prepared URLs) re-check
+an object once it is older than UPLOAD_DEDUPE_TOUCH_SECONDS, so --max-age-hours
+must stay above that window or a memo could hand out an already swept URL.
+
+Run it from cron (or a scheduled job) with the backend's VITE_MINIO_* settings:
+    python scripts/sweep_temp_uploads.py --dry-run
+    python scripts/sweep_temp_uploads.py --max-age-hours 48 --workers 8 --max-deletes-per-second 2000
+    python scripts/sweep_temp_uploads.py --prefix temp/uploads/ --prefix temp/prepared/
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+# Allow running from backend/ or backend/scripts/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dotenv import load_dotenv
+load_dotenv(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), '.env'))
+
+from services.storage import MINIO_BUCKET, storage
+from services.upload_dedupe import UPLOAD_DEDUPE_INDEX_TTL_SECONDS, UPLOAD_DEDUPE_TOUCH_SECONDS
+
+DELETE_BATCH_SIZE = 1000  # S3 delete_objects limit
+
+
+class RateLimiter:
+    """Shared pacing for delete workers: at most `per_second` keys per second"""
+
+    def __init__(self, per_second: float):
+        self.per_second = per_second
+        self._next_at = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self, amount: int) -> None:
+        if self.per_second <= 0:
+            return
+        async with self._lock:
+            now = time.monotonic()
+            wait = self._next_at - now
+            self._next_at = max(now, self._next_at) + amount / self.per_second
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+
+async def list_expired(prefix: str, cutoff: datetime, queue: asyncio.Queue, stats: dict) -> None:
+    """Page through `prefix` and queue batches of expired keys"""
+    batch = []
+    token = None
+    while True:
+        params = {"Bucket": MINIO_BUCKET, "Prefix": prefix, "MaxKeys": 1000}
+        if token:
+            params["ContinuationToken"] = token
+        page = await storage.run("list_objects_v2", **params)
+
+        for obj in page.get("Contents", []):
+            stats["scanned"] += 1
+            if obj["LastModified"] >= cutoff:
+                continue
+            stats["expired"] += 1
+            stats["expired_bytes"] += obj.get("Size", 0)
+            batch.append(obj["Key"])
+            if len(batch) == DELETE_BATCH_SIZE:
+                # Blocks when workers fall behind, which keeps memory bounded
+                await queue.put(batch)
+                batch = []
+
+        if not page.get("IsTruncated"):
+            break
+        token = page["NextContinuationToken"]
+
+    if batch:
+        await queue.put(batch)
+
+
+async def delete_worker(queue: asyncio.Queue, limiter: RateLimiter, dry_run: bool, stats: dict) -> None:
+    while True:
+        batch = await queue.get()
+        try:
+            if batch is None:
+                return
+            await limiter.acquire(len(batch))
+            if dry_run:
+                stats["deleted"] += len(batch)
+                continue
+            response = await storage.run(
+                "delete_objects",
+                Bucket=MINIO_BUCKET,
+                Delete={"Objects": [{"Key": key} for key in batch], "Quiet": True},
+            )
+            errors = response.get("Errors", [])
+            stats["deleted"] += len(batch) - len(errors)
+            stats["errors"] += len(errors)
+            for error in errors[:3]:
+                print(f"⚠️  Could not delete {error.get('Key')}: {error.get('Code')} {error.get('Message')}")
+        except Exception as e:
+            stats["errors"] += len(batch)
+            print(f"⚠️  Batch delete failed: {e}")
+        finally:
+            queue.task_done()
+
+
+async def abort_stale_multipart(prefix: str, cutoff: datetime, dry_run: bool, stats: dict) -> None:
+    params = {"Bucket": MINIO_BUCKET, "Prefix": prefix}
+    while True:
+        page = await storage.run("list_multipart_uploads", **params)
+        for upload in page.get("Uploads", []):
+            if upload["Initiated"] >= cutoff:
+                continue
+            stats["multipart_aborted"] += 1
+            if not dry_run:
+                await storage.run("abort_multipart_upload", Bucket=MINIO_BUCKET, Key=upload["Key"], UploadId=upload["UploadId"])
+        if not page.get("IsTruncated"):
+            return
+        params["KeyMarker"] = page["NextKeyMarker"]
+        params["UploadIdMarker"] = page["NextUploadIdMarker"]
+
+
+async def run(args) -> None:
+    cutoff = datetime.now(timezone.utc) - timedelta(hours=args.max_age_hours)
+    prefixes = args.prefix or ["temp/uploads/"]
+    stats = {"scanned": 0, "expired": 0, "expired_bytes": 0, "deleted": 0, "errors": 0, "multipart_aborted": 0}
+    mode = "DRY RUN, nothing will be deleted" if args.dry_run else "deleting"
+    print(f"🧹 Sweeping {', '.join(prefixes)} in {MINIO_BUCKET}: objects older than {cutoff.isoformat()} ({mode})")
+
+    storage.start()
+    started = time.perf_counter()
+    queue: asyncio.Queue = asyncio.Queue(maxsize=args.workers * 2)
+    limiter = RateLimiter(args.max_deletes_per_second)
+    workers = [asyncio.create_task(delete_worker(queue, limiter, args.dry_run, stats)) for _ in range(args.workers)]
+
+    for prefix in prefixes:
+        await list_expired(prefix, cutoff, queue, stats)
+        try:
+            await abort_stale_multipart(prefix, cutoff, args.dry_run, stats)
+        except Exception as e:
+            print(f"⚠️  Could not list multipart uploads under {prefix}: {e}")
+    for _ in workers:
+        await queue.put(None)
+    await asyncio.gather(*workers)
+    storage.shutdown()
+
+    elapsed = time.perf_counter() - started
+    verb = "Would delete" if args.dry_run else "Deleted"
+    print(f"\n📊 Scanned {stats['scanned']} objects in {elapsed:.1f}s")
+    print(f"   {verb} {stats['deleted']} of {stats['expired']} expired objects ({stats['expired_bytes'] / (1024 * 1024):.1f} MB)")
+    print(f"   Stale multipart uploads: {stats['multipart_aborted']}, errors: {stats['errors']}")
+    if stats["errors"]:
+        sys.exit(1)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Delete expired temp uploads from the storage bucket")
+    parser.add_argument("--prefix", action="append", help="Prefix to sweep (repeatable, default: temp/uploads/)")
+    parser.add_argument("--max-age-hours", type=float, default=24)
+    parser.add_argument("--workers", type=int, default=4, help="Parallel delete_objects calls")
+    parser.add_argument("--max-deletes-per-second", type=float, default=1000, help="0 disables the rate limit")
+    parser.add_argument("--dry-run", action="store_true", help="Only report what would be deleted")
+    args = parser.parse_args()
+    if not all(prefix.startswith("temp/") for prefix in (args.prefix or [])):
+        parser.error("only temp/ prefixes can be swept")
+    # A memo entry is trusted for up to the index TTL after its last check
+    min_age_hours = (UPLOAD_DEDUPE_TOUCH_SECONDS + UPLOAD_DEDUPE_INDEX_TTL_SECONDS) / 3600
+    if args.max_age_hours <= min_age_hours:
+        parser.error(
+            f"--max-age-hours must be above {min_age_hours:g} (UPLOAD_DEDUPE_TOUCH_SECONDS + "
+            "UPLOAD_DEDUPE_INDEX_TTL_SECONDS), objects still in use would be swept"
+        )
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""
+Admission Control Service
+
+Per-FAL-model concurrency limits with a bounded wait queue. When a model's queue
+is full the request is rejected immediately (HTTP 429 + Retry-After) instead of
+piling onto FAL and tripping its rate limits for everyone.
+
+Environment Variables:
+- FAL_MODEL_CONCURRENCY: Default in-flight FAL calls per model (default: 8)
+- FAL_MODEL_QUEUE_SIZE: Default number of requests allowed to wait per model (default: 32)
+- FAL_ADMISSION_MAX_WAIT_SECONDS: Longest a request may wait for a slot (default: 60)
+- FAL_MODEL_LIMITS: JSON overrides per FAL model id,
+  e.g. {"fal-ai/flux/dev": {"concurrency": 4, "queue": 16}}
+
+Limits declared in the model registry apply first; FAL_MODEL_LIMITS wins over them.
+"""
+
+import asyncio
+import json
+import math
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import Any, Dict, Optional
+
+from services.metrics import Histogram
+from services.model_registry import model_registry
+
+FAL_MODEL_CONCURRENCY = int(os.getenv("FAL_MODEL_CONCURRENCY", "8"))
+FAL_MODEL_QUEUE_SIZE = int(os.getenv("FAL_MODEL_QUEUE_SIZE", "32"))
+FAL_ADMISSION_MAX_WAIT_SECONDS = float(os.getenv("FAL_ADMISSION_MAX_WAIT_SECONDS", "60"))
+
+try:
+    FAL_MODEL_LIMITS = json.loads(os.getenv("FAL_MODEL_LIMITS", "{}"))
+except ValueError:
+    print("⚠️  FAL_MODEL_LIMITS is not valid JSON, using defaults")
+    FAL_MODEL_LIMITS = {}
+
+
+class AdmissionRejected(Exception):
+    """The model's wait queue is full (or the wait timed out)"""
+
+    def __init__(self, model_id: str, retry_after: int, reason: str = "queue full"):
+        self.model_id = model_id
+        self.retry_after = retry_after
+        self.reason = reason
+        super().__init__(f"{model_id} is at capacity ({reason}), retry in {retry_after}s")
+
+
+class ModelLimiter:
+    """Concurrency slots and wait queue for one FAL model"""
+
+    def __init__(self, model_id: str, concurrency: int, queue_size: int):
+        self.model_id = model_id
+        self.concurrency = concurrency
+        self.queue_size = queue_size
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.active = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.wait_seconds = Histogram()
+        self.service_seconds = Histogram()
+
+    def retry_after(self) -> int:
+        """Estimate when a slot frees up from the observed service time"""
+        avg_service = self.service_seconds.sum / self.service_seconds.count if self.service_seconds.count else 5.0
+        backlog = (self.waiting + 1) / max(self.concurrency, 1)
+        return max(1, math.ceil(avg_service * backlog))
+
+    def is_full(self) -> bool:
+        return self.active >= self.concurrency and self.waiting >= self.queue_size
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "concurrency": self.concurrency,
+            "queue_size": self.queue_size,
+            "active": self.active,
+            "queue_depth": self.waiting,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+            "wait_seconds": self.wait_seconds.snapshot(),
+            "service_seconds": self.service_seconds.snapshot(),
+        }
+
+
+class AdmissionController:
+    """Registry of per-model limiters"""
+
+    def __init__(
+        self,
+        default_concurrency: int = FAL_MODEL_CONCURRENCY,
+        default_queue_size: int = FAL_MODEL_QUEUE_SIZE,
+        max_wait_seconds: float = FAL_ADMISSION_MAX_WAIT_SECONDS,
+        overrides: Optional[Dict[str, Dict[str, int]]] = None,
+    ):
+        self.default_concurrency = default_concurrency
+        self.default_queue_size = default_queue_size
+        self.max_wait_seconds = max_wait_seconds
+        self.overrides = overrides if overrides is not None else FAL_MODEL_LIMITS
+        self._limiters: Dict[str, ModelLimiter] = {}
+
+    def limiter(self, model_id: str) -> ModelLimiter:
+        if model_id not in self._limiters:
+            override = {**model_registry.limits_for_endpoint(model_id), **self.overrides.get(model_id, {})}
+            self._limiters[model_id] = ModelLimiter(
+                model_id,
+                concurrency=override.get("concurrency", self.default_concurrency),
+                queue_size=override.get("queue", self.default_queue_size),
+            )
+        return self._limiters[model_id]
+
+    def check(self, model_id: str) -> None:
+        """Fail fast without taking a slot (for work that is admitted later)"""
+        limiter = self.limiter(model_id)
+        if limiter.is_full():
+            limiter.rejected += 1
+            raise AdmissionRejected(model_id, limiter.retry_after())
+
+    @asynccontextmanager
+    async def admit(self, model_id: str):
+        """Hold one concurrency slot for `model_id` for the duration of the block"""
+        limiter = self.limiter(model_id)
+        if limiter.is_full():
+            limiter.rejected += 1
+            raise AdmissionRejected(model_id, limiter.retry_after())
+
+        limiter.waiting += 1
+        queued_at = time.monotonic()
+        try:
+            async with asyncio.timeout(self.max_wait_seconds):
+                await limiter.semaphore.acquire()
+        except TimeoutError:
+            limiter.timed_out += 1
+            raise AdmissionRejected(model_id, limiter.retry_after(), reason="wait timed out")
+        finally:
+            limiter.waiting -= 1
+
+        started_at = time.monotonic()
+        limiter.wait_seconds.observe(started_at - queued_at)
+        limiter.admitted += 1
+        limiter.active += 1
+        try:
+            yield
+        finally:
+            limiter.active -= 1
+            limiter.service_seconds.observe(time.monotonic() - started_at)
+            limiter.semaphore.release()
+
+    def stats(self) -> Dict[str, Any]:
+        return {model_id: limiter.stats() for model_id, limiter in self._limiters.items()}
+
+
+# Global instance
+fal_admission = AdmissionController()
@@ -0,0 +1,69 @@
+"""
+Request Authentication
+
+Resolves the user behind a request from the session token issued at login: an
+HS256 JWT (claims: sub, role, exp) sent as "Authorization: Bearer <token>" or in
+the better-auth.session_token cookie. Decisions that need an identity (queue
+priority, chat session ownership) use this instead of user ids or flags sent in
+the request body, which any client can set.
+
+Environment Variables:
+- AUTH_JWT_SECRET: Key the session tokens are signed with (default: BETTER_AUTH_SECRET)
+"""
+
+import base64
+import hashlib
+import hmac
+import json
+import os
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+from fastapi import Request
+
+AUTH_JWT_SECRET = os.getenv("AUTH_JWT_SECRET") or os.getenv("BETTER_AUTH_SECRET", "")
+SESSION_COOKIE = "better-auth.session_token"
+
+
+@dataclass(frozen=True)
+class AuthenticatedUser:
+    id: str
+    role: Optional[str] = None
+
+
+def _b64decode(segment: str) -> bytes:
+    return base64.urlsafe_b64decode(segment + "=" * (-len(segment) % 4))
+
+
+def decode_token(token: str, secret: Optional[str] = None, now: Optional[float] = None) -> Optional[Dict[str, Any]]:
+    """Claims of a valid, unexpired HS256 token (signed with AUTH_JWT_SECRET by default); None for anything else"""
+    secret = AUTH_JWT_SECRET if secret is None else secret
+    if not secret or not token:
+        return None
+    try:
+        header, payload, signature = token.split(".")
+        if json.loads(_b64decode(header)).get("alg") != "HS256":
+            return None
+        expected = hmac.new(secret.encode("utf-8"), f"{header}.{payload}".encode("ascii"), hashlib.sha256).digest()
+        if not hmac.compare_digest(expected, _b64decode(signature)):
+            return None
+        claims = json.loads(_b64decode(payload))
+    except (ValueError, UnicodeError, AttributeError):
+        return None
+    if not isinstance(claims, dict) or claims.get("sub") is None:
+        return None
+    exp = claims.get("exp")
+    if exp is not None and (now or time.time()) >= float(exp):
+        return None
+    return claims
+
+
+async def current_user(request: Request) -> Optional[AuthenticatedUser]:
+    """FastAPI dependency: the authenticated user, or None for guests and bad tokens"""
+    authorization = request.headers.get("authorization", "")
+    token = authorization[7:] if authorization[:7].lower() == "bearer " else request.cookies.get(SESSION_COOKIE, "")
+    claims = decode_token(token.strip())
+    if claims is None:
+        return None
+    return AuthenticatedUser(id=str(claims["sub"]), role=claims.get("role"))
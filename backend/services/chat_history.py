@@ -0,0 +1,273 @@
+"""
+Chat History Service
+
+Keeps the conversation history sent to the assistants within a token budget.
+The last HISTORY_KEEP_TURNS turns always go to the model verbatim; once the
+history outgrows the budget, older messages are folded into a rolling summary.
+
+Summaries are cached by a hash of the messages they cover. Because each turn only
+appends to the history, the next request finds the previous summary for its
+prefix and only folds in the messages that have since left the verbatim window.
+Between folds the cached summary is reused as is, so most turns make no
+summarization call at all. If summarizing fails, the oldest messages are dropped.
+
+Environment Variables:
+- HISTORY_TOKEN_BUDGET: Most history tokens sent per request (default: 2000)
+- HISTORY_KEEP_TURNS: Recent user/assistant turns always kept verbatim (default: 4)
+- HISTORY_SUMMARY_MAX_TOKENS: Length limit of the rolling summary (default: 300)
+- HISTORY_SUMMARY_MODEL: OpenAI model used for summaries (default: gpt-4o-mini)
+- HISTORY_SUMMARY_CACHE_SIZE: Summaries kept in memory (default: 1000)
+"""
+
+import hashlib
+import os
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+from services.llm_clients import GOOGLE, OPENAI, llm_clients
+from services.metrics import Histogram
+from services.single_flight import SingleFlight
+
+try:
+    import tiktoken
+    _ENCODING = tiktoken.get_encoding("o200k_base")
+except Exception:
+    _ENCODING = None
+
+HISTORY_TOKEN_BUDGET = int(os.getenv("HISTORY_TOKEN_BUDGET", "2000"))
+HISTORY_KEEP_TURNS = int(os.getenv("HISTORY_KEEP_TURNS", "4"))
+HISTORY_SUMMARY_MAX_TOKENS = int(os.getenv("HISTORY_SUMMARY_MAX_TOKENS", "300"))
+HISTORY_SUMMARY_MODEL = os.getenv("HISTORY_SUMMARY_MODEL", "gpt-4o-mini")
+HISTORY_SUMMARY_CACHE_SIZE = int(os.getenv("HISTORY_SUMMARY_CACHE_SIZE", "1000"))
+
+# Per-message overhead of the chat format (role, separators)
+MESSAGE_OVERHEAD_TOKENS = 4
+SUMMARY_PREFIX = "Summary of the earlier conversation:\n"
+
+SUMMARY_INSTRUCTIONS = (
+    "You maintain a running summary of a support chat between a user and the "
+    "PictureMe.Now assistant. Update the summary with the new messages. Keep the "
+    "user's goals, decisions, names, plans, prompts and open questions; drop "
+    "greetings and small talk. Write in the language of the conversation, at most "
+    f"{HISTORY_SUMMARY_MAX_TOKENS} tokens, plain text."
+)
+
+# Token buckets for the saved-tokens histogram
+SAVED_TOKEN_BUCKETS = (0, 100, 250, 500, 1000, 2500, 5000, 10000, 25000)
+
+
+def count_tokens(text: str) -> int:
+    """Token count with tiktoken when installed, otherwise ~4 characters per token"""
+    if _ENCODING is not None:
+        return len(_ENCODING.encode(text, disallowed_special=()))
+    return (len(text) + 3) // 4
+
+
+def message_tokens(message: Dict[str, str]) -> int:
+    return count_tokens(message.get("content", "")) + MESSAGE_OVERHEAD_TOKENS
+
+
+@dataclass
+class CompactedHistory:
+    """History to send to the model, plus what compaction saved"""
+    messages: List[Dict[str, str]]
+    original_tokens: int
+    tokens: int
+    summarized_messages: int = 0
+    dropped_messages: int = 0
+
+    @property
+    def saved_tokens(self) -> int:
+        return self.original_tokens - self.tokens
+
+
+class ChatHistoryManager:
+    """Fits conversation histories into a token budget with cached rolling summaries"""
+
+    def __init__(
+        self,
+        token_budget: int = HISTORY_TOKEN_BUDGET,
+        keep_turns: int = HISTORY_KEEP_TURNS,
+        cache_size: int = HISTORY_SUMMARY_CACHE_SIZE,
+    ):
+        self.token_budget = token_budget
+        self.keep_messages = keep_turns * 2
+        self.cache_size = cache_size
+        # Prefix hash -> (messages covered, summary)
+        self._summaries: "OrderedDict[str, Tuple[int, str]]" = OrderedDict()
+        self._flights = SingleFlight()
+        self.saved_tokens = Histogram(SAVED_TOKEN_BUCKETS)
+        self.counters = {
+            "requests": 0,
+            "compacted": 0,
+            "summary_reused": 0,
+            "summary_updates": 0,
+            "summary_failures": 0,
+            "input_tokens": 0,
+            "input_tokens_saved": 0,
+        }
+
+    async def compact(self, history: Optional[List[Dict[str, str]]]) -> CompactedHistory:
+        """
+        Return `history` as it should be sent: unchanged if it fits the budget,
+        otherwise a summary message followed by the most recent messages.
+        """
+        history = [m for m in history or [] if m.get("role") in ("user", "assistant") and m.get("content")]
+        original_tokens = sum(message_tokens(m) for m in history)
+        self.counters["requests"] += 1
+        if original_tokens <= self.token_budget:
+            return self._report(CompactedHistory(history, original_tokens, original_tokens))
+
+        prefix_hashes = _prefix_hashes(history)
+        covered, summary = self._cached_summary(prefix_hashes)
+        if covered and self._fits(summary, history[covered:]):
+            self.counters["summary_reused"] += 1
+        else:
+            # Fold everything before the verbatim window into the summary
+            fold_to = max(covered, len(history) - self.keep_messages)
+            try:
+                summary = await self._flights.do(
+                    prefix_hashes[fold_to],
+                    lambda: self._update_summary(summary, history[covered:fold_to], prefix_hashes[fold_to], fold_to),
+                )
+                covered = fold_to
+            except Exception as e:
+                self.counters["summary_failures"] += 1
+                print(f"⚠️  History summary failed, dropping old messages instead: {e}")
+                return self._report(self._truncate(history, original_tokens))
+
+        messages = [{"role": "system", "content": SUMMARY_PREFIX + summary}] + history[covered:]
+        compacted = CompactedHistory(
+            messages, original_tokens, sum(message_tokens(m) for m in messages), summarized_messages=covered
+        )
+        if compacted.tokens > self.token_budget:
+            # The verbatim window alone is over budget: trim its oldest messages
+            kept = self._truncate(history[covered:], compacted.tokens, reserve=message_tokens(messages[0]))
+            compacted.messages = messages[:1] + kept.messages
+            compacted.tokens = message_tokens(messages[0]) + kept.tokens
+            compacted.dropped_messages = kept.dropped_messages
+        return self._report(compacted)
+
+    def _fits(self, summary: str, recent: List[Dict[str, str]]) -> bool:
+        tokens = count_tokens(SUMMARY_PREFIX + summary) + MESSAGE_OVERHEAD_TOKENS
+        return tokens + sum(message_tokens(m) for m in recent) <= self.token_budget
+
+    def _cached_summary(self, prefix_hashes: List[str]) -> Tuple[int, str]:
+        """Longest cached summary covering a prefix of the history"""
+        for end in range(len(prefix_hashes) - 1, 0, -1):
+            cached = self._summaries.get(prefix_hashes[end])
+            if cached:
+                self._summaries.move_to_end(prefix_hashes[end])
+                return cached
+        return 0, ""
+
+    async def _update_summary(self, summary: str, new_messages: List[Dict[str, str]], key: str, covered: int) -> str:
+        if new_messages:
+            summary = await _summarize(summary, new_messages)
+            self.counters["summary_updates"] += 1
+        self._summaries[key] = (covered, summary)
+        self._summaries.move_to_end(key)
+        while len(self._summaries) > self.cache_size:
+            self._summaries.popitem(last=False)
+        return summary
+
+    def _truncate(self, history: List[Dict[str, str]], original_tokens: int, reserve: int = 0) -> CompactedHistory:
+        """Newest messages that fit the budget"""
+        kept: List[Dict[str, str]] = []
+        tokens = reserve
+        for message in reversed(history):
+            cost = message_tokens(message)
+            if tokens + cost > self.token_budget:
+                break
+            kept.insert(0, message)
+            tokens += cost
+        return CompactedHistory(kept, original_tokens, tokens - reserve, dropped_messages=len(history) - len(kept))
+
+    def _report(self, compacted: CompactedHistory) -> CompactedHistory:
+        self.counters["input_tokens"] += compacted.tokens
+        if compacted.saved_tokens > 0:
+            self.counters["compacted"] += 1
+            self.counters["input_tokens_saved"] += compacted.saved_tokens
+            print(
+                f"🗜️  History compacted: {compacted.original_tokens} → {compacted.tokens} tokens "
+                f"(saved {compacted.saved_tokens}, {compacted.summarized_messages} summarized, "
+                f"{compacted.dropped_messages} dropped)"
+            )
+        self.saved_tokens.observe(compacted.saved_tokens)
+        return compacted
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self.counters,
+            "token_budget": self.token_budget,
+            "keep_messages": self.keep_messages,
+            "cached_summaries": len(self._summaries),
+            "saved_tokens_per_request": self.saved_tokens.snapshot(),
+        }
+
+
+def to_model_messages(history: List[Dict[str, str]]) -> list:
+    """Role/content dicts as pydantic-ai message history"""
+    from pydantic_ai.messages import ModelRequest, ModelResponse, SystemPromptPart, TextPart, UserPromptPart
+
+    messages = []
+    for message in history:
+        if message["role"] == "system":
+            messages.append(ModelRequest(parts=[SystemPromptPart(content=message["content"])]))
+        elif message["role"] == "user":
+            messages.append(ModelRequest(parts=[UserPromptPart(content=message["content"])]))
+        else:
+            messages.append(ModelResponse(parts=[TextPart(content=message["content"])]))
+    return messages
+
+
+def _prefix_hashes(history: List[Dict[str, str]]) -> List[str]:
+    """Hash chain: entry i identifies the first i messages"""
+    hashes = [hashlib.sha256(b"").hexdigest()]
+    for message in history:
+        digest = hashlib.sha256(hashes[-1].encode())
+        digest.update(f"\x00{message['role']}\x00{message['content']}".encode())
+        hashes.append(digest.hexdigest())
+    return hashes
+
+
+async def _summarize(summary: str, new_messages: List[Dict[str, str]]) -> str:
+    transcript = "\n".join(f"{m['role']}: {m['content']}" for m in new_messages)
+    prompt = f"Current summary:\n{summary or '(empty)'}\n\nNew messages:\n{transcript}\n\nUpdated summary:"
+
+    openai_key = os.getenv("OPENAI_API_KEY")
+    google_key = os.getenv("GOOGLE_API_KEY")
+    if openai_key:
+        response = await llm_clients.client(OPENAI).post(
+            "/v1/chat/completions",
+            headers={"Authorization": f"Bearer {openai_key}", "Content-Type": "application/json"},
+            json={
+                "model": HISTORY_SUMMARY_MODEL,
+                "messages": [
+                    {"role": "system", "content": SUMMARY_INSTRUCTIONS},
+                    {"role": "user", "content": prompt},
+                ],
+                "temperature": 0.2,
+                "max_tokens": HISTORY_SUMMARY_MAX_TOKENS,
+            },
+        )
+        response.raise_for_status()
+        return response.json()["choices"][0]["message"]["content"].strip()
+    if google_key:
+        response = await llm_clients.client(GOOGLE).post(
+            "/v1beta/models/gemini-2.0-flash:generateContent",
+            headers={"Content-Type": "application/json"},
+            params={"key": google_key},
+            json={
+                "contents": [{"role": "user", "parts": [{"text": f"{SUMMARY_INSTRUCTIONS}\n\n{prompt}"}]}],
+                "generationConfig": {"temperature": 0.2, "maxOutputTokens": HISTORY_SUMMARY_MAX_TOKENS},
+            },
+        )
+        response.raise_for_status()
+        return response.json()["candidates"][0]["content"]["parts"][0]["text"].strip()
+    raise ValueError("no LLM API key configured")
+
+
+# Global instance
+chat_history = ChatHistoryManager()
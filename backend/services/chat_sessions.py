@@ -0,0 +1,455 @@
+"""
+Chat Session Store
+
+Server-side conversation history for the assistant, so clients in session mode
+send only the new message plus a session id instead of the whole history on
+every turn. Sessions expire after CHAT_SESSION_TTL_SECONDS without activity and
+keep at most CHAT_SESSION_MAX_MESSAGES messages. Older messages are dropped
+(the chat history compaction summarizes long sessions long before that).
+
+Messages are stored compactly as (role code, text) pairs, appended per turn
+rather than rewriting the whole history. The session id is a random token and
+is the only key to a guest session. Sessions started by a signed-in user are
+bound to that user (the user id from the session token, see services/auth.py)
+and can only be resumed or deleted by them.
+
+Backends:
+- Memory (default): LRU + TTL per API worker, bounded by CHAT_SESSION_MAX_SESSIONS
+- Postgres (asyncpg): shared by every worker and machine. Schema:
+  migrations/022_chat_sessions.sql
+- SQLite: shared by the workers of one host (local development)
+
+Environment Variables:
+- CHAT_SESSION_URL: postgresql://... or sqlite:///path/to/sessions.db (unset: in memory)
+- CHAT_SESSION_TTL_SECONDS: Idle time after which a session expires (default: 3600)
+- CHAT_SESSION_MAX_SESSIONS: Sessions kept by the memory backend (default: 10000)
+- CHAT_SESSION_MAX_MESSAGES: Messages kept per session (default: 100)
+"""
+
+import asyncio
+import os
+import secrets
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+try:
+    import asyncpg
+    ASYNCPG_AVAILABLE = True
+except ImportError:
+    asyncpg = None
+    ASYNCPG_AVAILABLE = False
+
+CHAT_SESSION_URL = os.getenv("CHAT_SESSION_URL", "")
+CHAT_SESSION_TTL_SECONDS = float(os.getenv("CHAT_SESSION_TTL_SECONDS", "3600"))
+CHAT_SESSION_MAX_SESSIONS = int(os.getenv("CHAT_SESSION_MAX_SESSIONS", "10000"))
+CHAT_SESSION_MAX_MESSAGES = int(os.getenv("CHAT_SESSION_MAX_MESSAGES", "100"))
+
+PRUNE_INTERVAL_SECONDS = 10 * 60
+
+ROLE_CODES = {"user": "u", "assistant": "a"}
+ROLES = {code: role for role, code in ROLE_CODES.items()}
+
+# A stored message: (role code, content)
+StoredMessage = Tuple[str, str]
+
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS chat_sessions (
+    id TEXT PRIMARY KEY,
+    owner TEXT,
+    message_count INTEGER NOT NULL DEFAULT 0,
+    expires_at REAL NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_chat_sessions_expires ON chat_sessions(expires_at);
+CREATE TABLE IF NOT EXISTS chat_session_messages (
+    session_id TEXT NOT NULL REFERENCES chat_sessions(id) ON DELETE CASCADE,
+    seq INTEGER NOT NULL,
+    role TEXT NOT NULL,
+    content TEXT NOT NULL,
+    PRIMARY KEY (session_id, seq)
+);
+"""
+
+
+@dataclass
+class _MemorySession:
+    owner: Optional[str]
+    expires_at: float
+    messages: Deque[StoredMessage] = field(default_factory=deque)
+
+
+class MemorySessionBackend:
+    """Sessions in this process: LRU-evicted at max_sessions, expired lazily"""
+
+    def __init__(self, max_sessions: int = CHAT_SESSION_MAX_SESSIONS):
+        self.max_sessions = max_sessions
+        self._sessions: "OrderedDict[str, _MemorySession]" = OrderedDict()
+        self.evictions = 0
+
+    async def start(self) -> None:
+        pass
+
+    async def close(self) -> None:
+        pass
+
+    async def create(self, session_id: str, owner: Optional[str], now: float, expires_at: float) -> None:
+        self._sessions[session_id] = _MemorySession(owner, expires_at)
+        while len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
+            self.evictions += 1
+
+    async def load(
+        self, session_id: str, now: float, limit: int
+    ) -> Optional[Tuple[Optional[str], List[StoredMessage]]]:
+        session = self._sessions.get(session_id)
+        if session is None:
+            return None
+        if session.expires_at <= now:
+            del self._sessions[session_id]
+            return None
+        self._sessions.move_to_end(session_id)
+        return session.owner, list(session.messages)[-limit:]
+
+    async def append(
+        self, session_id: str, messages: List[StoredMessage], now: float, expires_at: float, limit: int
+    ) -> bool:
+        session = self._sessions.get(session_id)
+        if session is None or session.expires_at <= now:
+            return False
+        session.messages.extend(messages)
+        while len(session.messages) > limit:
+            session.messages.popleft()
+        session.expires_at = expires_at
+        self._sessions.move_to_end(session_id)
+        return True
+
+    async def delete(self, session_id: str, owner: Optional[str]) -> bool:
+        session = self._sessions.get(session_id)
+        if session is None or session.owner not in (None, owner):
+            return False
+        del self._sessions[session_id]
+        return True
+
+    async def delete_expired(self, now: float) -> int:
+        expired = [sid for sid, session in self._sessions.items() if session.expires_at <= now]
+        for session_id in expired:
+            del self._sessions[session_id]
+        return len(expired)
+
+    async def count(self) -> int:
+        return len(self._sessions)
+
+
+class PostgresSessionBackend:
+    """Sessions in Postgres, one row per message"""
+
+    def __init__(self, dsn: str):
+        self.dsn = dsn
+        self._pool = None
+
+    async def start(self) -> None:
+        if not ASYNCPG_AVAILABLE:
+            raise RuntimeError("asyncpg is required for a postgresql:// CHAT_SESSION_URL")
+        self._pool = await asyncpg.create_pool(self.dsn, min_size=1, max_size=10)
+
+    async def close(self) -> None:
+        if self._pool:
+            await self._pool.close()
+            self._pool = None
+
+    async def create(self, session_id: str, owner: Optional[str], now: float, expires_at: float) -> None:
+        await self._pool.execute(
+            "INSERT INTO chat_sessions (id, owner, expires_at, created_at) VALUES ($1, $2, $3, $4)",
+            session_id, owner, expires_at, now,
+        )
+
+    async def load(
+        self, session_id: str, now: float, limit: int
+    ) -> Optional[Tuple[Optional[str], List[StoredMessage]]]:
+        async with self._pool.acquire() as conn:
+            owner = await conn.fetchrow(
+                "SELECT owner FROM chat_sessions WHERE id = $1 AND expires_at > $2", session_id, now
+            )
+            if owner is None:
+                return None
+            rows = await conn.fetch(
+                """
+                SELECT role, content FROM (
+                    SELECT seq, role, content FROM chat_session_messages
+                    WHERE session_id = $1 ORDER BY seq DESC LIMIT $2
+                ) recent ORDER BY seq
+                """,
+                session_id, limit,
+            )
+        return owner["owner"], [(row["role"], row["content"]) for row in rows]
+
+    async def append(
+        self, session_id: str, messages: List[StoredMessage], now: float, expires_at: float, limit: int
+    ) -> bool:
+        async with self._pool.acquire() as conn:
+            async with conn.transaction():
+                # The row lock orders concurrent appends to the same session
+                count = await conn.fetchval(
+                    """
+                    UPDATE chat_sessions SET message_count = message_count + $2, expires_at = $3
+                    WHERE id = $1 AND expires_at > $4
+                    RETURNING message_count
+                    """,
+                    session_id, len(messages), expires_at, now,
+                )
+                if count is None:
+                    return False
+                first = count - len(messages)
+                await conn.executemany(
+                    "INSERT INTO chat_session_messages (session_id, seq, role, content) VALUES ($1, $2, $3, $4)",
+                    [(session_id, first + i, role, content) for i, (role, content) in enumerate(messages)],
+                )
+                await conn.execute(
+                    "DELETE FROM chat_session_messages WHERE session_id = $1 AND seq < $2",
+                    session_id, count - limit,
+                )
+        return True
+
+    async def delete(self, session_id: str, owner: Optional[str]) -> bool:
+        result = await self._pool.execute(
+            "DELETE FROM chat_sessions WHERE id = $1 AND (owner IS NULL OR owner = $2)", session_id, owner
+        )
+        return int(result.split()[-1]) > 0
+
+    async def delete_expired(self, now: float) -> int:
+        result = await self._pool.execute("DELETE FROM chat_sessions WHERE expires_at <= $1", now)
+        return int(result.split()[-1])
+
+    async def count(self) -> int:
+        return await self._pool.fetchval("SELECT count(*) FROM chat_sessions")
+
+
+class SqliteSessionBackend:
+    """Sessions in a local SQLite file"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    async def start(self) -> None:
+        await asyncio.to_thread(self._open)
+
+    def _open(self) -> None:
+        if os.path.dirname(self.path):
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA foreign_keys=ON")
+        conn.executescript(SQLITE_SCHEMA)
+        self._conn = conn
+
+    async def close(self) -> None:
+        if self._conn:
+            await asyncio.to_thread(self._conn.close)
+            self._conn = None
+
+    async def _run(self, fn, *args):
+        def locked():
+            with self._lock:
+                return fn(*args)
+        return await asyncio.to_thread(locked)
+
+    async def create(self, session_id: str, owner: Optional[str], now: float, expires_at: float) -> None:
+        await self._run(
+            self._conn.execute,
+            "INSERT INTO chat_sessions (id, owner, expires_at, created_at) VALUES (?, ?, ?, ?)",
+            (session_id, owner, expires_at, now),
+        )
+
+    async def load(
+        self, session_id: str, now: float, limit: int
+    ) -> Optional[Tuple[Optional[str], List[StoredMessage]]]:
+        def load():
+            owner = self._conn.execute(
+                "SELECT owner FROM chat_sessions WHERE id = ? AND expires_at > ?", (session_id, now)
+            ).fetchone()
+            if owner is None:
+                return None
+            rows = self._conn.execute(
+                """
+                SELECT role, content FROM (
+                    SELECT seq, role, content FROM chat_session_messages
+                    WHERE session_id = ? ORDER BY seq DESC LIMIT ?
+                ) ORDER BY seq
+                """,
+                (session_id, limit),
+            ).fetchall()
+            return owner[0], [(role, content) for role, content in rows]
+        return await self._run(load)
+
+    async def append(
+        self, session_id: str, messages: List[StoredMessage], now: float, expires_at: float, limit: int
+    ) -> bool:
+        def append():
+            # IMMEDIATE takes the write lock up front, so other workers' appends wait their turn
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    """
+                    UPDATE chat_sessions SET message_count = message_count + ?, expires_at = ?
+                    WHERE id = ? AND expires_at > ?
+                    RETURNING message_count
+                    """,
+                    (len(messages), expires_at, session_id, now),
+                ).fetchone()
+                if row is None:
+                    self._conn.execute("ROLLBACK")
+                    return False
+                first = row[0] - len(messages)
+                self._conn.executemany(
+                    "INSERT INTO chat_session_messages (session_id, seq, role, content) VALUES (?, ?, ?, ?)",
+                    [(session_id, first + i, role, content) for i, (role, content) in enumerate(messages)],
+                )
+                self._conn.execute(
+                    "DELETE FROM chat_session_messages WHERE session_id = ? AND seq < ?",
+                    (session_id, row[0] - limit),
+                )
+                self._conn.execute("COMMIT")
+                return True
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return await self._run(append)
+
+    async def delete(self, session_id: str, owner: Optional[str]) -> bool:
+        cursor = await self._run(
+            self._conn.execute, "DELETE FROM chat_sessions WHERE id = ? AND (owner IS NULL OR owner = ?)",
+            (session_id, owner),
+        )
+        return cursor.rowcount > 0
+
+    async def delete_expired(self, now: float) -> int:
+        cursor = await self._run(self._conn.execute, "DELETE FROM chat_sessions WHERE expires_at <= ?", (now,))
+        return cursor.rowcount
+
+    async def count(self) -> int:
+        cursor = await self._run(self._conn.execute, "SELECT count(*) FROM chat_sessions")
+        return cursor.fetchone()[0]
+
+
+def create_backend(url: str):
+    if not url:
+        return MemorySessionBackend()
+    if url.startswith(("postgres://", "postgresql://")):
+        return PostgresSessionBackend(url)
+    if url.startswith("sqlite:///"):
+        return SqliteSessionBackend(url[len("sqlite:///"):])
+    raise ValueError(f"Unsupported CHAT_SESSION_URL scheme: {url.split(':', 1)[0]}")
+
+
+class ChatSessionStore:
+    """Assistant conversations kept server-side, keyed by an unguessable session id"""
+
+    def __init__(
+        self,
+        url: str = CHAT_SESSION_URL,
+        ttl_seconds: float = CHAT_SESSION_TTL_SECONDS,
+        max_messages: int = CHAT_SESSION_MAX_MESSAGES,
+    ):
+        self.backend = create_backend(url)
+        self.ttl_seconds = ttl_seconds
+        self.max_messages = max_messages
+        self._started = False
+        self._last_prune = time.monotonic()
+        self.counters = {
+            "resumed": 0,
+            "created": 0,
+            "not_found": 0,
+            "owner_mismatch": 0,
+            "delete_refused": 0,
+            "turns_saved": 0,
+            "save_failures": 0,
+        }
+
+    async def start(self) -> None:
+        if not self._started:
+            await self.backend.start()
+            self._started = True
+
+    async def close(self) -> None:
+        if self._started:
+            await self.backend.close()
+            self._started = False
+
+    async def open(self, session_id: Optional[str], owner: Optional[str]) -> Tuple[str, List[Dict[str, str]]]:
+        """
+        History of `session_id` for `owner` (the authenticated user id, None for
+        guests). Unknown, expired or foreign sessions start a new, empty
+        session; the returned id tells the client which one.
+        """
+        await self.start()
+        await self._maybe_prune()
+        now = time.time()
+        if session_id:
+            loaded = await self.backend.load(session_id, now, self.max_messages)
+            if loaded is not None and loaded[0] in (None, owner):
+                self.counters["resumed"] += 1
+                return session_id, [{"role": ROLES[role], "content": content} for role, content in loaded[1]]
+            self.counters["not_found" if loaded is None else "owner_mismatch"] += 1
+            print(f"⚠️  Chat session {session_id[:8]}… not available, starting a new one")
+
+        new_id = secrets.token_urlsafe(24)
+        await self.backend.create(new_id, owner, now, now + self.ttl_seconds)
+        self.counters["created"] += 1
+        return new_id, []
+
+    async def append_turn(self, session_id: str, message: str, response: str) -> None:
+        """Store one user message and the assistant's answer"""
+        now = time.time()
+        try:
+            saved = await self.backend.append(
+                session_id,
+                [(ROLE_CODES["user"], message), (ROLE_CODES["assistant"], response)],
+                now,
+                now + self.ttl_seconds,
+                self.max_messages,
+            )
+        except Exception as e:
+            saved = False
+            print(f"⚠️  Could not save chat session turn: {e}")
+        self.counters["turns_saved" if saved else "save_failures"] += 1
+
+    async def delete(self, session_id: str, owner: Optional[str]) -> bool:
+        """Delete a guest session, or a session of `owner`; False if there was none to delete"""
+        await self.start()
+        deleted = await self.backend.delete(session_id, owner)
+        if not deleted:
+            self.counters["delete_refused"] += 1
+        return deleted
+
+    async def _maybe_prune(self) -> None:
+        if time.monotonic() - self._last_prune < PRUNE_INTERVAL_SECONDS:
+            return
+        self._last_prune = time.monotonic()
+        try:
+            removed = await self.backend.delete_expired(time.time())
+            if removed:
+                print(f"🧹 Pruned {removed} expired chat sessions")
+        except Exception as e:
+            print(f"⚠️  Pruning chat sessions failed: {e}")
+
+    async def stats(self) -> Dict[str, Any]:
+        stats = {
+            **self.counters,
+            "backend": type(self.backend).__name__,
+            "sessions": await self.backend.count() if self._started else 0,
+            "ttl_seconds": self.ttl_seconds,
+            "max_messages": self.max_messages,
+        }
+        if isinstance(self.backend, MemorySessionBackend):
+            stats["evictions"] = self.backend.evictions
+        return stats
+
+
+# Global instance
+chat_sessions = ChatSessionStore()
@@ -0,0 +1,174 @@
+"""
+Derivatives Service
+
+Renders a fixed set of WebP derivatives (thumb, medium, full) for generated
+images stored in our bucket, so feeds and album grids don't load full-size
+PNGs for every tile. Rendering runs in the shared image process pool
+(services/image_pool.py). Only generated/images/ sources up to
+DERIVATIVES_MAX_SOURCE_BYTES are processed. Keys are derived from the source
+key and a spec version, so reprocessing an image that already has its
+derivatives costs one index lookup.
+
+Environment Variables:
+- DERIVATIVES_ENABLED: Render derivatives after each generation (default: true)
+- DERIVATIVES_QUALITY: WebP quality (default: 80)
+- DERIVATIVES_CONCURRENCY: Images processed at once per worker (default: 2x image pool size)
+- DERIVATIVES_MAX_SOURCE_BYTES: Largest source image read (default: 50 MB)
+"""
+
+import asyncio
+import io
+import os
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from services.image_pool import ImagePool, image_pool
+from services.metrics import Histogram
+from services.storage import MINIO_BUCKET, public_url, storage
+from services.upload_dedupe import upload_index
+
+try:
+    from PIL import Image, ImageOps
+    PIL_AVAILABLE = True
+except ImportError:
+    PIL_AVAILABLE = False
+
+DERIVATIVES_ENABLED = os.getenv("DERIVATIVES_ENABLED", "true").lower() != "false"
+DERIVATIVES_QUALITY = int(os.getenv("DERIVATIVES_QUALITY", "80"))
+DERIVATIVES_CONCURRENCY = int(os.getenv("DERIVATIVES_CONCURRENCY", str(image_pool.workers * 2)))
+DERIVATIVES_MAX_SOURCE_BYTES = int(os.getenv("DERIVATIVES_MAX_SOURCE_BYTES", str(50 * 1024 * 1024)))
+
+# Only generated images get derivatives; anything else in the bucket is refused
+DERIVATIVES_SOURCE_PREFIX = "generated/images/"
+# Bump when the sizes or encoding change so new keys are produced
+DERIVATIVES_VERSION = "v1"
+# Name -> longest edge in pixels (None keeps the original size), largest first
+DERIVATIVE_SIZES: List[Tuple[str, Optional[int]]] = [
+    ("full", None),
+    ("medium", 1024),
+    ("thumb", 320),
+]
+
+
+def derivative_key(source_key: str, name: str) -> str:
+    stem = source_key.rsplit(".", 1)[0]
+    return f"derivatives/{DERIVATIVES_VERSION}/{stem}/{name}.webp"
+
+
+def is_derivable_key(key: str) -> bool:
+    return key.startswith(DERIVATIVES_SOURCE_PREFIX) and ".." not in key.split("/")
+
+
+def render_derivatives(data: bytes, quality: int = DERIVATIVES_QUALITY) -> Dict[str, bytes]:
+    """Decode once and encode every derivative (runs in a worker process)"""
+    rendered = {}
+    with Image.open(io.BytesIO(data)) as source:
+        image = ImageOps.exif_transpose(source)
+        image = image.convert("RGBA" if image.mode in ("RGBA", "LA", "P") else "RGB")
+        # Each size is resampled from the previous (larger) one, which is cheaper
+        for name, max_edge in DERIVATIVE_SIZES:
+            if max_edge and max(image.size) > max_edge:
+                image = image.copy()
+                image.thumbnail((max_edge, max_edge), Image.LANCZOS)
+            output = io.BytesIO()
+            image.save(output, format="WEBP", quality=quality, method=4)
+            rendered[name] = output.getvalue()
+    return rendered
+
+
+class DerivativeWorker:
+    """Fetch -> render -> store pipeline around the shared image pool"""
+
+    def __init__(
+        self,
+        enabled: bool = DERIVATIVES_ENABLED,
+        pool: ImagePool = image_pool,
+        quality: int = DERIVATIVES_QUALITY,
+        concurrency: int = DERIVATIVES_CONCURRENCY,
+    ):
+        self.enabled = enabled and PIL_AVAILABLE
+        self.pool = pool
+        self.quality = quality
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._tasks: set = set()
+        self.render_seconds = Histogram()
+        self.counters = {
+            "processed": 0,
+            "skipped": 0,
+            "failures": 0,
+            "rejected": 0,
+            "bytes_in": 0,
+            "bytes_out": 0,
+        }
+
+    def urls(self, source_key: str) -> Dict[str, str]:
+        return {name: public_url(derivative_key(source_key, name)) for name, _ in DERIVATIVE_SIZES}
+
+    def schedule(self, source_key: str) -> None:
+        """Render derivatives for `source_key` in the background"""
+        if not self.enabled:
+            return
+        task = asyncio.create_task(self._process_quietly(source_key))
+        # Keep a strong reference so the task isn't garbage collected mid-flight
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def process(self, source_key: str) -> Dict[str, str]:
+        """Render (if missing) and store every derivative; returns name -> URL"""
+        if not is_derivable_key(source_key):
+            self.counters["rejected"] += 1
+            raise ValueError(f"derivatives are only rendered for {DERIVATIVES_SOURCE_PREFIX} keys")
+        keys = {name: derivative_key(source_key, name) for name, _ in DERIVATIVE_SIZES}
+        existing = await asyncio.gather(*[upload_index.exists(key) for key in keys.values()])
+        if all(existing):
+            self.counters["skipped"] += 1
+            return self.urls(source_key)
+
+        async with self._semaphore:
+            head = await storage.run("head_object", Bucket=MINIO_BUCKET, Key=source_key)
+            if head["ContentLength"] > DERIVATIVES_MAX_SOURCE_BYTES:
+                self.counters["rejected"] += 1
+                raise ValueError(f"source is {head['ContentLength']} bytes, over the {DERIVATIVES_MAX_SOURCE_BYTES} byte limit")
+            obj = await storage.run("get_object", Bucket=MINIO_BUCKET, Key=source_key)
+            # The object can be replaced between the HEAD and the GET, so the read is capped too
+            data = await asyncio.to_thread(obj["Body"].read, DERIVATIVES_MAX_SOURCE_BYTES + 1)
+            if len(data) > DERIVATIVES_MAX_SOURCE_BYTES:
+                self.counters["rejected"] += 1
+                raise ValueError(f"source is over the {DERIVATIVES_MAX_SOURCE_BYTES} byte limit")
+            rendered = await self.render(data)
+            await asyncio.gather(*[
+                storage.put_object(keys[name], body, "image/webp", CacheControl="public, max-age=31536000, immutable")
+                for name, body in rendered.items()
+            ])
+        for key in keys.values():
+            upload_index.remember(key)
+        self.counters["processed"] += 1
+        return self.urls(source_key)
+
+    async def render(self, data: bytes) -> Dict[str, bytes]:
+        started = time.perf_counter()
+        rendered = await self.pool.run(render_derivatives, data, self.quality)
+        self.render_seconds.observe(time.perf_counter() - started)
+        self.counters["bytes_in"] += len(data)
+        self.counters["bytes_out"] += sum(len(body) for body in rendered.values())
+        return rendered
+
+    async def _process_quietly(self, source_key: str) -> None:
+        try:
+            await self.process(source_key)
+        except Exception as e:
+            self.counters["failures"] += 1
+            print(f"⚠️  Derivatives failed for {source_key}: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self.counters,
+            "enabled": self.enabled,
+            "workers": self.pool.workers,
+            "pending": len(self._tasks),
+            "render_seconds": self.render_seconds.snapshot(),
+        }
+
+
+# Global instance
+derivative_worker = DerivativeWorker()
@@ -0,0 +1,149 @@
+"""
+FAL Webhooks Service
+
+Lets background jobs wait for FAL to call back instead of polling the queue.
+Jobs are submitted with a webhook URL on /api/generate/webhooks/fal that
+carries the job id and an HMAC signature of it. The webhook route checks the
+signature and wakes the job's waiting future, so a running job costs one idle
+future instead of a polling loop.
+
+The signature only proves the URL came from us, not that the body came from
+FAL, so a webhook is treated as a wake-up call and its body is never used: the
+job asks FAL for the request's status and fetches the result by request id. A
+forged or early webhook costs one status call and the job keeps waiting.
+
+Webhook mode is only used by durable jobs (JOB_QUEUE_URL set). A webhook
+reaches whichever API worker the load balancer picks, and that worker parks it
+on the job's row for the queue worker that owns the job. In-process jobs live
+on a single API worker that other workers can't reach, so they poll FAL
+instead. A slow status re-check covers webhooks that never arrive.
+
+Environment Variables:
+- FAL_WEBHOOK_BASE_URL: Public base URL of this API, e.g. https://photoapi.akitapr.com
+  (enables webhook mode for durable jobs together with FAL_WEBHOOK_SECRET)
+- FAL_WEBHOOK_SECRET: HMAC key used to sign webhook URLs
+- FAL_WEBHOOK_RECHECK_SECONDS: Poll FAL once this often while waiting, in case a
+  webhook was lost (default: 60)
+"""
+
+import asyncio
+import hashlib
+import hmac
+import os
+from typing import Any, Callable, Dict, Optional
+from urllib.parse import urlencode
+
+import fal_client
+
+FAL_WEBHOOK_BASE_URL = os.getenv("FAL_WEBHOOK_BASE_URL", "").rstrip("/")
+FAL_WEBHOOK_SECRET = os.getenv("FAL_WEBHOOK_SECRET", "")
+FAL_WEBHOOK_RECHECK_SECONDS = float(os.getenv("FAL_WEBHOOK_RECHECK_SECONDS", "60"))
+
+WEBHOOK_PATH = "/api/generate/webhooks/fal"
+
+
+class FalWebhookError(Exception):
+    """FAL reported the request as failed"""
+
+
+class FalWebhooks:
+    """Signed webhook URLs and the futures of jobs waiting on them"""
+
+    def __init__(
+        self,
+        base_url: str = FAL_WEBHOOK_BASE_URL,
+        secret: str = FAL_WEBHOOK_SECRET,
+        recheck_seconds: float = FAL_WEBHOOK_RECHECK_SECONDS,
+    ):
+        self.base_url = base_url
+        self.secret = secret
+        self.recheck_seconds = recheck_seconds
+        self._waiters: Dict[str, asyncio.Future] = {}
+        self.counters = {
+            "submitted": 0,
+            "delivered": 0,
+            "spurious": 0,
+            "rejected_signatures": 0,
+            "unknown_jobs": 0,
+            "recovered_by_poll": 0,
+        }
+        if base_url and not secret:
+            print("⚠️  FAL_WEBHOOK_BASE_URL is set without FAL_WEBHOOK_SECRET, webhook mode disabled")
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.base_url and self.secret)
+
+    def sign(self, job_id: str) -> str:
+        return hmac.new(self.secret.encode("utf-8"), job_id.encode("utf-8"), hashlib.sha256).hexdigest()
+
+    def verify(self, job_id: str, signature: str) -> bool:
+        valid = bool(self.secret) and hmac.compare_digest(self.sign(job_id), signature or "")
+        if not valid:
+            self.counters["rejected_signatures"] += 1
+        return valid
+
+    def url_for(self, job_id: str) -> str:
+        return f"{self.base_url}{WEBHOOK_PATH}?{urlencode({'job_id': job_id, 'signature': self.sign(job_id)})}"
+
+    def expect(self, job_id: str) -> asyncio.Future:
+        """Register interest in `job_id` (before submitting, so an early webhook isn't lost)"""
+        future = asyncio.get_running_loop().create_future()
+        self._waiters[job_id] = future
+        self.counters["submitted"] += 1
+        return future
+
+    def is_waiting(self, job_id: str) -> bool:
+        return job_id in self._waiters
+
+    def discard(self, job_id: str) -> None:
+        self._waiters.pop(job_id, None)
+
+    def resolve(self, job_id: str) -> bool:
+        """Wake the job waiting on `job_id`; False if no job on this worker expects it"""
+        future = self._waiters.get(job_id)
+        if future is None:
+            self.counters["unknown_jobs"] += 1
+            return False
+        if not future.done():
+            future.set_result(True)
+        self.counters["delivered"] += 1
+        return True
+
+    async def wait(
+        self,
+        job_id: str,
+        future: asyncio.Future,
+        handler,
+        on_status: Optional[Callable[[Any], None]] = None,
+    ) -> Dict[str, Any]:
+        """
+        FAL result for `job_id`, fetched from FAL once a webhook says it's done
+        (or a status re-check finds it done, if the webhook is late)
+        """
+        try:
+            while True:
+                done, _ = await asyncio.wait({future}, timeout=self.recheck_seconds)
+                # Either way FAL itself is asked; a webhook only saves waiting for the re-check
+                status = await handler.status()
+                if on_status:
+                    on_status(status)
+                if isinstance(status, fal_client.Completed):
+                    if not done:
+                        self.counters["recovered_by_poll"] += 1
+                    if status.error:
+                        raise FalWebhookError(status.error)
+                    return await handler.get()
+                if done:
+                    # Forged or early: wait for the next one
+                    self.counters["spurious"] += 1
+                    future = self._waiters[job_id] = asyncio.get_running_loop().create_future()
+        finally:
+            self._waiters.pop(job_id, None)
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self.counters, "enabled": self.enabled, "waiting": len(self._waiters)}
+
+
+# Global instance
+fal_webhooks = FalWebhooks()
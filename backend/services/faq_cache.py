@@ -0,0 +1,354 @@
+"""
+Guest FAQ Cache
+
+Reuses assistant answers for the questions guests ask most, starting with the
+suggestion chips shown on the landing page. A guest question is normalized
+(case, accents, punctuation and spacing folded) and looked up exactly against
+every known phrasing, then by keywords. A hit is answered from memory without
+an LLM round-trip.
+
+Keyword matching is deliberately strict, because a wrong canned answer is
+worse than a model call. After dropping filler words (articles, pronouns,
+"how do I"), every remaining word of the question must appear in the entry's
+phrasings or keywords, and at least one of them must be one of its keywords.
+If several entries fit, the one sharing the most words with the question wins
+and a tie goes to the model. Questions with a negation ("not", "no", "sin") only
+match exactly. So "What plans are not available?", "How do I sign out?" or
+"¿Cuáles son los planetas?" go to the model instead of getting the plans or
+sign-up answer.
+
+Answers are generated server-side by the Creator Agent with a fixed guest
+context (landing page, no user, no history) and regenerated every
+FAQ_REFRESH_SECONDS; answers to user traffic are never stored, so no request can
+shape what other guests are served. A failed refresh keeps the previous answer.
+Answers are persisted to FAQ_ANSWERS_FILE under a file lock: the first API
+worker to start generates them, and the other workers (and restarts) load them
+instead of calling the model again. Only unauthenticated standard-tier chats use
+the cache (see routers/akito.py).
+
+Environment Variables:
+- FAQ_CACHE_ENABLED: Serve guest FAQ answers from the cache (default: true)
+- FAQ_REFRESH_SECONDS: How often answers are regenerated (default: 21600, 6 hours)
+- FAQ_ANSWERS_FILE: JSON file the answers are shared through by the workers of a host
+  (default: faq_answers.json in the temp directory; empty keeps them in memory)
+- FAQ_QUESTIONS: JSON override of the FAQ entries (entries without keywords only match exactly),
+  e.g. {"signup": {"question": "¿Cómo me registro?", "variants": ["como creo una cuenta"], "keywords": ["registro"]}}
+"""
+
+import asyncio
+import json
+import os
+import re
+import tempfile
+import time
+import unicodedata
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import Any, Awaitable, Callable, Dict, Optional, Set, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows: workers don't coordinate, each generates its own answers
+    fcntl = None
+
+FAQ_CACHE_ENABLED = os.getenv("FAQ_CACHE_ENABLED", "true").lower() != "false"
+FAQ_REFRESH_SECONDS = float(os.getenv("FAQ_REFRESH_SECONDS", str(6 * 60 * 60)))
+FAQ_ANSWERS_FILE = os.getenv("FAQ_ANSWERS_FILE", os.path.join(tempfile.gettempdir(), "faq_answers.json"))
+
+# "question" is the canonical phrasing, variants are other phrasings that get the same
+# answer, and keywords are the words a question must mention to match by keywords
+DEFAULT_FAQ_QUESTIONS = {
+    # Guest suggestion chips (routers/akito.py _generate_suggestions)
+    "about": {
+        "question": "¿Qué es PictureMe.Now?",
+        "variants": ["que es pictureme", "que es picture me now", "que hace pictureme.now"],
+        "keywords": ["pictureme", "picture"],
+    },
+    "plans": {
+        "question": "¿Cuáles son los planes disponibles?",
+        "variants": ["que planes hay disponibles", "cuales son los planes", "que planes tienen", "planes y precios"],
+        "keywords": ["planes", "precios"],
+    },
+    "signup": {
+        "question": "¿Cómo me registro?",
+        "variants": ["como me registro", "como creo una cuenta", "como me inscribo"],
+        "keywords": ["registro", "registrarme", "inscribo", "inscribirme", "cuenta"],
+    },
+    "about_en": {
+        "question": "What is PictureMe.Now?",
+        "variants": ["what is pictureme", "what does pictureme.now do"],
+        "keywords": ["pictureme", "picture"],
+    },
+    "plans_en": {
+        "question": "What plans are available?",
+        "variants": ["what are the plans", "what plans do you have", "plans and pricing"],
+        "keywords": ["plans", "pricing"],
+    },
+    "signup_en": {
+        "question": "How do I sign up?",
+        "variants": ["how do i register", "how do i create an account"],
+        "keywords": ["sign", "signup", "register", "account"],
+    },
+}
+
+try:
+    FAQ_QUESTIONS = json.loads(os.getenv("FAQ_QUESTIONS", "null")) or DEFAULT_FAQ_QUESTIONS
+except ValueError:
+    print("⚠️  FAQ_QUESTIONS is not valid JSON, using defaults")
+    FAQ_QUESTIONS = DEFAULT_FAQ_QUESTIONS
+
+# Words that don't change what is being asked (normalized: no accents)
+FILLER_WORDS = {
+    # English
+    "a", "an", "the", "i", "me", "my", "we", "you", "your", "it", "is", "are", "do", "does",
+    "can", "how", "what", "which", "please", "hi", "hello",
+    # Spanish
+    "el", "la", "los", "las", "un", "una", "yo", "mi", "te", "tu", "se", "es", "son",
+    "que", "como", "cual", "cuales", "puedo", "hola", "favor", "por",
+}
+# Any of these (and the question doesn't match exactly) means the model answers
+NEGATION_WORDS = {
+    "not", "no", "never", "without", "cannot", "cant", "dont", "don", "doesn", "isn", "aren", "won",
+    "nunca", "sin", "ni", "tampoco", "nada", "ningun", "ninguno", "ninguna",
+}
+
+# Normalized question -> matched entry (or None), so repeated questions skip keyword matching
+MATCH_MEMO_MAX_ENTRIES = 2048
+# Wait before retrying answers that failed to generate
+RETRY_SECONDS = 5 * 60
+# The only context answers are generated with; nothing comes from a request
+GUEST_CONTEXT = {"current_page": "/", "is_authenticated": False}
+
+
+async def generate_guest_answer(question: str) -> Optional[str]:
+    """Creator Agent answer in the fixed guest context; None if the model is unavailable"""
+    from agents.creator_agent import ERROR_REPLY, NO_MODEL_REPLY, chat_with_creator_agent
+
+    answer = await chat_with_creator_agent(question, **GUEST_CONTEXT)
+    return None if answer in (ERROR_REPLY, NO_MODEL_REPLY) else answer
+
+
+def normalize_question(text: str) -> str:
+    """Lowercase, strip accents and punctuation, collapse whitespace"""
+    folded = unicodedata.normalize("NFKD", text.casefold())
+    folded = "".join(ch for ch in folded if not unicodedata.combining(ch))
+    return " ".join(re.sub(r"[^\w\s]", " ", folded).split())
+
+
+class FaqCache:
+    """Question matcher over pre-generated guest answers"""
+
+    def __init__(
+        self,
+        questions: Dict[str, Dict[str, Any]] = FAQ_QUESTIONS,
+        enabled: bool = FAQ_CACHE_ENABLED,
+        refresh_seconds: float = FAQ_REFRESH_SECONDS,
+        answers_file: Optional[str] = FAQ_ANSWERS_FILE,
+        generate: Callable[[str], Awaitable[Optional[str]]] = generate_guest_answer,
+    ):
+        self.questions = questions
+        self.enabled = enabled
+        self.refresh_seconds = refresh_seconds
+        self.answers_file = answers_file or None
+        self.generate = generate
+        # Normalized phrasing -> entry key
+        self._phrasings: Dict[str, str] = {}
+        # Entry key -> (keywords, every word the entry's questions may use)
+        self._vocabulary: Dict[str, Tuple[Set[str], Set[str]]] = {}
+        for key, entry in questions.items():
+            words: Set[str] = set()
+            for phrasing in [entry["question"], *entry.get("variants", [])]:
+                normalized = normalize_question(phrasing)
+                self._phrasings[normalized] = key
+                words.update(normalized.split())
+            keywords = {normalize_question(keyword) for keyword in entry.get("keywords", [])}
+            if keywords:
+                self._vocabulary[key] = (keywords, words | keywords)
+        self._memo: "OrderedDict[str, Optional[str]]" = OrderedDict()
+        # Entry key -> (answer, generated_at)
+        self._answers: Dict[str, Tuple[str, float]] = {}
+        self._task: Optional[asyncio.Task] = None
+        self.counters = {
+            "hits": 0,
+            "exact_hits": 0,
+            "keyword_hits": 0,
+            "misses": 0,
+            "not_ready": 0,
+            "refreshes": 0,
+            "generated": 0,
+            "loaded": 0,
+            "refresh_failures": 0,
+        }
+
+    def start(self) -> None:
+        """Load or generate the answers now and keep them fresh in the background"""
+        if self.enabled and self._task is None:
+            self._task = asyncio.create_task(self._refresh_loop())
+
+    async def close(self) -> None:
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def match(self, message: str) -> Tuple[Optional[str], bool]:
+        """(entry key or None, whether the match was exact)"""
+        normalized = normalize_question(message)
+        key = self._phrasings.get(normalized)
+        if key:
+            return key, True
+        if normalized in self._memo:
+            self._memo.move_to_end(normalized)
+            return self._memo[normalized], False
+
+        key = self._match_keywords(normalized.split())
+        self._memo[normalized] = key
+        if len(self._memo) > MATCH_MEMO_MAX_ENTRIES:
+            self._memo.popitem(last=False)
+        return key, False
+
+    def _match_keywords(self, words: list) -> Optional[str]:
+        if NEGATION_WORDS.intersection(words):
+            return None
+        content = {word for word in words if word not in FILLER_WORDS}
+        if not content:
+            return None
+        # Entries that fit -> how many of the question's words (filler included) they know,
+        # which tells "que es pictureme" from "what is pictureme"
+        scores = {
+            key: len(vocabulary.intersection(words))
+            for key, (keywords, vocabulary) in self._vocabulary.items()
+            if content <= vocabulary and content & keywords
+        }
+        if not scores:
+            return None
+        best = max(scores.values())
+        ranked = [key for key, score in scores.items() if score == best]
+        # A tie is too vague to answer from the cache
+        return ranked[0] if len(ranked) == 1 else None
+
+    def get(self, message: str) -> Optional[str]:
+        """Pre-generated answer for a guest question, or None to ask the model"""
+        if not self.enabled:
+            return None
+        key, exact = self.match(message)
+        cached = self._answers.get(key) if key else None
+        if cached is None:
+            self.counters["not_ready" if key else "misses"] += 1
+            return None
+        self.counters["hits"] += 1
+        self.counters["exact_hits" if exact else "keyword_hits"] += 1
+        return cached[0]
+
+    async def refresh(self) -> bool:
+        """Generate the answers that are missing or due; True when every answer is fresh"""
+        async with self._file_lock():
+            # Another worker may have refreshed them while this one waited for the lock
+            await asyncio.to_thread(self._load)
+            ok = True
+            generated = 0
+            for key, entry in self.questions.items():
+                if not self._is_due(key):
+                    continue
+                try:
+                    answer = await self.generate(entry["question"])
+                except Exception as e:
+                    answer = None
+                    print(f"⚠️  Could not generate FAQ answer '{key}': {e}")
+                if not answer:
+                    ok = False
+                    self.counters["refresh_failures"] += 1
+                    continue
+                self._answers[key] = (answer, time.time())
+                generated += 1
+            if generated:
+                self.counters["generated"] += generated
+                await asyncio.to_thread(self._save)
+        self.counters["refreshes"] += 1
+        print(f"📚 FAQ cache refreshed: {len(self._answers)}/{len(self.questions)} answers ready ({generated} generated)")
+        return ok
+
+    def _is_due(self, key: str) -> bool:
+        cached = self._answers.get(key)
+        return cached is None or time.time() - cached[1] >= self.refresh_seconds
+
+    def _next_refresh_in(self) -> float:
+        if len(self._answers) < len(self.questions):
+            return min(RETRY_SECONDS, self.refresh_seconds)
+        oldest = min(at for _, at in self._answers.values())
+        return max(oldest + self.refresh_seconds - time.time(), 1.0)
+
+    async def _refresh_loop(self) -> None:
+        while True:
+            try:
+                await self.refresh()
+            except Exception as e:
+                print(f"⚠️  FAQ cache refresh failed: {e}")
+            await asyncio.sleep(self._next_refresh_in())
+
+    @asynccontextmanager
+    async def _file_lock(self):
+        """Serialize refreshes across the workers sharing FAQ_ANSWERS_FILE"""
+        if not self.answers_file or fcntl is None:
+            yield
+            return
+        lock = open(f"{self.answers_file}.lock", "a")
+        try:
+            await asyncio.to_thread(fcntl.flock, lock, fcntl.LOCK_EX)
+            yield
+        finally:
+            lock.close()
+
+    def _load(self) -> None:
+        if not self.answers_file:
+            return
+        try:
+            with open(self.answers_file, "r", encoding="utf-8") as f:
+                stored = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            print(f"⚠️  Could not read FAQ_ANSWERS_FILE {self.answers_file}: {e}")
+            return
+        for key, entry in self.questions.items():
+            item = stored.get(key)
+            # An edited question gets a new answer
+            if not isinstance(item, dict) or item.get("question") != entry["question"]:
+                continue
+            cached = self._answers.get(key)
+            if cached is None or item["generated_at"] > cached[1]:
+                self._answers[key] = (item["answer"], item["generated_at"])
+                self.counters["loaded"] += 1
+
+    def _save(self) -> None:
+        if not self.answers_file:
+            return
+        stored = {
+            key: {"question": self.questions[key]["question"], "answer": answer, "generated_at": at}
+            for key, (answer, at) in self._answers.items()
+        }
+        temp_path = f"{self.answers_file}.tmp"
+        try:
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump(stored, f, ensure_ascii=False)
+            os.replace(temp_path, self.answers_file)
+        except OSError as e:
+            print(f"⚠️  Could not write FAQ_ANSWERS_FILE {self.answers_file}: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.counters["hits"] + self.counters["misses"] + self.counters["not_ready"]
+        now = time.time()
+        return {
+            **self.counters,
+            "enabled": self.enabled,
+            "hit_rate": round(self.counters["hits"] / lookups, 4) if lookups else 0.0,
+            "answers_ready": len(self._answers),
+            "entries": len(self.questions),
+            "oldest_answer_age_seconds": (
+                round(now - min(at for _, at in self._answers.values()), 1) if self._answers else None
+            ),
+        }
+
+
+# Global instance
+faq_cache = FaqCache()
@@ -0,0 +1,198 @@
+"""
+Generation Cache Service
+
+Content-addressed cache for generation results. Entries are keyed by a canonical
+hash of the resolved FAL model id, the FAL arguments and the content of any input
+image, and live in an in-memory LRU with TTL plus an optional on-disk tier.
+Input images are only hashed when they are on our bucket or FAL's CDN (see
+services/input_urls.py); requests with any other image URL skip the cache.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+
+import httpx
+
+from services.input_urls import is_trusted_image_url, stream_image
+
+GENERATION_CACHE_MAX_ENTRIES = int(os.getenv("GENERATION_CACHE_MAX_ENTRIES", "1000"))
+GENERATION_CACHE_TTL_SECONDS = int(os.getenv("GENERATION_CACHE_TTL_SECONDS", str(6 * 60 * 60)))
+# Set to a directory to enable the disk tier (shared by all workers on the host)
+GENERATION_CACHE_DIR = os.getenv("GENERATION_CACHE_DIR")
+
+# Input image URL -> content digest, so hot template images are only downloaded once.
+# Entries expire so an object replaced under the same URL is hashed again.
+IMAGE_DIGEST_MAX_ENTRIES = 512
+IMAGE_DIGEST_TTL_SECONDS = 15 * 60
+
+
+def cache_key(fal_model_id: str, arguments: Dict[str, Any], image_digest: Optional[str] = None) -> str:
+    """Canonical hash of a generation request"""
+    canonical_args = {k: v for k, v in arguments.items() if k != "image_url"}
+    payload = json.dumps(
+        {"model": fal_model_id, "arguments": canonical_args, "image": image_digest},
+        sort_keys=True,
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class GenerationCache:
+    """LRU + TTL memory tier in front of an optional JSON-file disk tier"""
+
+    def __init__(
+        self,
+        max_entries: int = GENERATION_CACHE_MAX_ENTRIES,
+        ttl_seconds: int = GENERATION_CACHE_TTL_SECONDS,
+        disk_dir: Optional[str] = GENERATION_CACHE_DIR,
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.disk_dir = Path(disk_dir) if disk_dir else None
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()
+        # URL -> (digest, expires_at)
+        self._image_digests: "OrderedDict[str, tuple]" = OrderedDict()
+        self.counters = {
+            "hits": 0,
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "sets": 0,
+            "evictions": 0,
+            "expirations": 0,
+            "digest_failures": 0,
+            "untrusted_images": 0,
+        }
+        if self.disk_dir:
+            self.disk_dir.mkdir(parents=True, exist_ok=True)
+            print(f"✅ Generation cache disk tier at: {self.disk_dir}")
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        entry = self._memory.get(key)
+        if entry:
+            expires_at, value = entry
+            if expires_at > time.time():
+                self._memory.move_to_end(key)
+                self.counters["hits"] += 1
+                self.counters["memory_hits"] += 1
+                return value
+            del self._memory[key]
+            self.counters["expirations"] += 1
+
+        if self.disk_dir:
+            entry = await asyncio.to_thread(self._read_disk, key)
+            if entry:
+                expires_at, value = entry
+                self._remember(key, expires_at, value)
+                self.counters["hits"] += 1
+                self.counters["disk_hits"] += 1
+                return value
+
+        self.counters["misses"] += 1
+        return None
+
+    async def set(self, key: str, value: Dict[str, Any]) -> None:
+        expires_at = time.time() + self.ttl_seconds
+        self._remember(key, expires_at, value)
+        self.counters["sets"] += 1
+        if self.disk_dir:
+            await asyncio.to_thread(self._write_disk, key, expires_at, value)
+
+    async def update(self, key: str, apply: Callable[[Dict[str, Any]], None]) -> bool:
+        """Change a cached value in place, keeping its expiry; False when it isn't cached"""
+        entry = self._memory.get(key)
+        if entry is None and self.disk_dir:
+            entry = await asyncio.to_thread(self._read_disk, key)
+        if entry is None or entry[0] <= time.time():
+            return False
+        expires_at, value = entry
+        apply(value)
+        self._remember(key, expires_at, value)
+        if self.disk_dir:
+            await asyncio.to_thread(self._write_disk, key, expires_at, value)
+        return True
+
+    async def image_digest(self, url: str) -> Optional[str]:
+        """
+        SHA-256 of the image behind `url`, streamed so large inputs aren't buffered.
+        None when the URL isn't ours or FAL's, or the image can't be fetched:
+        the caller then skips the cache.
+        """
+        if not is_trusted_image_url(url):
+            self.counters["untrusted_images"] += 1
+            return None
+        entry = self._image_digests.get(url)
+        if entry:
+            digest, expires_at = entry
+            if expires_at > time.time():
+                self._image_digests.move_to_end(url)
+                return digest
+            del self._image_digests[url]
+
+        hasher = hashlib.sha256()
+        try:
+            async for chunk in stream_image(url):
+                hasher.update(chunk)
+        except (httpx.HTTPError, httpx.InvalidURL, ValueError) as e:
+            self.counters["digest_failures"] += 1
+            print(f"⚠️  Could not fetch input image for the cache key, skipping the cache: {e}")
+            return None
+        digest = hasher.hexdigest()
+
+        self._image_digests[url] = (digest, time.time() + IMAGE_DIGEST_TTL_SECONDS)
+        if len(self._image_digests) > IMAGE_DIGEST_MAX_ENTRIES:
+            self._image_digests.popitem(last=False)
+        return digest
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.counters["hits"] + self.counters["misses"]
+        return {
+            **self.counters,
+            "hit_rate": round(self.counters["hits"] / lookups, 4) if lookups else 0.0,
+            "memory_entries": len(self._memory),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "disk_enabled": self.disk_dir is not None,
+        }
+
+    def _remember(self, key: str, expires_at: float, value: Dict[str, Any]) -> None:
+        self._memory[key] = (expires_at, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self.counters["evictions"] += 1
+
+    def _disk_path(self, key: str) -> Path:
+        return self.disk_dir / key[:2] / f"{key}.json"
+
+    def _read_disk(self, key: str) -> Optional[tuple]:
+        path = self._disk_path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+        if entry["expires_at"] <= time.time():
+            path.unlink(missing_ok=True)
+            self.counters["expirations"] += 1
+            return None
+        return entry["expires_at"], entry["value"]
+
+    def _write_disk(self, key: str, expires_at: float, value: Dict[str, Any]) -> None:
+        path = self._disk_path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Write then rename so concurrent readers never see a partial file
+        tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"expires_at": expires_at, "value": value}, f)
+        os.replace(tmp_path, path)
+
+
+# Global instance
+generation_cache = GenerationCache()
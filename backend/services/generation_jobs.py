@@ -0,0 +1,335 @@
+"""
+Generation Jobs Service
+
+Tracks long-running FAL generations (videos) as background jobs so HTTP
+requests can return immediately and clients follow progress by polling or SSE.
+
+Without a job queue, jobs run as tasks on the API worker that accepted them and
+exist only in that process: status and SSE requests that land on another worker
+get a 404. Run the API as a single worker in that mode. With JOB_QUEUE_URL set
+jobs are written to the durable queue instead and run by GenerationWorker
+processes; this store then only enqueues and reads status, from any worker.
+
+Environment Variables:
+- JOB_STATUS_POLL_SECONDS: How often SSE streams re-read a queued job's row (default: 1)
+"""
+
+import asyncio
+import os
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+import fal_client
+
+from services.admission import fal_admission, AdmissionRejected
+from services.fal_webhooks import fal_webhooks
+from services.job_queue import job_queue, JobQueue, DEFAULT_PRIORITY_CLASS
+
+# Finished jobs are kept around so late pollers can still read the result
+JOB_TTL_SECONDS = 60 * 60
+MAX_LOG_LINES = 200
+JOB_STATUS_POLL_SECONDS = float(os.getenv("JOB_STATUS_POLL_SECONDS", "1"))
+
+TERMINAL_STATUSES = {"completed", "failed"}
+
+
+@dataclass
+class GenerationJob:
+    """State of a single background generation"""
+    id: str
+    kind: str
+    model_id: str
+    fal_model_id: str
+    arguments: Dict[str, Any] = field(default_factory=dict)
+    timeout_seconds: Optional[float] = None
+    organization_id: Optional[str] = None
+    priority_class: str = DEFAULT_PRIORITY_CLASS
+    status: str = "queued"  # queued | in_progress | storing | completed | failed
+    queue_position: Optional[int] = None
+    fal_request_id: Optional[str] = None
+    logs: List[str] = field(default_factory=list)
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    created_at: float = field(default_factory=time.time)
+    updated_at: float = field(default_factory=time.time)
+    version: int = 0
+    attempts: int = 0
+    # FAL log messages already consumed (self.logs is capped, so its length can't tell)
+    logs_seen: int = 0
+    _changed: asyncio.Event = field(default_factory=asyncio.Event, repr=False)
+
+    @property
+    def is_finished(self) -> bool:
+        return self.status in TERMINAL_STATUSES
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.id,
+            "kind": self.kind,
+            "model_id": self.model_id,
+            "status": self.status,
+            "queue_position": self.queue_position,
+            "fal_request_id": self.fal_request_id,
+            "logs": list(self.logs),
+            "result": self.result,
+            "error": self.error,
+            "created_at": self.created_at,
+            "updated_at": self.updated_at,
+        }
+
+    @classmethod
+    def from_row(cls, row: Dict[str, Any]) -> "GenerationJob":
+        """Rebuild a job from its job queue row"""
+        job = cls(**{name: row[name] for name in (
+            "id", "kind", "model_id", "fal_model_id", "arguments", "timeout_seconds",
+            "organization_id", "priority_class", "status",
+            "queue_position", "fal_request_id", "logs", "result", "error", "created_at",
+            "updated_at", "version", "attempts",
+        )})
+        # Exact until the cap was reached; past it a resumed job may repeat some lines once
+        job.logs_seen = len(job.logs)
+        return job
+
+    def to_row(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "model_id": self.model_id,
+            "fal_model_id": self.fal_model_id,
+            "arguments": self.arguments,
+            "timeout_seconds": self.timeout_seconds,
+            "organization_id": self.organization_id,
+            "priority_class": self.priority_class,
+            "status": self.status,
+            "logs": self.logs,
+        }
+
+    def state(self) -> Dict[str, Any]:
+        """The fields a worker writes back to the job queue"""
+        return {
+            "status": self.status,
+            "queue_position": self.queue_position,
+            "fal_request_id": self.fal_request_id,
+            "logs": self.logs,
+            "result": self.result,
+            "error": self.error,
+        }
+
+    def update(self, **changes) -> None:
+        """Apply changes and wake up anyone streaming this job"""
+        for key, value in changes.items():
+            setattr(self, key, value)
+        self.updated_at = time.time()
+        self.version += 1
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    def append_logs(self, logs: Optional[List[Dict[str, Any]]]) -> None:
+        if not logs:
+            return
+        messages = [log.get("message", "") for log in logs if log.get("message")]
+        # FAL returns the full log list on every status call, only keep what's new
+        if len(messages) < self.logs_seen:
+            # A shorter list means a new FAL request (e.g. a retry): it starts over
+            self.logs_seen = 0
+        new_messages = messages[self.logs_seen:]
+        self.logs_seen = len(messages)
+        if new_messages:
+            self.update(logs=(self.logs + new_messages)[-MAX_LOG_LINES:])
+
+    async def wait_for_change(self, since_version: int, timeout: float) -> bool:
+        """Wait until the job changes past `since_version`; False on timeout"""
+        if self.version > since_version:
+            return True
+        try:
+            await asyncio.wait_for(self._changed.wait(), timeout=timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+
+@dataclass
+class JobKind:
+    """How to turn a FAL result into a job result, for one kind of job"""
+    build_result: Callable[[Dict[str, Any]], Awaitable[Dict[str, Any]]]
+    # With a finalizer the job sits in "storing" (FAL result already readable) until it returns
+    finalize_result: Optional[Callable[[Dict[str, Any]], Awaitable[Dict[str, Any]]]] = None
+
+
+class GenerationJobStore:
+    """Generation jobs: in-memory on this worker, or in the durable job queue"""
+
+    def __init__(self, ttl_seconds: int = JOB_TTL_SECONDS, queue: JobQueue = job_queue):
+        self.ttl_seconds = ttl_seconds
+        self.queue = queue
+        self.kinds: Dict[str, JobKind] = {}
+        self._jobs: Dict[str, GenerationJob] = {}
+        self._tasks: set = set()
+
+    @property
+    def durable(self) -> bool:
+        return self.queue.enabled
+
+    def register_kind(
+        self,
+        kind: str,
+        build_result: Callable[[Dict[str, Any]], Awaitable[Dict[str, Any]]],
+        finalize_result: Optional[Callable[[Dict[str, Any]], Awaitable[Dict[str, Any]]]] = None,
+    ) -> None:
+        self.kinds[kind] = JobKind(build_result, finalize_result)
+
+    async def submit(
+        self,
+        kind: str,
+        model_id: str,
+        fal_model_id: str,
+        arguments: Dict[str, Any],
+        timeout_seconds: Optional[float] = None,
+        organization_id: Optional[str] = None,
+        user_id: Optional[str] = None,
+    ) -> GenerationJob:
+        """
+        Create a job and start it here, or enqueue it for the workers (queued
+        jobs are prioritized by the plan of `organization_id`, if `user_id`, the
+        authenticated submitter, belongs to it)
+        """
+        job = GenerationJob(
+            id=uuid.uuid4().hex,
+            kind=kind,
+            model_id=model_id,
+            fal_model_id=fal_model_id,
+            arguments=arguments,
+            timeout_seconds=timeout_seconds,
+            organization_id=organization_id,
+        )
+        if self.durable:
+            job.priority_class = await self.queue.priority_class(organization_id, user_id)
+            await self.queue.enqueue(job.to_row())
+            return job
+
+        self._evict_expired()
+        self._jobs[job.id] = job
+        task = asyncio.create_task(run_job(job, self.kinds[kind]))
+        # Keep a strong reference so the task isn't garbage collected mid-flight
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return job
+
+    async def get(self, job_id: str) -> Optional[GenerationJob]:
+        if not self.durable:
+            return self._jobs.get(job_id)
+        row = await self.queue.fetch(job_id)
+        return GenerationJob.from_row(row) if row else None
+
+    async def wait_for_change(
+        self, job: GenerationJob, since_version: int, timeout: float
+    ) -> Optional[GenerationJob]:
+        """The job once it changes past `since_version`; None on timeout"""
+        if not self.durable:
+            return job if await job.wait_for_change(since_version, timeout) else None
+
+        # Workers run elsewhere, so watch the row
+        deadline = time.monotonic() + timeout
+        while True:
+            current = await self.get(job.id)
+            if current is None or current.version > since_version:
+                return current
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return None
+            await asyncio.sleep(min(JOB_STATUS_POLL_SECONDS, remaining))
+
+    def _evict_expired(self) -> None:
+        cutoff = time.time() - self.ttl_seconds
+        expired = [
+            job_id for job_id, job in self._jobs.items()
+            if job.is_finished and job.updated_at < cutoff
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+
+async def run_job(
+    job: GenerationJob, kind: JobKind, release_when_saturated: bool = False, use_webhooks: bool = False
+) -> None:
+    """
+    Run the FAL request for `job` through to a result, recording progress on it.
+    A job that already has a FAL request id (claimed again after a crash) follows
+    that request instead of submitting a new one. With `use_webhooks` (durable
+    jobs only, see services/fal_webhooks.py) completion is signalled by webhook.
+    """
+    try:
+        async with fal_admission.admit(job.fal_model_id):
+            webhook = fal_webhooks.expect(job.id) if use_webhooks and fal_webhooks.enabled else None
+            try:
+                if job.fal_request_id:
+                    handler = await fal_client.async_client.get_handle(job.fal_model_id, job.fal_request_id)
+                elif webhook:
+                    # Completion arrives on the webhook route instead of a polling loop
+                    handler = await fal_client.submit_async(
+                        job.fal_model_id, arguments=job.arguments, webhook_url=fal_webhooks.url_for(job.id)
+                    )
+                else:
+                    handler = await fal_client.submit_async(job.fal_model_id, arguments=job.arguments)
+            except BaseException:
+                fal_webhooks.discard(job.id)
+                raise
+            job.update(fal_request_id=handler.request_id)
+
+            try:
+                async with asyncio.timeout(job.timeout_seconds):
+                    if webhook:
+                        result = await fal_webhooks.wait(job.id, webhook, handler, on_status=lambda s: _apply_status(job, s))
+                    else:
+                        async for event in handler.iter_events(with_logs=True):
+                            _apply_status(job, event)
+                        result = await handler.get()
+            except TimeoutError:
+                await _cancel_quietly(handler)
+                raise TimeoutError(f"timed out after {job.timeout_seconds}s")
+        built = await kind.build_result(result)
+        if kind.finalize_result:
+            job.update(status="storing", queue_position=None, result=built)
+            try:
+                built = await kind.finalize_result(built)
+            except Exception as e:
+                # The FAL result is still usable, only the extra step is lost
+                print(f"⚠️  Finalizing generation job {job.id} failed: {e}")
+        job.update(status="completed", queue_position=None, result=built)
+    except AdmissionRejected as e:
+        if release_when_saturated:
+            # Not the job's fault: the worker hands it back to the queue for later
+            raise
+        _fail(job, e)
+    except Exception as e:
+        _fail(job, e)
+
+
+def _fail(job: GenerationJob, e: Exception) -> None:
+    print(f"❌ Generation job {job.id} failed: {e}")
+    detail = getattr(e, "detail", None) or str(e)
+    job.update(status="failed", queue_position=None, error=f"Generation failed: {detail}")
+
+
+def _apply_status(job: GenerationJob, event) -> None:
+    if isinstance(event, fal_client.Queued):
+        job.update(status="queued", queue_position=event.position)
+    elif isinstance(event, fal_client.InProgress):
+        if job.status != "in_progress":
+            job.update(status="in_progress", queue_position=None)
+        job.append_logs(event.logs)
+    elif isinstance(event, fal_client.Completed):
+        job.append_logs(event.logs)
+
+
+async def _cancel_quietly(handler) -> None:
+    try:
+        await handler.cancel()
+    except Exception as e:
+        print(f"⚠️  Could not cancel FAL request {handler.request_id}: {e}")
+
+
+# Global instance
+generation_jobs = GenerationJobStore()
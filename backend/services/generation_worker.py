@@ -0,0 +1,229 @@
+"""
+Generation Worker
+
+Runs durable generation jobs from the job queue. Each worker process claims up
+to `concurrency` jobs at a time, runs them with the same code path the API uses
+for in-process jobs, and writes progress back to the job's row. Throughput
+scales with the number of worker processes.
+
+While a job runs, every change (and at least one heartbeat per third of the
+lease) is saved together with a lease extension. A worker that dies simply stops
+heartbeating; once its lease runs out another worker claims the job and resumes
+it. A worker that loses its lease (e.g. after a long pause) stops the job.
+
+In webhook mode FAL calls back to the API, not the worker, so the API parks the
+delivery on the job's row. While a job waits on a webhook the worker reads its
+row every JOB_WORKER_WEBHOOK_POLL_SECONDS (a read, not a lease write), so a
+delivery is picked up within that interval and the worker asks FAL for the
+result (see services/fal_webhooks.py).
+
+Environment Variables:
+- JOB_WORKER_CONCURRENCY: Jobs run at once per worker process (default: 8)
+- JOB_WORKER_IDLE_POLL_SECONDS: Wait between claims when the queue is empty (default: 1)
+- JOB_WORKER_SHUTDOWN_GRACE_SECONDS: How long running jobs get to finish on shutdown
+  before they are handed back to the queue (default: 30)
+- JOB_WORKER_WEBHOOK_POLL_SECONDS: How often a job waiting on a FAL webhook checks its
+  row for a delivery (default: 0.5)
+"""
+
+import asyncio
+import os
+import socket
+import time
+import uuid
+from typing import Any, Dict, Optional
+
+from services.admission import AdmissionRejected
+from services.fal_webhooks import fal_webhooks
+from services.generation_jobs import GenerationJob, GenerationJobStore, generation_jobs, run_job
+from services.job_queue import LeaseLost
+
+JOB_WORKER_CONCURRENCY = int(os.getenv("JOB_WORKER_CONCURRENCY", "8"))
+JOB_WORKER_IDLE_POLL_SECONDS = float(os.getenv("JOB_WORKER_IDLE_POLL_SECONDS", "1"))
+JOB_WORKER_SHUTDOWN_GRACE_SECONDS = float(os.getenv("JOB_WORKER_SHUTDOWN_GRACE_SECONDS", "30"))
+JOB_WORKER_WEBHOOK_POLL_SECONDS = float(os.getenv("JOB_WORKER_WEBHOOK_POLL_SECONDS", "0.5"))
+
+PRUNE_INTERVAL_SECONDS = 10 * 60
+
+
+class GenerationWorker:
+    """Claims jobs from the durable queue and runs them"""
+
+    def __init__(
+        self,
+        store: GenerationJobStore = generation_jobs,
+        concurrency: int = JOB_WORKER_CONCURRENCY,
+        idle_poll_seconds: float = JOB_WORKER_IDLE_POLL_SECONDS,
+        shutdown_grace_seconds: float = JOB_WORKER_SHUTDOWN_GRACE_SECONDS,
+        webhook_poll_seconds: float = JOB_WORKER_WEBHOOK_POLL_SECONDS,
+        worker_id: Optional[str] = None,
+    ):
+        self.store = store
+        self.queue = store.queue
+        self.concurrency = concurrency
+        self.idle_poll_seconds = idle_poll_seconds
+        self.shutdown_grace_seconds = shutdown_grace_seconds
+        self.webhook_poll_seconds = webhook_poll_seconds
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self._stopping = asyncio.Event()
+        self._tasks: set = set()
+        self._last_prune = 0.0
+        self.counters = {
+            "claimed": 0,
+            "resumed": 0,
+            "completed": 0,
+            "failed": 0,
+            "released": 0,
+            "leases_lost": 0,
+            "webhook_polls": 0,
+        }
+
+    def stop(self) -> None:
+        """Stop claiming; running jobs get the shutdown grace period"""
+        self._stopping.set()
+
+    async def run(self) -> None:
+        slots = asyncio.Semaphore(self.concurrency)
+        print(f"👷 Generation worker {self.worker_id} started (concurrency {self.concurrency})")
+        while not self._stopping.is_set():
+            await slots.acquire()
+            try:
+                row = await self.queue.claim(self.worker_id)
+            except Exception as e:
+                print(f"⚠️  Claiming a job failed: {e}")
+                row = None
+            if row is None:
+                slots.release()
+                await self._maybe_prune()
+                try:
+                    await asyncio.wait_for(self._stopping.wait(), timeout=self.idle_poll_seconds)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            task = asyncio.create_task(self._process(row))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+            task.add_done_callback(lambda _: slots.release())
+
+        await self._drain()
+
+    async def _drain(self) -> None:
+        if not self._tasks:
+            return
+        print(f"⏳ Waiting up to {self.shutdown_grace_seconds}s for {len(self._tasks)} running jobs")
+        _, pending = await asyncio.wait(set(self._tasks), timeout=self.shutdown_grace_seconds)
+        for task in pending:
+            # The job is handed back (FAL request id included) for another worker to resume
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+
+    async def _process(self, row: Dict[str, Any]) -> None:
+        job = GenerationJob.from_row(row)
+        self.counters["claimed"] += 1
+        run = None
+        try:
+            if job.attempts > self.queue.max_attempts:
+                await self._fail(job, f"gave up after {job.attempts - 1} attempts")
+                return
+            kind = self.store.kinds.get(job.kind)
+            if kind is None:
+                await self._fail(job, f"unknown job kind {job.kind}")
+                return
+
+            if job.fal_request_id:
+                self.counters["resumed"] += 1
+                print(f"🔁 Resuming generation job {job.id} (FAL request {job.fal_request_id})")
+            run = asyncio.create_task(run_job(job, kind, release_when_saturated=True, use_webhooks=True))
+            await self._follow(job, run)
+        except LeaseLost:
+            self.counters["leases_lost"] += 1
+            print(f"⚠️  Lost the lease on generation job {job.id}, another worker owns it now")
+            if run:
+                run.cancel()
+        except Exception as e:
+            # Usually the queue database being unreachable: the lease lapses and the job is retried
+            print(f"❌ Generation worker lost track of job {job.id}: {e}")
+            if run:
+                run.cancel()
+        except asyncio.CancelledError:
+            if run:
+                run.cancel()
+                await asyncio.gather(run, return_exceptions=True)
+            await self._release(job)
+            raise
+
+    async def _follow(self, job: GenerationJob, run: asyncio.Task) -> None:
+        """Mirror the job's progress into its row until it finishes"""
+        heartbeat_seconds = self.queue.lease_seconds / 3
+        next_heartbeat = time.monotonic() + heartbeat_seconds
+        saved_version = job.version
+        last_webhook = None
+        while True:
+            timeout = max(next_heartbeat - time.monotonic(), 0)
+            if fal_webhooks.is_waiting(job.id):
+                timeout = min(timeout, self.webhook_poll_seconds)
+            changed = asyncio.ensure_future(job.wait_for_change(saved_version, timeout=timeout))
+            await asyncio.wait({run, changed}, return_when=asyncio.FIRST_COMPLETED)
+            changed.cancel()
+
+            if run.done() and isinstance(run.exception(), AdmissionRejected):
+                # This worker is saturated for the model: let the queue hold the job
+                await self._release(job, delay_seconds=run.exception().retry_after)
+                return
+
+            if job.version == saved_version and not run.done() and time.monotonic() < next_heartbeat:
+                # Nothing to save yet: only look for a parked webhook
+                self.counters["webhook_polls"] += 1
+                row = await self.queue.fetch(job.id) or {}
+            else:
+                state = job.state() if job.version != saved_version else None
+                saved_version = job.version
+                row = await self._save(job, state)
+                next_heartbeat = time.monotonic() + heartbeat_seconds
+            if row.get("webhook_body") and row["webhook_body"] != last_webhook:
+                last_webhook = row["webhook_body"]
+                fal_webhooks.resolve(job.id)
+            if job.is_finished:
+                self.counters["completed" if job.status == "completed" else "failed"] += 1
+                return
+            if run.done():
+                # run_job always finishes the job, so this is an unexpected crash
+                run.result()
+                return
+
+    async def _fail(self, job: GenerationJob, reason: str) -> None:
+        job.update(status="failed", queue_position=None, error=f"Generation failed: {reason}")
+        await self._save(job, job.state())
+        self.counters["failed"] += 1
+
+    async def _save(self, job: GenerationJob, state: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        return await self.queue.save(job.id, self.worker_id, state)
+
+    async def _release(self, job: GenerationJob, delay_seconds: float = 0) -> None:
+        self.counters["released"] += 1
+        try:
+            await self.queue.release(job.id, self.worker_id, delay_seconds=delay_seconds)
+        except Exception as e:
+            # The lease still runs out on its own
+            print(f"⚠️  Could not release generation job {job.id}: {e}")
+
+    async def _maybe_prune(self) -> None:
+        if time.monotonic() - self._last_prune < PRUNE_INTERVAL_SECONDS:
+            return
+        self._last_prune = time.monotonic()
+        try:
+            removed = await self.queue.prune()
+            if removed:
+                print(f"🧹 Pruned {removed} finished generation jobs")
+        except Exception as e:
+            print(f"⚠️  Pruning finished jobs failed: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self.counters,
+            "worker_id": self.worker_id,
+            "running": len(self._tasks),
+            "claims_by_class": dict(self.queue.claims_by_class),
+            "starved_claims": dict(self.queue.starved_claims),
+        }
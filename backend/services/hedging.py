@@ -0,0 +1,138 @@
+"""
+Hedged Requests Service
+
+Cuts tail latency for FAL calls. Each endpoint's recent latencies are tracked;
+when the primary call is still running past a configurable percentile of that
+distribution, a duplicate ("hedge") is sent to the next model in the fallback
+chain. The first successful result wins and the other attempts are cancelled.
+A failed attempt fails over to the next fallback immediately.
+
+Environment Variables:
+- FAL_HEDGE_ENABLED: Set to "false" to disable hedging (default: true)
+- FAL_HEDGE_PERCENTILE: Latency percentile that triggers a hedge (default: 0.9)
+- FAL_HEDGE_MIN_SAMPLES: Observations needed before hedging an endpoint (default: 20)
+- FAL_HEDGE_WINDOW: Recent latencies kept per endpoint (default: 200)
+"""
+
+import asyncio
+import os
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+
+FAL_HEDGE_ENABLED = os.getenv("FAL_HEDGE_ENABLED", "true").lower() != "false"
+FAL_HEDGE_PERCENTILE = float(os.getenv("FAL_HEDGE_PERCENTILE", "0.9"))
+FAL_HEDGE_MIN_SAMPLES = int(os.getenv("FAL_HEDGE_MIN_SAMPLES", "20"))
+FAL_HEDGE_WINDOW = int(os.getenv("FAL_HEDGE_WINDOW", "200"))
+
+
+class DeadlineExceeded(Exception):
+    """No attempt finished within the request's deadline budget"""
+
+    def __init__(self, deadline_seconds: float):
+        self.deadline_seconds = deadline_seconds
+        super().__init__(f"deadline of {deadline_seconds}s exceeded")
+
+
+class HedgePolicy:
+    """Rolling latency windows per endpoint and hedge/deadline bookkeeping"""
+
+    def __init__(
+        self,
+        enabled: bool = FAL_HEDGE_ENABLED,
+        percentile: float = FAL_HEDGE_PERCENTILE,
+        min_samples: int = FAL_HEDGE_MIN_SAMPLES,
+        window: int = FAL_HEDGE_WINDOW,
+    ):
+        self.enabled = enabled
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self.window = window
+        self._latencies: Dict[str, Deque[float]] = {}
+        self.counters = {
+            "calls": 0,
+            "hedges_launched": 0,
+            "failovers": 0,
+            "primary_wins": 0,
+            "fallback_wins": 0,
+            "deadline_exceeded": 0,
+        }
+
+    def record(self, endpoint: str, seconds: float) -> None:
+        if endpoint not in self._latencies:
+            self._latencies[endpoint] = deque(maxlen=self.window)
+        self._latencies[endpoint].append(seconds)
+
+    def hedge_delay(self, endpoint: str) -> Optional[float]:
+        """Seconds to wait on `endpoint` before hedging, None if we don't know enough yet"""
+        samples = self._latencies.get(endpoint)
+        if not self.enabled or not samples or len(samples) < self.min_samples:
+            return None
+        ordered = sorted(samples)
+        index = min(len(ordered) - 1, int(self.percentile * len(ordered)))
+        return ordered[index]
+
+    async def run(
+        self,
+        attempts: List[Callable[[], Awaitable[Any]]],
+        hedge_delay: Optional[float],
+        deadline_seconds: Optional[float] = None,
+    ) -> Tuple[Any, int]:
+        """
+        Run attempts[0], starting the next attempt after `hedge_delay` or as soon as
+        every running attempt has failed. Returns (result, index of the winning attempt).
+        """
+        self.counters["calls"] += 1
+        tasks: List[asyncio.Task] = []
+        remaining = list(attempts)
+        last_error: Optional[BaseException] = None
+
+        def launch() -> None:
+            tasks.append(asyncio.create_task(remaining.pop(0)()))
+
+        try:
+            async with asyncio.timeout(deadline_seconds):
+                launch()
+                while True:
+                    running = [task for task in tasks if not task.done()]
+                    timeout = hedge_delay if remaining else None
+                    done, _ = await asyncio.wait(running, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+
+                    for task in done:
+                        if task.exception() is None:
+                            winner = tasks.index(task)
+                            self.counters["primary_wins" if winner == 0 else "fallback_wins"] += 1
+                            return task.result(), winner
+                        last_error = task.exception()
+
+                    still_running = any(not task.done() for task in tasks)
+                    if not done and remaining:
+                        # Primary is past the hedge point: race a duplicate against it
+                        self.counters["hedges_launched"] += 1
+                        launch()
+                    elif not still_running:
+                        if not remaining:
+                            raise last_error
+                        self.counters["failovers"] += 1
+                        launch()
+        except TimeoutError:
+            self.counters["deadline_exceeded"] += 1
+            raise DeadlineExceeded(deadline_seconds)
+        finally:
+            # Losers (and everything on deadline/cancellation) are cancelled
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self.counters,
+            "enabled": self.enabled,
+            "percentile": self.percentile,
+            "hedge_delay_seconds": {
+                endpoint: self.hedge_delay(endpoint) for endpoint in self._latencies
+            },
+        }
+
+
+# Global instance
+fal_hedging = HedgePolicy()
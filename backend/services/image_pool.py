@@ -0,0 +1,70 @@
+"""
+Image Process Pool
+
+One process pool shared by every CPU-bound image job (input preparation in
+services/image_prep.py, WebP derivatives in services/derivatives.py). A pool per
+service, each sized to the core count, oversubscribed the machine as soon as both
+were busy. Decoding is capped at IMAGE_MAX_PIXELS in the worker processes, so a
+small file that expands to a huge bitmap is rejected instead of exhausting memory.
+
+Environment Variables:
+- IMAGE_POOL_WORKERS: Worker processes (default: half the CPU count, at least 1)
+- IMAGE_MAX_PIXELS: Largest image decoded, in pixels (default: 64,000,000)
+"""
+
+import asyncio
+import os
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+try:
+    from PIL import Image
+    PIL_AVAILABLE = True
+except ImportError:
+    PIL_AVAILABLE = False
+
+IMAGE_POOL_WORKERS = int(os.getenv("IMAGE_POOL_WORKERS", str(max(1, (os.cpu_count() or 1) // 2))))
+IMAGE_MAX_PIXELS = int(os.getenv("IMAGE_MAX_PIXELS", "64000000"))
+
+
+def limit_decoding(max_pixels: int = IMAGE_MAX_PIXELS) -> None:
+    """Make Pillow refuse images over `max_pixels` (Pillow only warns below 2x its limit)"""
+    if PIL_AVAILABLE:
+        Image.MAX_IMAGE_PIXELS = max_pixels
+        warnings.simplefilter("error", Image.DecompressionBombWarning)
+
+
+limit_decoding()
+
+
+class ImagePool:
+    """Lazily started process pool with a fixed number of workers"""
+
+    def __init__(self, workers: int = IMAGE_POOL_WORKERS, max_pixels: int = IMAGE_MAX_PIXELS):
+        self.workers = max(1, workers)
+        self.max_pixels = max_pixels
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    def start(self) -> None:
+        if self._pool is None and PIL_AVAILABLE:
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers, initializer=limit_decoding, initargs=(self.max_pixels,)
+            )
+
+    def shutdown(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+            self._pool = None
+
+    async def run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        if self._pool is None:
+            self.start()
+        return await asyncio.get_running_loop().run_in_executor(self._pool, fn, *args)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"workers": self.workers, "max_pixels": self.max_pixels, "started": self._pool is not None}
+
+
+# Global instance
+image_pool = ImagePool()
@@ -0,0 +1,211 @@
+"""
+Image Preparation Service
+
+Normalizes input images before they are sent to FAL. It applies the EXIF
+orientation, downscales to the model's max input resolution and re-encodes to a
+quality-tuned JPEG/WebP. Full-resolution camera photos otherwise inflate FAL's
+prepare time for no quality gain. Decoding and encoding are CPU-bound, so they
+run in the shared image process pool (services/image_pool.py) and the event
+loop stays free. Only images on our bucket or FAL's CDN are fetched (see
+services/input_urls.py); any other URL is sent to FAL as is.
+
+Environment Variables:
+- IMAGE_PREP_ENABLED: Normalize generation inputs (default: false)
+- IMAGE_PREP_MAX_PIXELS: Default max input resolution in pixels (default: 2,000,000)
+- IMAGE_PREP_FORMAT: "jpeg" or "webp" (default: jpeg). Images with alpha always use WebP
+- IMAGE_PREP_QUALITY: Encoder quality (default: 88)
+"""
+
+import io
+import math
+import os
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Tuple
+
+from services.image_pool import ImagePool, image_pool
+from services.input_urls import InputImageTooLarge, is_trusted_image_url, stream_image
+from services.metrics import Histogram
+from services.storage import public_url
+from services.upload_dedupe import upload_index
+
+try:
+    from PIL import Image, ImageOps
+    PIL_AVAILABLE = True
+except ImportError:
+    print("⚠️  Pillow not available, image preparation disabled")
+    PIL_AVAILABLE = False
+
+IMAGE_PREP_ENABLED = os.getenv("IMAGE_PREP_ENABLED", "false").lower() == "true"
+IMAGE_PREP_MAX_PIXELS = int(os.getenv("IMAGE_PREP_MAX_PIXELS", "2000000"))
+IMAGE_PREP_FORMAT = os.getenv("IMAGE_PREP_FORMAT", "jpeg").lower()
+IMAGE_PREP_QUALITY = int(os.getenv("IMAGE_PREP_QUALITY", "88"))
+
+# Source images larger than this are passed through untouched
+IMAGE_PREP_MAX_SOURCE_BYTES = 50 * 1024 * 1024
+# Source URL -> prepared URL, so hot template images are only prepared once.
+# Hits are re-checked against the upload index, which HEADs (and re-stamps) objects
+# near the temp sweeper's age, so a swept temp/prepared/ object is prepared again.
+PREPARED_URL_MAX_ENTRIES = 512
+
+CONTENT_TYPES = {"jpeg": "image/jpeg", "webp": "image/webp"}
+EXTENSIONS = {"jpeg": "jpg", "webp": "webp"}
+
+
+@dataclass
+class PreparedImage:
+    data: bytes
+    content_type: str
+    extension: str
+    width: int
+    height: int
+    changed: bool
+
+
+def normalize_image(data: bytes, max_pixels: int, fmt: str, quality: int) -> PreparedImage:
+    """Orient, downscale and re-encode one image (runs in a worker process)"""
+    with Image.open(io.BytesIO(data)) as source:
+        original_format = (source.format or "").lower()
+        width, height = source.size
+        scale = math.sqrt(max_pixels / (width * height)) if width * height > max_pixels else 1.0
+        target = (max(1, int(width * scale)), max(1, int(height * scale)))
+        if scale < 1.0 and original_format == "jpeg":
+            # Let libjpeg decode at a reduced size (up to 8x less work) before resampling
+            source.draft("RGB", target)
+
+        orientation = source.getexif().get(0x0112, 1)
+        image = ImageOps.exif_transpose(source)
+        if scale < 1.0:
+            # exif_transpose may have swapped the axes
+            swapped = orientation in (5, 6, 7, 8)
+            image = image.resize(target[::-1] if swapped else target, Image.LANCZOS)
+
+        has_alpha = image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info)
+        if has_alpha:
+            fmt = "webp"
+            image = image.convert("RGBA")
+        elif image.mode != "RGB":
+            image = image.convert("RGB")
+
+        output = io.BytesIO()
+        if fmt == "webp":
+            image.save(output, format="WEBP", quality=quality, method=4)
+        else:
+            image.save(output, format="JPEG", quality=quality, optimize=True, progressive=True)
+        encoded = output.getvalue()
+
+    # Nothing to fix and re-encoding didn't help: keep the original bytes
+    if scale >= 1.0 and orientation == 1 and len(encoded) >= len(data):
+        return PreparedImage(data, f"image/{original_format or 'jpeg'}", EXTENSIONS.get(original_format, original_format or "jpg"), width, height, False)
+    return PreparedImage(encoded, CONTENT_TYPES[fmt], EXTENSIONS[fmt], image.width, image.height, True)
+
+
+class ImagePreparer:
+    """Image normalization on the shared pool, plus bytes/time saved bookkeeping"""
+
+    def __init__(
+        self,
+        enabled: bool = IMAGE_PREP_ENABLED,
+        max_pixels: int = IMAGE_PREP_MAX_PIXELS,
+        fmt: str = IMAGE_PREP_FORMAT,
+        quality: int = IMAGE_PREP_QUALITY,
+        pool: ImagePool = image_pool,
+    ):
+        self.enabled = enabled and PIL_AVAILABLE
+        self.max_pixels = max_pixels
+        self.fmt = fmt if fmt in CONTENT_TYPES else "jpeg"
+        self.quality = quality
+        self.pool = pool
+        # cache key -> (prepared URL, its temp/prepared/ object or None when the source is used as is)
+        self._prepared_urls: "OrderedDict[str, Tuple[str, Optional[str]]]" = OrderedDict()
+        self.prepare_seconds = Histogram()
+        self.counters = {
+            "images": 0,
+            "changed": 0,
+            "failures": 0,
+            "untrusted": 0,
+            "url_hits": 0,
+            "url_stale": 0,
+            "bytes_in": 0,
+            "bytes_out": 0,
+        }
+
+    async def normalize(self, data: bytes, max_pixels: Optional[int] = None) -> PreparedImage:
+        started = time.perf_counter()
+        prepared = await self.pool.run(normalize_image, data, max_pixels or self.max_pixels, self.fmt, self.quality)
+        self.prepare_seconds.observe(time.perf_counter() - started)
+        self.counters["images"] += 1
+        self.counters["changed"] += int(prepared.changed)
+        self.counters["bytes_in"] += len(data)
+        self.counters["bytes_out"] += len(prepared.data)
+        return prepared
+
+    async def prepare_url(self, url: str, max_pixels: Optional[int] = None) -> str:
+        """
+        URL of a normalized copy of the image at `url` (stored under
+        temp/prepared/<content hash>). Best effort: on any failure the original
+        URL is returned so generation is never blocked by preparation. URLs that
+        aren't on our bucket or FAL's CDN are returned without being fetched.
+        """
+        if not is_trusted_image_url(url):
+            self.counters["untrusted"] += 1
+            return url
+        cache_key = f"{max_pixels or self.max_pixels}:{url}"
+        entry = self._prepared_urls.get(cache_key)
+        if entry:
+            prepared_url, object_name = entry
+            if object_name is None or await upload_index.exists(object_name):
+                self._prepared_urls.move_to_end(cache_key)
+                self.counters["url_hits"] += 1
+                return prepared_url
+            # Swept since it was prepared: FAL would get a dead URL
+            del self._prepared_urls[cache_key]
+            self.counters["url_stale"] += 1
+
+        object_name = None
+        try:
+            data = await self._download(url)
+            if data is None:
+                return url
+            prepared = await self.normalize(data, max_pixels)
+            if not prepared.changed:
+                prepared_url = url
+            else:
+                object_name, _ = await upload_index.store_bytes(
+                    prepared.data, prepared.content_type, prepared.extension, prefix="temp/prepared/"
+                )
+                prepared_url = public_url(object_name)
+        except Exception as e:
+            self.counters["failures"] += 1
+            print(f"⚠️  Image preparation failed for {url}: {e}")
+            return url
+
+        self._prepared_urls[cache_key] = (prepared_url, object_name)
+        if len(self._prepared_urls) > PREPARED_URL_MAX_ENTRIES:
+            self._prepared_urls.popitem(last=False)
+        return prepared_url
+
+    async def _download(self, url: str) -> Optional[bytes]:
+        buffer = bytearray()
+        try:
+            async for chunk in stream_image(url, IMAGE_PREP_MAX_SOURCE_BYTES):
+                buffer += chunk
+        except InputImageTooLarge:
+            return None
+        return bytes(buffer)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self.counters,
+            "enabled": self.enabled,
+            "bytes_saved": self.counters["bytes_in"] - self.counters["bytes_out"],
+            "max_pixels": self.max_pixels,
+            "format": self.fmt,
+            "quality": self.quality,
+            "prepare_seconds": self.prepare_seconds.snapshot(),
+        }
+
+
+# Global instance
+image_prep = ImagePreparer()
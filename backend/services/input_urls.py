@@ -0,0 +1,74 @@
+"""
+Input Image URLs
+
+Generation requests carry client-supplied image URLs that FAL fetches. The API
+server only fetches one itself (to hash it for the generation cache or to
+normalize it before sending it to FAL) when it points at our bucket or FAL's
+CDN. Any other URL is passed to FAL untouched, so a request can't make the
+server reach internal hosts. Redirects are not followed, and reads stop at a
+byte cap that is checked against Content-Length before the body is read.
+
+Environment Variables:
+- TRUSTED_IMAGE_HOSTS: Extra comma-separated hosts whose images may be fetched (default: none)
+"""
+
+import os
+from typing import AsyncIterator
+from urllib.parse import urlsplit
+
+import httpx
+
+from services.storage import public_url
+
+TRUSTED_IMAGE_HOSTS = {host.strip().lower() for host in os.getenv("TRUSTED_IMAGE_HOSTS", "").split(",") if host.strip()}
+
+# FAL serves uploads and results from fal.media subdomains (v3.fal.media, ...)
+FAL_MEDIA_DOMAIN = "fal.media"
+INPUT_IMAGE_MAX_BYTES = 50 * 1024 * 1024
+
+
+class InputImageTooLarge(ValueError):
+    pass
+
+
+def is_trusted_image_url(url: str) -> bool:
+    """Whether the server may fetch `url`: our bucket, FAL's CDN or TRUSTED_IMAGE_HOSTS"""
+    if not isinstance(url, str):
+        return False
+    if url.startswith(public_url("")) and ".." not in url.split("/"):
+        return True
+    try:
+        parts = urlsplit(url)
+        host = (parts.hostname or "").lower()
+        port = parts.port
+    except ValueError:
+        return False
+    if parts.scheme != "https" or port not in (None, 443) or parts.username or parts.password:
+        return False
+    return host == FAL_MEDIA_DOMAIN or host.endswith("." + FAL_MEDIA_DOMAIN) or host in TRUSTED_IMAGE_HOSTS
+
+
+async def stream_image(url: str, max_bytes: int = INPUT_IMAGE_MAX_BYTES) -> AsyncIterator[bytes]:
+    """
+    Body of a trusted image URL in chunks. Raises ValueError for an untrusted
+    URL, InputImageTooLarge past `max_bytes` and httpx errors for failed fetches
+    (a redirect counts as one).
+    """
+    if not is_trusted_image_url(url):
+        raise ValueError("not a trusted image URL")
+    async with httpx.AsyncClient(timeout=30.0, follow_redirects=False) as client:
+        async with client.stream("GET", url) as response:
+            response.raise_for_status()
+            if response.status_code != 200:
+                raise httpx.HTTPStatusError(
+                    f"unexpected status {response.status_code}", request=response.request, response=response
+                )
+            declared = response.headers.get("content-length")
+            if declared and declared.isdigit() and int(declared) > max_bytes:
+                raise InputImageTooLarge(f"image is {declared} bytes, over the {max_bytes} byte limit")
+            received = 0
+            async for chunk in response.aiter_bytes():
+                received += len(chunk)
+                if received > max_bytes:
+                    raise InputImageTooLarge(f"image is over the {max_bytes} byte limit")
+                yield chunk
@@ -0,0 +1,643 @@
+"""
+Generation Job Queue
+
+Durable table of background generations, so paid jobs survive deploys and
+crashed workers and can be spread over several machines. With a queue
+configured the API only enqueues rows and reads their status. Worker processes
+(scripts/run_generation_worker.py) claim rows, run the FAL call and write
+progress back.
+
+A claim is a lease (locked_by / locked_until) that the worker keeps extending
+while the job runs. When a lease runs out, another worker claims the job. If
+the job was already submitted, that worker follows the existing FAL request
+instead of paying for a second one.
+
+Jobs carry a priority class derived from the plan of the organization they
+are submitted for. The organization only counts when the authenticated user
+submitting the job owns it or is an active member; otherwise the job gets the
+default class. Workers pick classes by weighted-fair (stride) scheduling: with
+every class busy, live-event tiers get most claims but free-tier creators still
+get their share.
+
+Each class also ages on its own. Once the oldest job of a class has waited
+longer than the class's starvation_seconds (default JOB_STARVATION_SECONDS),
+that class is served before classes with no starved jobs. Starved classes still
+take turns by weight, so under any backlog a starved class of weight w gets
+roughly one of every W / w claims, where W is the sum of all weights (1 in 10
+for "standard" with the default classes). Its oldest job therefore waits at most
+its threshold plus about W / w claims. Queue wait per class is exported by
+stats() for the metrics endpoint.
+
+Backends:
+- Postgres (asyncpg): rows are claimed with FOR UPDATE SKIP LOCKED, so workers
+  never wait on each other. Schema: migrations/020_generation_job_queue.sql and
+  migrations/021_generation_queue_priority.sql
+- SQLite (local development): claims are serialized by the database write lock
+
+Environment Variables:
+- JOB_QUEUE_URL: postgresql://... or sqlite:///path/to/jobs.db (unset: jobs run
+  in-process on the API worker, as before)
+- JOB_LEASE_SECONDS: How long a claim holds without a heartbeat (default: 60)
+- JOB_MAX_ATTEMPTS: Claims allowed before a job is failed for good (default: 3)
+- JOB_RETENTION_HOURS: How long finished rows are kept for status reads (default: 24)
+- JOB_PRIORITY_CLASSES: JSON override of the priority classes,
+  e.g. {"event": {"weight": 8, "plans": ["business_eventpro"], "starvation_seconds": 30}, "standard": {"weight": 1}}
+- JOB_STARVATION_SECONDS: Wait after which a class counts as starved, for classes
+  without their own starvation_seconds (default: 120)
+- JOB_LATENCY_WINDOW_SECONDS: Window of recent claims the queue wait stats cover (default: 900)
+"""
+
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from services.metrics import Histogram
+
+try:
+    import asyncpg
+    ASYNCPG_AVAILABLE = True
+except ImportError:
+    asyncpg = None
+    ASYNCPG_AVAILABLE = False
+
+JOB_QUEUE_URL = os.getenv("JOB_QUEUE_URL", "")
+JOB_LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", "60"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+JOB_RETENTION_HOURS = float(os.getenv("JOB_RETENTION_HOURS", "24"))
+JOB_STARVATION_SECONDS = float(os.getenv("JOB_STARVATION_SECONDS", "120"))
+JOB_LATENCY_WINDOW_SECONDS = float(os.getenv("JOB_LATENCY_WINDOW_SECONDS", "900"))
+
+# Plans from migrations 008/014. Jobs without a known plan fall into DEFAULT_PRIORITY_CLASS.
+DEFAULT_PRIORITY_CLASSES = {
+    # Guests are waiting in line at the booth
+    "event_premium": {"weight": 6, "plans": ["business_eventpro", "business_masters"]},
+    "event": {"weight": 3, "plans": ["business_starter"]},
+    # Creators and free tier
+    "standard": {"weight": 1, "plans": []},
+}
+DEFAULT_PRIORITY_CLASS = "standard"
+
+try:
+    JOB_PRIORITY_CLASSES = json.loads(os.getenv("JOB_PRIORITY_CLASSES", "null")) or DEFAULT_PRIORITY_CLASSES
+except ValueError:
+    print("⚠️  JOB_PRIORITY_CLASSES is not valid JSON, using defaults")
+    JOB_PRIORITY_CLASSES = DEFAULT_PRIORITY_CLASSES
+
+# Organization plans are re-read this often
+PLAN_CACHE_SECONDS = 300
+
+TABLE = "generation_queue"
+JSON_COLUMNS = {"arguments", "logs", "result", "webhook_body"}
+FINISHED = ("completed", "failed")
+
+SQLITE_SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS {TABLE} (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    model_id TEXT NOT NULL,
+    fal_model_id TEXT NOT NULL,
+    arguments TEXT NOT NULL,
+    timeout_seconds REAL,
+    status TEXT NOT NULL DEFAULT 'queued',
+    queue_position INTEGER,
+    fal_request_id TEXT,
+    logs TEXT NOT NULL DEFAULT '[]',
+    result TEXT,
+    error TEXT,
+    webhook_body TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    locked_by TEXT,
+    locked_until REAL,
+    version INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_{TABLE}_pending ON {TABLE} (created_at) WHERE status NOT IN ('completed', 'failed');
+"""
+# Added after the first schema; existing local databases get them on open
+SQLITE_ADDED_COLUMNS = {
+    "priority_class": f"TEXT NOT NULL DEFAULT '{DEFAULT_PRIORITY_CLASS}'",
+    "organization_id": "TEXT",
+    "started_at": "REAL",
+}
+SQLITE_INDEXES = f"""
+CREATE INDEX IF NOT EXISTS idx_{TABLE}_class_pending ON {TABLE} (priority_class, created_at) WHERE status NOT IN ('completed', 'failed');
+CREATE INDEX IF NOT EXISTS idx_{TABLE}_started ON {TABLE} (started_at);
+"""
+
+
+class LeaseLost(Exception):
+    """Another worker claimed the job (our lease ran out)"""
+
+
+def _claim_filter(priority_class: Optional[str], created_before: Optional[float], placeholder) -> Tuple[str, list]:
+    """Extra WHERE conditions (and their values) for a class or starvation claim"""
+    conditions, values = [], []
+    if priority_class is not None:
+        conditions.append(f"priority_class = {placeholder(len(values))}")
+        values.append(priority_class)
+    if created_before is not None:
+        conditions.append(f"created_at < {placeholder(len(values))}")
+        values.append(created_before)
+    return "".join(f" AND {condition}" for condition in conditions), values
+
+
+def _set_clause(fields: Dict[str, Any], increments: Dict[str, int], placeholder) -> str:
+    assignments = [f"{column} = {placeholder(i)}" for i, column in enumerate(fields)]
+    assignments += [f"{column} = {column} + {int(step)}" for column, step in increments.items()]
+    return ", ".join(assignments)
+
+
+class PostgresJobBackend:
+    """Job rows in Postgres, claimed with FOR UPDATE SKIP LOCKED"""
+
+    def __init__(self, dsn: str):
+        self.dsn = dsn
+        self._pool = None
+
+    async def start(self) -> None:
+        if not ASYNCPG_AVAILABLE:
+            raise RuntimeError("asyncpg is required for a postgresql:// JOB_QUEUE_URL")
+
+        async def init(conn):
+            await conn.set_type_codec("jsonb", encoder=json.dumps, decoder=json.loads, schema="pg_catalog")
+
+        self._pool = await asyncpg.create_pool(self.dsn, min_size=1, max_size=10, init=init)
+
+    async def close(self) -> None:
+        if self._pool:
+            await self._pool.close()
+            self._pool = None
+
+    async def insert(self, row: Dict[str, Any]) -> None:
+        columns = list(row)
+        values = ", ".join(f"${i + 1}" for i in range(len(columns)))
+        await self._pool.execute(
+            f"INSERT INTO {TABLE} ({', '.join(columns)}) VALUES ({values})", *row.values()
+        )
+
+    async def claim(
+        self,
+        worker_id: str,
+        now: float,
+        locked_until: float,
+        priority_class: Optional[str] = None,
+        created_before: Optional[float] = None,
+    ) -> Optional[Dict[str, Any]]:
+        extra, values = _claim_filter(priority_class, created_before, lambda i: f"${i + 4}")
+        row = await self._pool.fetchrow(
+            f"""
+            UPDATE {TABLE} AS q
+            SET locked_by = $1, locked_until = $2, attempts = q.attempts + 1, updated_at = $3,
+                started_at = COALESCE(q.started_at, $3)
+            WHERE q.id = (
+                SELECT id FROM {TABLE}
+                WHERE status NOT IN ('completed', 'failed')
+                  AND (locked_until IS NULL OR locked_until < $3){extra}
+                ORDER BY created_at
+                FOR UPDATE SKIP LOCKED
+                LIMIT 1
+            )
+            RETURNING q.*
+            """,
+            worker_id, locked_until, now, *values,
+        )
+        return dict(row) if row else None
+
+    async def update(
+        self,
+        job_id: str,
+        fields: Dict[str, Any],
+        increments: Optional[Dict[str, int]] = None,
+        worker_id: Optional[str] = None,
+        active_only: bool = False,
+    ) -> Optional[Dict[str, Any]]:
+        """Update one row; None when it doesn't exist or the conditions don't match"""
+        n = len(fields)
+        sql = f"UPDATE {TABLE} SET {_set_clause(fields, increments or {}, lambda i: f'${i + 2}')} WHERE id = $1"
+        args = [job_id, *fields.values()]
+        if worker_id is not None:
+            sql += f" AND locked_by = ${n + 2}"
+            args.append(worker_id)
+        if active_only:
+            sql += " AND status NOT IN ('completed', 'failed')"
+        row = await self._pool.fetchrow(sql + " RETURNING *", *args)
+        return dict(row) if row else None
+
+    async def fetch(self, job_id: str) -> Optional[Dict[str, Any]]:
+        row = await self._pool.fetchrow(f"SELECT * FROM {TABLE} WHERE id = $1", job_id)
+        return dict(row) if row else None
+
+    async def delete_finished(self, before: float) -> int:
+        result = await self._pool.execute(
+            f"DELETE FROM {TABLE} WHERE status IN ('completed', 'failed') AND updated_at < $1", before
+        )
+        return int(result.split()[-1])
+
+    async def counts(self) -> List[Dict[str, Any]]:
+        rows = await self._pool.fetch(
+            f"""
+            SELECT priority_class, status, count(*) AS jobs, min(created_at) AS oldest
+            FROM {TABLE} GROUP BY priority_class, status
+            """
+        )
+        return [dict(row) for row in rows]
+
+    async def queue_waits(self, since: float) -> List[Tuple[str, float]]:
+        rows = await self._pool.fetch(
+            f"SELECT priority_class, started_at - created_at AS wait FROM {TABLE} WHERE started_at >= $1", since
+        )
+        return [(row["priority_class"], row["wait"]) for row in rows]
+
+    async def organization_plan(self, organization_id: str, user_id: str) -> Optional[str]:
+        """
+        Plan of an organization (migration 014) that `user_id` owns or is an
+        active member of, when the queue shares the main database
+        """
+        try:
+            return await self._pool.fetchval(
+                """
+                SELECT o.plan FROM organizations o
+                WHERE o.id::text = $1
+                  AND (o.owner_user_id::text = $2 OR EXISTS (
+                      SELECT 1 FROM organization_members m
+                      WHERE m.organization_id = o.id AND m.user_id::text = $2 AND m.status = 'active'
+                  ))
+                """,
+                organization_id, user_id,
+            )
+        except asyncpg.UndefinedTableError:
+            return None
+
+
+class SqliteJobBackend:
+    """Job rows in a local SQLite file; a write transaction serializes claims"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    async def start(self) -> None:
+        await asyncio.to_thread(self._open)
+
+    def _open(self) -> None:
+        if os.path.dirname(self.path):
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        # Autocommit; claims open their own IMMEDIATE transaction
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(SQLITE_SCHEMA)
+        existing = {row["name"] for row in conn.execute(f"PRAGMA table_info({TABLE})")}
+        for column, definition in SQLITE_ADDED_COLUMNS.items():
+            if column not in existing:
+                conn.execute(f"ALTER TABLE {TABLE} ADD COLUMN {column} {definition}")
+        conn.executescript(SQLITE_INDEXES)
+        self._conn = conn
+
+    async def close(self) -> None:
+        if self._conn:
+            await asyncio.to_thread(self._conn.close)
+            self._conn = None
+
+    async def _run(self, fn, *args):
+        def locked():
+            with self._lock:
+                return fn(*args)
+        return await asyncio.to_thread(locked)
+
+    @staticmethod
+    def _encode(values: Iterable[Any], columns: Iterable[str]) -> list:
+        return [
+            json.dumps(value) if column in JSON_COLUMNS and value is not None else value
+            for column, value in zip(columns, values)
+        ]
+
+    @staticmethod
+    def _decode(row: Optional[sqlite3.Row]) -> Optional[Dict[str, Any]]:
+        if row is None:
+            return None
+        decoded = dict(row)
+        for column in JSON_COLUMNS:
+            if decoded.get(column) is not None:
+                decoded[column] = json.loads(decoded[column])
+        return decoded
+
+    async def insert(self, row: Dict[str, Any]) -> None:
+        columns = list(row)
+        sql = f"INSERT INTO {TABLE} ({', '.join(columns)}) VALUES ({', '.join('?' for _ in columns)})"
+        await self._run(self._conn.execute, sql, self._encode(row.values(), columns))
+
+    async def claim(
+        self,
+        worker_id: str,
+        now: float,
+        locked_until: float,
+        priority_class: Optional[str] = None,
+        created_before: Optional[float] = None,
+    ) -> Optional[Dict[str, Any]]:
+        extra, values = _claim_filter(priority_class, created_before, lambda i: "?")
+
+        def claim():
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                candidate = self._conn.execute(
+                    f"""
+                    SELECT id FROM {TABLE}
+                    WHERE status NOT IN ('completed', 'failed')
+                      AND (locked_until IS NULL OR locked_until < ?){extra}
+                    ORDER BY created_at
+                    LIMIT 1
+                    """,
+                    (now, *values),
+                ).fetchone()
+                row = None
+                if candidate:
+                    row = self._conn.execute(
+                        f"""
+                        UPDATE {TABLE}
+                        SET locked_by = ?, locked_until = ?, attempts = attempts + 1, updated_at = ?,
+                            started_at = COALESCE(started_at, ?)
+                        WHERE id = ?
+                        RETURNING *
+                        """,
+                        (worker_id, locked_until, now, now, candidate["id"]),
+                    ).fetchone()
+                self._conn.execute("COMMIT")
+                return self._decode(row)
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+        return await self._run(claim)
+
+    async def update(
+        self,
+        job_id: str,
+        fields: Dict[str, Any],
+        increments: Optional[Dict[str, int]] = None,
+        worker_id: Optional[str] = None,
+        active_only: bool = False,
+    ) -> Optional[Dict[str, Any]]:
+        """Update one row; None when it doesn't exist or the conditions don't match"""
+        sql = f"UPDATE {TABLE} SET {_set_clause(fields, increments or {}, lambda i: '?')} WHERE id = ?"
+        args = [*self._encode(fields.values(), fields), job_id]
+        if worker_id is not None:
+            sql += " AND locked_by = ?"
+            args.append(worker_id)
+        if active_only:
+            sql += " AND status NOT IN ('completed', 'failed')"
+        row = await self._run(lambda: self._conn.execute(sql + " RETURNING *", args).fetchone())
+        return self._decode(row)
+
+    async def fetch(self, job_id: str) -> Optional[Dict[str, Any]]:
+        row = await self._run(
+            lambda: self._conn.execute(f"SELECT * FROM {TABLE} WHERE id = ?", (job_id,)).fetchone()
+        )
+        return self._decode(row)
+
+    async def delete_finished(self, before: float) -> int:
+        cursor = await self._run(
+            self._conn.execute,
+            f"DELETE FROM {TABLE} WHERE status IN ('completed', 'failed') AND updated_at < ?",
+            (before,),
+        )
+        return cursor.rowcount
+
+    async def counts(self) -> List[Dict[str, Any]]:
+        rows = await self._run(lambda: self._conn.execute(
+            f"""
+            SELECT priority_class, status, count(*) AS jobs, min(created_at) AS oldest
+            FROM {TABLE} GROUP BY priority_class, status
+            """
+        ).fetchall())
+        return [dict(row) for row in rows]
+
+    async def queue_waits(self, since: float) -> List[Tuple[str, float]]:
+        rows = await self._run(lambda: self._conn.execute(
+            f"SELECT priority_class, started_at - created_at AS wait FROM {TABLE} WHERE started_at >= ?", (since,)
+        ).fetchall())
+        return [(row["priority_class"], row["wait"]) for row in rows]
+
+    async def organization_plan(self, organization_id: str, user_id: str) -> Optional[str]:
+        # Local queues have no organizations table
+        return None
+
+
+def create_backend(url: str):
+    if url.startswith(("postgres://", "postgresql://")):
+        return PostgresJobBackend(url)
+    if url.startswith("sqlite:///"):
+        return SqliteJobBackend(url[len("sqlite:///"):])
+    raise ValueError(f"Unsupported JOB_QUEUE_URL scheme: {url.split(':', 1)[0]}")
+
+
+class PriorityScheduler:
+    """
+    Stride scheduling over priority classes: each claim charges its class
+    1/weight, and the class with the least charge goes first. Classes with
+    nothing queued are skipped without being charged.
+    """
+
+    def __init__(self, classes: Dict[str, Dict[str, Any]] = JOB_PRIORITY_CLASSES):
+        self.weights = {name: max(float(spec.get("weight", 1)), 0.01) for name, spec in classes.items()}
+        self.weights.setdefault(DEFAULT_PRIORITY_CLASS, 1.0)
+        # Class -> its own starvation threshold (None: the queue's default)
+        self.starvation_seconds = {name: classes.get(name, {}).get("starvation_seconds") for name in self.weights}
+        self.plans = {plan: name for name, spec in classes.items() for plan in spec.get("plans", [])}
+        self._pass = {name: 0.0 for name in self.weights}
+        self._virtual_time = 0.0
+
+    def class_for_plan(self, plan: Optional[str]) -> str:
+        return self.plans.get(plan, DEFAULT_PRIORITY_CLASS)
+
+    def order(self) -> List[str]:
+        """Classes in the order to try them for the next claim"""
+        return sorted(self.weights, key=lambda name: (self._pass[name], -self.weights[name]))
+
+    def charge(self, name: str) -> None:
+        # A class that sat idle restarts at the current virtual time, so it can't
+        # bank credit and then monopolize the workers
+        start = max(self._pass[name], self._virtual_time)
+        self._virtual_time = start
+        self._pass[name] = start + 1 / self.weights[name]
+
+
+class JobQueue:
+    """Enqueue, lease and report on durable generation jobs"""
+
+    def __init__(
+        self,
+        url: str = JOB_QUEUE_URL,
+        lease_seconds: float = JOB_LEASE_SECONDS,
+        max_attempts: int = JOB_MAX_ATTEMPTS,
+        retention_hours: float = JOB_RETENTION_HOURS,
+        starvation_seconds: float = JOB_STARVATION_SECONDS,
+        latency_window_seconds: float = JOB_LATENCY_WINDOW_SECONDS,
+        scheduler: Optional[PriorityScheduler] = None,
+    ):
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.retention_seconds = retention_hours * 3600
+        self.starvation_seconds = starvation_seconds
+        self.latency_window_seconds = latency_window_seconds
+        self.scheduler = scheduler or PriorityScheduler()
+        self.backend = create_backend(url) if url else None
+        self._started = False
+        # (organization id, user id) -> (fetched_at, priority class)
+        self._plan_classes: Dict[Tuple[str, str], Tuple[float, str]] = {}
+        self.claims_by_class = {name: 0 for name in self.scheduler.weights}
+        self.starved_claims = {name: 0 for name in self.scheduler.weights}
+
+    @property
+    def enabled(self) -> bool:
+        return self.backend is not None
+
+    async def start(self) -> None:
+        if self.enabled and not self._started:
+            await self.backend.start()
+            self._started = True
+
+    async def close(self) -> None:
+        if self._started:
+            await self.backend.close()
+            self._started = False
+
+    async def enqueue(self, row: Dict[str, Any]) -> None:
+        now = time.time()
+        await self.backend.insert({**row, "attempts": 0, "version": 0, "created_at": now, "updated_at": now})
+
+    async def priority_class(self, organization_id: Optional[str], user_id: Optional[str]) -> str:
+        """
+        Priority class for a job `user_id` (the authenticated user, None for
+        guests) submits for `organization_id`, from the organization's plan
+        """
+        if not organization_id or not user_id:
+            return DEFAULT_PRIORITY_CLASS
+        cache_key = (organization_id, user_id)
+        cached = self._plan_classes.get(cache_key)
+        if cached and time.monotonic() - cached[0] < PLAN_CACHE_SECONDS:
+            return cached[1]
+        try:
+            plan = await self.backend.organization_plan(organization_id, user_id)
+        except Exception as e:
+            print(f"⚠️  Could not read the plan of organization {organization_id}: {e}")
+            plan = None
+        name = self.scheduler.class_for_plan(plan)
+        self._plan_classes[cache_key] = (time.monotonic(), name)
+        return name
+
+    def starvation_seconds_for(self, name: str) -> float:
+        threshold = self.scheduler.starvation_seconds.get(name)
+        return self.starvation_seconds if threshold is None else float(threshold)
+
+    async def claim(self, worker_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Lease the next runnable job (new, or abandoned by a dead worker): the
+        oldest job of the first class in stride order that has a starved job,
+        else the oldest of the first class in stride order that has any.
+        """
+        now = time.time()
+        locked_until = now + self.lease_seconds
+        order = self.scheduler.order()
+        for name in order:
+            row = await self.backend.claim(
+                worker_id, now, locked_until, priority_class=name,
+                created_before=now - self.starvation_seconds_for(name),
+            )
+            if row:
+                self.starved_claims[name] = self.starved_claims.get(name, 0) + 1
+                return self._claimed(name, row)
+        for name in order:
+            row = await self.backend.claim(worker_id, now, locked_until, priority_class=name)
+            if row:
+                return self._claimed(name, row)
+        return None
+
+    def _claimed(self, name: str, row: Dict[str, Any]) -> Dict[str, Any]:
+        # Starved claims are charged too, so starved classes still share by weight
+        self.scheduler.charge(name)
+        self.claims_by_class[name] = self.claims_by_class.get(name, 0) + 1
+        return row
+
+    async def save(self, job_id: str, worker_id: str, state: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        Extend our lease and, when given, write the job's new state. Returns the
+        stored row; raises LeaseLost if another worker took the job over.
+        """
+        now = time.time()
+        fields: Dict[str, Any] = {"locked_until": now + self.lease_seconds, "updated_at": now}
+        increments = {}
+        if state:
+            fields.update(state)
+            increments["version"] = 1
+            if state.get("status") in FINISHED:
+                fields["locked_until"] = None
+        row = await self.backend.update(job_id, fields, increments, worker_id=worker_id)
+        if row is None:
+            raise LeaseLost(job_id)
+        return row
+
+    async def release(self, job_id: str, worker_id: str, delay_seconds: float = 0, refund_attempt: bool = True) -> None:
+        """Give a claimed job back so any worker can pick it up after `delay_seconds`"""
+        fields = {"locked_by": None, "locked_until": time.time() + delay_seconds if delay_seconds else None}
+        await self.backend.update(
+            job_id, fields, {"attempts": -1} if refund_attempt else None, worker_id=worker_id, active_only=True
+        )
+
+    async def fetch(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return await self.backend.fetch(job_id)
+
+    async def deliver_webhook(self, job_id: str, body: Dict[str, Any]) -> bool:
+        """Park a FAL webhook on the row for whichever worker holds the job"""
+        row = await self.backend.update(job_id, {"webhook_body": body}, active_only=True)
+        return row is not None
+
+    async def prune(self) -> int:
+        return await self.backend.delete_finished(time.time() - self.retention_seconds)
+
+    async def stats(self) -> Dict[str, Any]:
+        if not self._started:
+            return {"enabled": self.enabled}
+        now = time.time()
+        counts = await self.backend.counts()
+        jobs: Dict[str, int] = {}
+        unfinished: Dict[str, int] = {}
+        oldest = []
+        for entry in counts:
+            jobs[entry["status"]] = jobs.get(entry["status"], 0) + entry["jobs"]
+            if entry["status"] not in FINISHED:
+                unfinished[entry["priority_class"]] = unfinished.get(entry["priority_class"], 0) + entry["jobs"]
+                oldest.append(entry["oldest"])
+
+        # Enqueue -> first claim, per class, over the recent window
+        queue_wait = {name: Histogram() for name in self.scheduler.weights}
+        for name, wait in await self.backend.queue_waits(now - self.latency_window_seconds):
+            queue_wait.setdefault(name, Histogram()).observe(wait)
+
+        return {
+            "enabled": True,
+            "jobs": jobs,
+            "oldest_unfinished_seconds": round(now - min(oldest), 1) if oldest else None,
+            "classes": {
+                name: {
+                    "weight": self.scheduler.weights.get(name),
+                    "starvation_seconds": self.starvation_seconds_for(name),
+                    "claims": self.claims_by_class.get(name, 0),
+                    "starved_claims": self.starved_claims.get(name, 0),
+                    "unfinished": unfinished.get(name, 0),
+                    "queue_wait_seconds": histogram.snapshot(),
+                }
+                for name, histogram in queue_wait.items()
+            },
+            "latency_window_seconds": self.latency_window_seconds,
+        }
+
+
+# Global instance
+job_queue = JobQueue()
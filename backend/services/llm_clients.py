@@ -0,0 +1,144 @@
+"""
+LLM HTTP Clients
+
+One pooled httpx client per LLM provider (OpenAI, Google), shared by the
+assistants and the prompt helper. Connections are kept alive between chat
+turns, so only the first call pays the TCP + TLS handshake. With HTTP/2,
+concurrent turns share a single connection. Clients are created in the FastAPI
+lifespan (or on first use) and closed on shutdown. The streaming helpers yield
+text deltas from OpenAI and Gemini server-sent event streams.
+
+Environment Variables:
+- LLM_HTTP2: Negotiate HTTP/2 with the providers (default: true, needs the h2 package)
+- LLM_MAX_CONNECTIONS: Open connections per provider (default: 20)
+- LLM_MAX_KEEPALIVE_CONNECTIONS: Idle connections kept per provider (default: 10)
+- LLM_KEEPALIVE_EXPIRY_SECONDS: How long an idle connection is kept (default: 120)
+- LLM_TIMEOUT_SECONDS: Read/write timeout per call (default: 30)
+- LLM_CONNECT_TIMEOUT_SECONDS: Connect timeout (default: 5)
+"""
+
+import json
+import os
+from typing import Any, AsyncIterator, Dict, Union
+
+import httpx
+
+try:
+    import h2  # noqa: F401
+    H2_AVAILABLE = True
+except ImportError:
+    H2_AVAILABLE = False
+
+LLM_HTTP2 = os.getenv("LLM_HTTP2", "true").lower() != "false"
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "20"))
+LLM_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("LLM_MAX_KEEPALIVE_CONNECTIONS", "10"))
+LLM_KEEPALIVE_EXPIRY_SECONDS = float(os.getenv("LLM_KEEPALIVE_EXPIRY_SECONDS", "120"))
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "30"))
+LLM_CONNECT_TIMEOUT_SECONDS = float(os.getenv("LLM_CONNECT_TIMEOUT_SECONDS", "5"))
+
+OPENAI = "openai"
+GOOGLE = "google"
+PROVIDER_BASE_URLS = {
+    OPENAI: "https://api.openai.com",
+    GOOGLE: "https://generativelanguage.googleapis.com",
+}
+
+
+def create_llm_client(base_url: str, http2: bool = LLM_HTTP2) -> httpx.AsyncClient:
+    """Build a new pooled client for one provider (call once per process)"""
+    return httpx.AsyncClient(
+        base_url=base_url,
+        http2=http2 and H2_AVAILABLE,
+        limits=httpx.Limits(
+            max_connections=LLM_MAX_CONNECTIONS,
+            max_keepalive_connections=LLM_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=LLM_KEEPALIVE_EXPIRY_SECONDS,
+        ),
+        timeout=httpx.Timeout(LLM_TIMEOUT_SECONDS, connect=LLM_CONNECT_TIMEOUT_SECONDS),
+    )
+
+
+class LLMClients:
+    """Process-wide httpx clients, one per LLM provider"""
+
+    def __init__(self, http2: bool = LLM_HTTP2):
+        self.http2 = http2
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+        if http2 and not H2_AVAILABLE:
+            print("⚠️  h2 not installed, LLM clients fall back to HTTP/1.1 keep-alive")
+
+    def start(self) -> None:
+        for provider in PROVIDER_BASE_URLS:
+            self.client(provider)
+
+    def client(self, provider: str) -> httpx.AsyncClient:
+        """Shared client for `provider`; request paths are relative to its API host"""
+        if provider not in self._clients:
+            self._clients[provider] = create_llm_client(PROVIDER_BASE_URLS[provider], self.http2)
+        return self._clients[provider]
+
+    async def close(self) -> None:
+        clients, self._clients = self._clients, {}
+        for client in clients.values():
+            await client.aclose()
+
+    async def stream_openai_chat(self, payload: Dict[str, Any], api_key: str) -> AsyncIterator[str]:
+        """Text deltas of a streamed OpenAI chat completion"""
+        async with self.client(OPENAI).stream(
+            "POST",
+            "/v1/chat/completions",
+            headers={"Authorization": f"Bearer {api_key}", "Content-Type": "application/json"},
+            json={**payload, "stream": True},
+        ) as response:
+            response.raise_for_status()
+            async for data in _sse_data(response):
+                if data == "[DONE]":
+                    break
+                choices = json.loads(data).get("choices") or []
+                delta = choices[0].get("delta", {}).get("content") if choices else None
+                if delta:
+                    yield delta
+
+    async def stream_gemini(self, model: str, payload: Dict[str, Any], api_key: str) -> AsyncIterator[str]:
+        """Text deltas of a streamed Gemini generateContent call"""
+        async with self.client(GOOGLE).stream(
+            "POST",
+            f"/v1beta/models/{model}:streamGenerateContent",
+            headers={"Content-Type": "application/json"},
+            params={"key": api_key, "alt": "sse"},
+            json=payload,
+        ) as response:
+            response.raise_for_status()
+            async for data in _sse_data(response):
+                for candidate in json.loads(data).get("candidates") or []:
+                    for part in candidate.get("content", {}).get("parts", []):
+                        if part.get("text"):
+                            yield part["text"]
+
+    def agent_model(self, model: str) -> Union[str, Any]:
+        """
+        pydantic-ai model for a model string like "openai:gpt-4o-mini", wired to
+        the shared OpenAI client. Other providers are returned unchanged and keep
+        pydantic-ai's own client.
+        """
+        api_key = os.getenv("OPENAI_API_KEY")
+        if not model.startswith("openai:") or not api_key:
+            return model
+        from pydantic_ai.models.openai import OpenAIChatModel
+        from pydantic_ai.providers.openai import OpenAIProvider
+        # The OpenAI SDK appends /chat/completions etc. to the /v1 base URL
+        provider = OpenAIProvider(
+            base_url=f"{PROVIDER_BASE_URLS[OPENAI]}/v1", api_key=api_key, http_client=self.client(OPENAI)
+        )
+        return OpenAIChatModel(model.split(":", 1)[1], provider=provider)
+
+
+async def _sse_data(response) -> AsyncIterator[str]:
+    """`data:` payloads of a server-sent event stream"""
+    async for line in response.aiter_lines():
+        if line.startswith("data:"):
+            yield line[len("data:"):].strip()
+
+
+# Global instance
+llm_clients = LLMClients()
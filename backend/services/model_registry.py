@@ -0,0 +1,237 @@
+"""
+Model Registry
+
+Declarative catalog of the generation models exposed to the frontend: which FAL
+endpoint each model id maps to, what it can do, how its arguments are adapted,
+and its operational limits. Built once at import (startup) so every route does a
+single dict lookup instead of walking if/elif chains.
+
+Environment Variables:
+- MODEL_REGISTRY_FILE: Optional JSON file with extra models or overrides, as a
+  list of objects using the same fields as MODEL_DEFINITIONS
+"""
+
+import json
+import os
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+MODEL_REGISTRY_FILE = os.getenv("MODEL_REGISTRY_FILE")
+
+# Capability flags
+EDIT = "edit"            # image editing / image-to-image, accepts an input image
+TEXT_TO_IMAGE = "t2i"
+IMAGE_TO_VIDEO = "i2v"   # animates a start image
+VIDEO_TO_VIDEO = "v2v"   # restyles an input video
+TEXT_TO_VIDEO = "t2v"
+
+
+@dataclass(frozen=True)
+class ModelSpec:
+    """Everything the routes need to know about one model id"""
+    id: str
+    endpoint: str
+    kind: str  # "image" | "video"
+    provider: str = "fal"  # "google" models have a native path and fall back to FAL
+    capabilities: Tuple[str, ...] = ()
+    # Argument transforms, applied in order: defaults -> rename -> drop
+    default_arguments: Dict[str, Any] = field(default_factory=dict)
+    rename_arguments: Dict[str, str] = field(default_factory=dict)
+    drop_arguments: Tuple[str, ...] = ()
+    # Operational limits (None = use the service-wide defaults)
+    concurrency: Optional[int] = None
+    queue_size: Optional[int] = None
+    timeout_seconds: Optional[float] = None
+    # Largest input image worth sending, in pixels (None = IMAGE_PREP_MAX_PIXELS)
+    max_input_pixels: Optional[int] = None
+    # Registry ids (or raw FAL endpoints) to try when this model is slow or failing
+    fallbacks: Tuple[str, ...] = ()
+    registered: bool = True
+
+    def supports(self, capability: str) -> bool:
+        return capability in self.capabilities
+
+    def transform_arguments(self, arguments: Dict[str, Any]) -> Dict[str, Any]:
+        transformed = {**self.default_arguments, **arguments}
+        for source, target in self.rename_arguments.items():
+            if source in transformed:
+                transformed[target] = transformed.pop(source)
+        for name in self.drop_arguments:
+            transformed.pop(name, None)
+        return transformed
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = asdict(self)
+        data["capabilities"] = list(self.capabilities)
+        data["drop_arguments"] = list(self.drop_arguments)
+        data["fallbacks"] = list(self.fallbacks)
+        return data
+
+
+MODEL_DEFINITIONS: List[Dict[str, Any]] = [
+    # --- Image ---
+    {
+        "id": "seedream-edit",
+        "endpoint": "fal-ai/bytedance/seedream/v4/edit",
+        "kind": "image",
+        "capabilities": [EDIT],
+        "timeout_seconds": 120,
+        "max_input_pixels": 2048 * 2048,
+    },
+    {
+        "id": "seedream-t2i",
+        "endpoint": "fal-ai/bytedance/seedream/v4/text-to-image",
+        "kind": "image",
+        "capabilities": [TEXT_TO_IMAGE],
+        "timeout_seconds": 120,
+        "fallbacks": ["flux-dev"],
+    },
+    {
+        "id": "flux-realism",
+        "endpoint": "fal-ai/flux-realism",
+        "kind": "image",
+        "capabilities": [TEXT_TO_IMAGE],
+        "timeout_seconds": 120,
+        "fallbacks": ["flux-dev"],
+    },
+    {
+        "id": "flux-dev",
+        "endpoint": "fal-ai/flux/dev",
+        "kind": "image",
+        "capabilities": [TEXT_TO_IMAGE],
+        "timeout_seconds": 120,
+    },
+    # Google models are served through FAL Flux until the Imagen path is live;
+    # passing "nano-banana" to FAL as-is returns a 404. Other nano-banana ids the
+    # frontend sends (e.g. "fal-ai/nano-banana/edit") resolve to these, see resolve()
+    {
+        "id": "nano-banana",
+        "endpoint": "fal-ai/flux/dev",
+        "kind": "image",
+        "provider": "google",
+        "capabilities": [TEXT_TO_IMAGE],
+        "timeout_seconds": 90,
+    },
+    {
+        "id": "nano-banana-pro",
+        "endpoint": "fal-ai/flux/dev",
+        "kind": "image",
+        "provider": "google",
+        "capabilities": [TEXT_TO_IMAGE],
+        "timeout_seconds": 120,
+    },
+    # --- Video ---
+    {
+        "id": "kling-pro",
+        "endpoint": "fal-ai/kling-video/v2.5-turbo/pro/image-to-video",
+        "kind": "video",
+        "capabilities": [IMAGE_TO_VIDEO],
+        "concurrency": 4,
+        "timeout_seconds": 900,
+        "max_input_pixels": 1280 * 720,
+    },
+    {
+        "id": "wan-v2",
+        "endpoint": "fal-ai/wan/v2.2-a14b/video-to-video",
+        "kind": "video",
+        "capabilities": [VIDEO_TO_VIDEO, IMAGE_TO_VIDEO],
+        "concurrency": 4,
+        "timeout_seconds": 900,
+        "max_input_pixels": 1280 * 720,
+    },
+    {
+        "id": "google-video",
+        "endpoint": "fal-ai/google/gemini-2-5/video",
+        "kind": "video",
+        "capabilities": [IMAGE_TO_VIDEO, TEXT_TO_VIDEO],
+        "concurrency": 4,
+        "timeout_seconds": 900,
+        "max_input_pixels": 1280 * 720,
+    },
+]
+
+
+def _spec_from_definition(definition: Dict[str, Any]) -> ModelSpec:
+    return ModelSpec(
+        id=definition["id"],
+        endpoint=definition["endpoint"],
+        kind=definition["kind"],
+        provider=definition.get("provider", "fal"),
+        capabilities=tuple(definition.get("capabilities", ())),
+        default_arguments=dict(definition.get("default_arguments", {})),
+        rename_arguments=dict(definition.get("rename_arguments", {})),
+        drop_arguments=tuple(definition.get("drop_arguments", ())),
+        concurrency=definition.get("concurrency"),
+        queue_size=definition.get("queue_size"),
+        timeout_seconds=definition.get("timeout_seconds"),
+        max_input_pixels=definition.get("max_input_pixels"),
+        fallbacks=tuple(definition.get("fallbacks", ())),
+    )
+
+
+def _infer_spec(model_id: str, kind: str) -> ModelSpec:
+    """Spec for a raw FAL endpoint id sent by the frontend"""
+    if kind == "video":
+        capabilities = (VIDEO_TO_VIDEO,) if "video-to-video" in model_id else (IMAGE_TO_VIDEO,)
+    else:
+        capabilities = (EDIT,) if "edit" in model_id else (TEXT_TO_IMAGE,)
+    return ModelSpec(id=model_id, endpoint=model_id, kind=kind, capabilities=capabilities, registered=False)
+
+
+class ModelRegistry:
+    """O(1) model id -> ModelSpec lookup"""
+
+    def __init__(self, definitions: List[Dict[str, Any]]):
+        self._models: Dict[Tuple[str, str], ModelSpec] = {}
+        for definition in definitions:
+            self.register(_spec_from_definition(definition))
+
+    def register(self, spec: ModelSpec) -> None:
+        self._models[(spec.kind, spec.id)] = spec
+
+    def resolve(self, model_id: str, kind: str) -> ModelSpec:
+        spec = self._models.get((kind, model_id))
+        if spec:
+            return spec
+        if kind == "image" and "nano-banana" in model_id:
+            alias = "nano-banana-pro" if "nano-banana-pro" in model_id else "nano-banana"
+            spec = self._models.get((kind, alias))
+            if spec:
+                return spec
+        # Unknown ids are treated as raw FAL endpoints
+        return _infer_spec(model_id, kind)
+
+    def fallback_specs(self, spec: ModelSpec) -> List[ModelSpec]:
+        return [self.resolve(fallback, spec.kind) for fallback in spec.fallbacks]
+
+    def limits_for_endpoint(self, endpoint: str) -> Dict[str, int]:
+        """Tightest concurrency/queue limits declared by any model on this endpoint"""
+        limits: Dict[str, int] = {}
+        for spec in self._models.values():
+            if spec.endpoint != endpoint:
+                continue
+            if spec.concurrency is not None:
+                limits["concurrency"] = min(limits.get("concurrency", spec.concurrency), spec.concurrency)
+            if spec.queue_size is not None:
+                limits["queue"] = min(limits.get("queue", spec.queue_size), spec.queue_size)
+        return limits
+
+    def list(self, kind: Optional[str] = None) -> List[ModelSpec]:
+        return [spec for spec in self._models.values() if kind is None or spec.kind == kind]
+
+
+def _load_definitions() -> List[Dict[str, Any]]:
+    definitions = list(MODEL_DEFINITIONS)
+    if MODEL_REGISTRY_FILE:
+        try:
+            with open(MODEL_REGISTRY_FILE, "r", encoding="utf-8") as f:
+                extra = json.load(f)
+            definitions.extend(extra)
+            print(f"✅ Loaded {len(extra)} model definitions from: {MODEL_REGISTRY_FILE}")
+        except Exception as e:
+            print(f"⚠️  Could not load MODEL_REGISTRY_FILE {MODEL_REGISTRY_FILE}: {e}")
+    return definitions
+
+
+# Global instance
+model_registry = ModelRegistry(_load_definitions())
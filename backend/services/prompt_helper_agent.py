@@ -18,6 +18,8 @@ from typing import Optional, Literal
 from pathlib import Path
 from pydantic import BaseModel, Field
 
+from services.llm_clients import llm_clients, OPENAI, GOOGLE
+
 # Load .env file if it exists (for local development)
 from dotenv import load_dotenv
 env_path = Path(__file__).parent.parent / '.env'
@@ -88,67 +90,59 @@ Focus on:
 
 async def _call_openai(system_prompt: str, user_message: str) -> dict:
     """Call OpenAI API directly"""
-    import httpx
-    
     if not OPENAI_API_KEY:
         raise ValueError("OPENAI_API_KEY not set")
     
-    async with httpx.AsyncClient() as client:
-        response = await client.post(
-            "https://api.openai.com/v1/chat/completions",
-            headers={
-                "Authorization": f"Bearer {OPENAI_API_KEY}",
-                "Content-Type": "application/json"
-            },
-            json={
-                "model": PROMPT_HELPER_MODEL,
-                "messages": [
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_message}
-                ],
-                "response_format": {"type": "json_object"},
-                "temperature": 0.7,
-                "max_tokens": 1000
-            },
-            timeout=30.0
-        )
-        response.raise_for_status()
-        data = response.json()
-        content = data["choices"][0]["message"]["content"]
-        return json.loads(content)
+    response = await llm_clients.client(OPENAI).post(
+        "/v1/chat/completions",
+        headers={
+            "Authorization": f"Bearer {OPENAI_API_KEY}",
+            "Content-Type": "application/json"
+        },
+        json={
+            "model": PROMPT_HELPER_MODEL,
+            "messages": [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_message}
+            ],
+            "response_format": {"type": "json_object"},
+            "temperature": 0.7,
+            "max_tokens": 1000
+        }
+    )
+    response.raise_for_status()
+    data = response.json()
+    content = data["choices"][0]["message"]["content"]
+    return json.loads(content)
 
 
 async def _call_google(system_prompt: str, user_message: str) -> dict:
     """Call Google Gemini API directly"""
-    import httpx
-    
     if not GOOGLE_API_KEY:
         raise ValueError("GOOGLE_API_KEY not set")
     
     # Use gemini-2.0-flash or gemini-1.5-flash
     model = "gemini-2.0-flash"
     
-    async with httpx.AsyncClient() as client:
-        response = await client.post(
-            f"https://generativelanguage.googleapis.com/v1beta/models/{model}:generateContent",
-            headers={"Content-Type": "application/json"},
-            params={"key": GOOGLE_API_KEY},
-            json={
-                "contents": [{
-                    "parts": [{"text": f"{system_prompt}\n\nUser request: {user_message}\n\nRespond with a JSON object containing: enhanced_prompt, explanation, tips (array), alternative_prompts (array)"}]
-                }],
-                "generationConfig": {
-                    "temperature": 0.7,
-                    "maxOutputTokens": 1000,
-                    "responseMimeType": "application/json"
-                }
-            },
-            timeout=30.0
-        )
-        response.raise_for_status()
-        data = response.json()
-        content = data["candidates"][0]["content"]["parts"][0]["text"]
-        return json.loads(content)
+    response = await llm_clients.client(GOOGLE).post(
+        f"/v1beta/models/{model}:generateContent",
+        headers={"Content-Type": "application/json"},
+        params={"key": GOOGLE_API_KEY},
+        json={
+            "contents": [{
+                "parts": [{"text": f"{system_prompt}\n\nUser request: {user_message}\n\nRespond with a JSON object containing: enhanced_prompt, explanation, tips (array), alternative_prompts (array)"}]
+            }],
+            "generationConfig": {
+                "temperature": 0.7,
+                "maxOutputTokens": 1000,
+                "responseMimeType": "application/json"
+            }
+        }
+    )
+    response.raise_for_status()
+    data = response.json()
+    content = data["candidates"][0]["content"]["parts"][0]["text"]
+    return json.loads(content)
 
 
 async def generate_prompt_suggestion(
@@ -0,0 +1,193 @@
+"""
+Result Rehosting Service
+
+Copies FAL results (images and videos) from FAL's CDN into our bucket under a
+deterministic key. Clients get a durable URL that doesn't expire, and the
+frontend no longer has to download a result only to upload it again.
+Downloads are streamed into an S3 multipart upload, so a video is never
+buffered whole in memory.
+
+Image responses don't wait for the copy: schedule() runs it in the background
+and a callback swaps the durable URL in (cache entry, derivatives) once it is
+stored. Clients can look it up with status().
+
+Environment Variables:
+- REHOST_ENABLED: Copy FAL results into the bucket (default: true)
+- REHOST_CONCURRENCY: Parallel copies per worker (default: 8)
+- REHOST_MAX_ATTEMPTS: Tries per result before giving up (default: 3)
+- REHOST_RETRY_BACKOFF_SECONDS: Base delay between tries, doubled each time (default: 0.5)
+"""
+
+import asyncio
+import hashlib
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+from urllib.parse import urlparse
+
+import httpx
+
+from services.metrics import Histogram
+from services.single_flight import SingleFlight
+from services.storage import public_url, storage
+from services.upload_dedupe import upload_index
+
+REHOST_ENABLED = os.getenv("REHOST_ENABLED", "true").lower() != "false"
+REHOST_CONCURRENCY = int(os.getenv("REHOST_CONCURRENCY", "8"))
+REHOST_MAX_ATTEMPTS = int(os.getenv("REHOST_MAX_ATTEMPTS", "3"))
+REHOST_RETRY_BACKOFF_SECONDS = float(os.getenv("REHOST_RETRY_BACKOFF_SECONDS", "0.5"))
+
+DEFAULT_EXTENSIONS = {"image": "png", "video": "mp4"}
+CONTENT_TYPES = {
+    "png": "image/png",
+    "jpg": "image/jpeg",
+    "jpeg": "image/jpeg",
+    "webp": "image/webp",
+    "mp4": "video/mp4",
+    "webm": "video/webm",
+    "mov": "video/quicktime",
+}
+
+
+def durable_key(source_url: str, kind: str) -> str:
+    """Deterministic bucket key for a FAL result (same source URL -> same key)"""
+    extension = os.path.splitext(urlparse(source_url).path)[1].lstrip(".").lower()
+    if extension not in CONTENT_TYPES:
+        extension = DEFAULT_EXTENSIONS.get(kind, "bin")
+    digest = hashlib.sha256(source_url.encode("utf-8")).hexdigest()
+    return f"generated/{kind}s/{digest}.{extension}"
+
+
+class ResultRehoster:
+    """Bounded, retrying FAL CDN -> bucket copier"""
+
+    def __init__(
+        self,
+        enabled: bool = REHOST_ENABLED,
+        concurrency: int = REHOST_CONCURRENCY,
+        max_attempts: int = REHOST_MAX_ATTEMPTS,
+        retry_backoff_seconds: float = REHOST_RETRY_BACKOFF_SECONDS,
+    ):
+        self.enabled = enabled
+        self.max_attempts = max_attempts
+        self.retry_backoff_seconds = retry_backoff_seconds
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._flights = SingleFlight()
+        self._client: Optional[httpx.AsyncClient] = None
+        self._background: set = set()
+        self.copy_seconds = Histogram()
+        self.counters = {
+            "scheduled": 0,
+            "rehosted": 0,
+            "already_stored": 0,
+            "retries": 0,
+            "failures": 0,
+            "bytes": 0,
+        }
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(timeout=httpx.Timeout(60.0, connect=10.0), follow_redirects=True)
+        return self._client
+
+    async def close(self) -> None:
+        # Unfinished background copies are dropped; their results keep the FAL URL
+        for task in list(self._background):
+            task.cancel()
+        await asyncio.gather(*self._background, return_exceptions=True)
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def rehost(self, source_url: str, kind: str) -> Optional[str]:
+        """Durable URL for `source_url`, or None if rehosting is off or kept failing"""
+        if not self.enabled or not source_url:
+            return None
+        key = durable_key(source_url, kind)
+        return await self._flights.do(key, lambda: self._rehost(source_url, key))
+
+    def schedule(
+        self,
+        source_url: str,
+        kind: str,
+        on_rehosted: Optional[Callable[[str], Awaitable[None]]] = None,
+    ) -> None:
+        """Rehost in the background; `on_rehosted(durable_url)` runs once the copy is stored"""
+        if not self.enabled or not source_url:
+            return
+        self.counters["scheduled"] += 1
+        task = asyncio.create_task(self._rehost_in_background(source_url, kind, on_rehosted))
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+
+    async def _rehost_in_background(
+        self, source_url: str, kind: str, on_rehosted: Optional[Callable[[str], Awaitable[None]]]
+    ) -> None:
+        try:
+            durable_url = await self.rehost(source_url, kind)
+            if durable_url and on_rehosted:
+                await on_rehosted(durable_url)
+        except Exception as e:
+            print(f"⚠️  Background rehost of {source_url} failed: {e}")
+
+    async def status(self, source_url: str, kind: str) -> Tuple[str, Optional[str]]:
+        """("pending" | "stored" | "missing", durable URL when stored)"""
+        key = durable_key(source_url, kind)
+        if self._flights.is_in_flight(key):
+            return "pending", None
+        if await upload_index.exists(key):
+            return "stored", public_url(key)
+        return "missing", None
+
+    async def _rehost(self, source_url: str, key: str) -> Optional[str]:
+        if await upload_index.exists(key):
+            self.counters["already_stored"] += 1
+            return public_url(key)
+
+        async with self._semaphore:
+            for attempt in range(1, self.max_attempts + 1):
+                started = time.monotonic()
+                try:
+                    await self._copy(source_url, key)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    if attempt == self.max_attempts:
+                        self.counters["failures"] += 1
+                        print(f"⚠️  Could not rehost {source_url} after {attempt} attempts: {e}")
+                        return None
+                    self.counters["retries"] += 1
+                    await asyncio.sleep(self.retry_backoff_seconds * 2 ** (attempt - 1))
+                    continue
+                self.copy_seconds.observe(time.monotonic() - started)
+                self.counters["rehosted"] += 1
+                upload_index.remember(key)
+                return public_url(key)
+
+    async def _copy(self, source_url: str, key: str) -> None:
+        async with self.client.stream("GET", source_url) as response:
+            response.raise_for_status()
+            content_type = response.headers.get("content-type") or CONTENT_TYPES.get(key.rsplit(".", 1)[-1], "application/octet-stream")
+            writer = storage.multipart_writer(key, content_type)
+            try:
+                async for chunk in response.aiter_bytes():
+                    await writer.write(chunk)
+                await writer.complete()
+            except BaseException:
+                await writer.abort()
+                raise
+            self.counters["bytes"] += writer.bytes_written
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self.counters,
+            "enabled": self.enabled,
+            "in_flight": self._flights.in_flight(),
+            "background": len(self._background),
+            "copy_seconds": self.copy_seconds.snapshot(),
+        }
+
+
+# Global instance
+result_rehoster = ResultRehoster()
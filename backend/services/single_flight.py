@@ -0,0 +1,55 @@
+"""
+Single-Flight Service
+
+Coalesces concurrent identical calls: the first caller for a key starts the
+upstream call and everyone else arriving while it is in flight awaits the same
+result instead of paying for a duplicate FAL job.
+"""
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict
+
+
+class SingleFlight:
+    """Deduplicate in-flight coroutines by key"""
+
+    def __init__(self):
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self.counters = {
+            "calls": 0,
+            "executions": 0,
+            "coalesced": 0,
+        }
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        self.counters["calls"] += 1
+        task = self._inflight.get(key)
+        if task:
+            self.counters["coalesced"] += 1
+        else:
+            self.counters["executions"] += 1
+            task = asyncio.create_task(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+        # Shield so one caller disconnecting doesn't cancel the call for the others
+        return await asyncio.shield(task)
+
+    def in_flight(self) -> int:
+        return len(self._inflight)
+
+    def is_in_flight(self, key: str) -> bool:
+        return key in self._inflight
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self.counters, "in_flight": self.in_flight()}
+
+    def _forget(self, key: str, task: asyncio.Task) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # Mark the exception as retrieved in case every waiter went away
+        if not task.cancelled():
+            task.exception()
+
+
+# Global instance
+generation_flights = SingleFlight()
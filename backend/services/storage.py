@@ -0,0 +1,229 @@
+"""
+Storage Service
+
+Process-wide S3/MinIO client. One boto3 client (thread-safe, with a tuned
+connection pool) is created at startup and every S3 call runs on a bounded
+thread pool so the event loop never blocks on storage I/O.
+
+Environment Variables:
+- VITE_MINIO_ENDPOINT / VITE_MINIO_ACCESS_KEY / VITE_MINIO_SECRET_KEY /
+  VITE_MINIO_BUCKET / VITE_MINIO_SERVER_URL: Bucket connection settings
+- S3_MAX_POOL_CONNECTIONS: HTTP connections kept open to storage (default: 32)
+- S3_THREAD_POOL_SIZE: Concurrent S3 calls per worker (default: 16)
+- S3_MULTIPART_PART_SIZE: Bytes buffered per multipart part (default: 8 MB, S3 minimum is 5 MB)
+"""
+
+import asyncio
+import functools
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Optional
+
+import boto3
+from botocore.config import Config
+
+# MinIO / S3 Configuration
+MINIO_ENDPOINT = os.getenv("VITE_MINIO_ENDPOINT", "storage.akitapr.com")
+MINIO_ACCESS_KEY = os.getenv("VITE_MINIO_ACCESS_KEY")
+MINIO_SECRET_KEY = os.getenv("VITE_MINIO_SECRET_KEY")
+MINIO_BUCKET = os.getenv("VITE_MINIO_BUCKET", "photobooth")
+MINIO_SERVER_URL = os.getenv("VITE_MINIO_SERVER_URL", "https://storage.akitapr.com")
+
+S3_MAX_POOL_CONNECTIONS = int(os.getenv("S3_MAX_POOL_CONNECTIONS", "32"))
+S3_THREAD_POOL_SIZE = int(os.getenv("S3_THREAD_POOL_SIZE", "16"))
+S3_MULTIPART_PART_SIZE = max(int(os.getenv("S3_MULTIPART_PART_SIZE", str(8 * 1024 * 1024))), 5 * 1024 * 1024)
+
+
+def create_s3_client():
+    """Build a new boto3 S3 client (expensive: call once per process)"""
+    config = Config(
+        signature_version="s3v4",
+        max_pool_connections=S3_MAX_POOL_CONNECTIONS,
+        retries={"max_attempts": 3, "mode": "adaptive"},
+        tcp_keepalive=True,
+    )
+    # Clients are thread-safe, sessions are not: give the shared client its own session
+    session = boto3.session.Session()
+
+    # If using AWS S3 directly
+    if "amazonaws.com" in MINIO_ENDPOINT:
+        return session.client(
+            "s3",
+            aws_access_key_id=MINIO_ACCESS_KEY,
+            aws_secret_access_key=MINIO_SECRET_KEY,
+            # No endpoint_url needed for standard AWS S3, let boto3 decide the region
+            config=config,
+        )
+
+    # For MinIO or other S3-compatible providers
+    return session.client(
+        "s3",
+        endpoint_url=f"https://{MINIO_ENDPOINT}",
+        aws_access_key_id=MINIO_ACCESS_KEY,
+        aws_secret_access_key=MINIO_SECRET_KEY,
+        config=config,
+    )
+
+
+def public_url(key: str) -> str:
+    """Public URL for an object in MINIO_BUCKET"""
+    if "amazonaws.com" in MINIO_SERVER_URL:
+        # Standard S3 URL format: https://bucket.s3.amazonaws.com/key
+        return f"https://{MINIO_BUCKET}.s3.amazonaws.com/{key}"
+    return f"{MINIO_SERVER_URL}/{MINIO_BUCKET}/{key}"
+
+
+class StorageService:
+    """Shared S3 client plus the thread pool its blocking calls run on"""
+
+    def __init__(self, thread_pool_size: int = S3_THREAD_POOL_SIZE):
+        self.thread_pool_size = thread_pool_size
+        self._client = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def start(self) -> None:
+        if self._client is None:
+            self._client = create_s3_client()
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.thread_pool_size,
+                thread_name_prefix="s3",
+            )
+            print(f"✅ Storage client ready (pool: {S3_MAX_POOL_CONNECTIONS} connections, {self.thread_pool_size} threads)")
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    @property
+    def client(self):
+        # Lazily start for scripts and tests that skip the app lifespan
+        if self._client is None:
+            self.start()
+        return self._client
+
+    async def run(self, method: str, **kwargs) -> Any:
+        """Call `client.<method>(**kwargs)` on the storage thread pool"""
+        if self._executor is None:
+            self.start()
+        call = functools.partial(getattr(self.client, method), **kwargs)
+        return await asyncio.get_running_loop().run_in_executor(self._executor, call)
+
+    async def put_object(self, key: str, body: Any, content_type: str, bucket: str = MINIO_BUCKET, **extra) -> Any:
+        return await self.run("put_object", Bucket=bucket, Key=key, Body=body, ContentType=content_type, **extra)
+
+    def presigned_post(self, key: str, content_type: str, max_bytes: int, expires_in: int, bucket: str = MINIO_BUCKET) -> Dict[str, Any]:
+        """POST policy pinning the key, content type and a size range (signed locally, no network call)"""
+        return self.client.generate_presigned_post(
+            Bucket=bucket,
+            Key=key,
+            Fields={"Content-Type": content_type},
+            Conditions=[
+                {"Content-Type": content_type},
+                ["content-length-range", 1, max_bytes],
+            ],
+            ExpiresIn=expires_in,
+        )
+
+    def presigned_put(self, key: str, content_type: str, expires_in: int, bucket: str = MINIO_BUCKET) -> str:
+        """PUT URL signed for one key and content type (signed locally, no network call)"""
+        return self.client.generate_presigned_url(
+            "put_object",
+            Params={"Bucket": bucket, "Key": key, "ContentType": content_type},
+            ExpiresIn=expires_in,
+        )
+
+    def multipart_writer(self, key: str, content_type: str, bucket: str = MINIO_BUCKET) -> "MultipartUploadWriter":
+        return MultipartUploadWriter(self, key, content_type, bucket=bucket)
+
+
+class MultipartUploadWriter:
+    """
+    Streams data into an S3 object with constant memory: bytes are buffered up to
+    one part and shipped as a multipart part. Objects smaller than a part are sent
+    with a single put_object instead, saving the multipart round-trips.
+    """
+
+    def __init__(
+        self,
+        service: StorageService,
+        key: str,
+        content_type: str,
+        bucket: str = MINIO_BUCKET,
+        part_size: int = S3_MULTIPART_PART_SIZE,
+    ):
+        self.service = service
+        self.key = key
+        self.content_type = content_type
+        self.bucket = bucket
+        self.part_size = part_size
+        self.bytes_written = 0
+        self._buffer = bytearray()
+        self._upload_id: Optional[str] = None
+        self._parts = []
+
+    @property
+    def is_multipart(self) -> bool:
+        """True once a part has been shipped (the object can no longer be retargeted)"""
+        return self._upload_id is not None
+
+    async def write(self, data: bytes) -> None:
+        self._buffer += data
+        self.bytes_written += len(data)
+        while len(self._buffer) >= self.part_size:
+            chunk = bytes(self._buffer[:self.part_size])
+            del self._buffer[:self.part_size]
+            await self._upload_part(chunk)
+
+    async def complete(self) -> None:
+        if self._upload_id is None:
+            await self.service.put_object(self.key, bytes(self._buffer), self.content_type, bucket=self.bucket)
+            self._buffer.clear()
+            return
+        if self._buffer:
+            await self._upload_part(bytes(self._buffer))
+            self._buffer.clear()
+        await self.service.run(
+            "complete_multipart_upload",
+            Bucket=self.bucket,
+            Key=self.key,
+            UploadId=self._upload_id,
+            MultipartUpload={"Parts": self._parts},
+        )
+
+    async def abort(self) -> None:
+        """Discard everything written so far (no-op before the first part)"""
+        self._buffer.clear()
+        if self._upload_id is None:
+            return
+        try:
+            await self.service.run("abort_multipart_upload", Bucket=self.bucket, Key=self.key, UploadId=self._upload_id)
+        except Exception as e:
+            print(f"⚠️  Could not abort multipart upload for {self.key}: {e}")
+
+    async def _upload_part(self, chunk: bytes) -> None:
+        if self._upload_id is None:
+            created = await self.service.run(
+                "create_multipart_upload", Bucket=self.bucket, Key=self.key, ContentType=self.content_type
+            )
+            self._upload_id = created["UploadId"]
+        part_number = len(self._parts) + 1
+        uploaded = await self.service.run(
+            "upload_part",
+            Bucket=self.bucket,
+            Key=self.key,
+            UploadId=self._upload_id,
+            PartNumber=part_number,
+            Body=chunk,
+        )
+        self._parts.append({"ETag": uploaded["ETag"], "PartNumber": part_number})
+
+
+def get_minio_client():
+    """Shared S3 client (kept for callers that use boto3 directly)"""
+    return storage.client
+
+
+# Global instance
+storage = StorageService()
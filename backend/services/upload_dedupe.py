@@ -0,0 +1,182 @@
+"""
+Upload Deduplication Service
+
+Stores temp uploads under a content-addressed key (temp/uploads/<sha256>.<ext>).
+When the same template background or element image is uploaded again, the
+existing object's URL is returned and nothing is written. FAL also gets a
+stable URL it can cache. Recently seen keys are kept in a small in-memory
+index, so hot keys skip the HEAD request.
+
+Environment Variables:
+- UPLOAD_DEDUPE_ENABLED: Content-address temp uploads (default: true)
+- UPLOAD_DEDUPE_INDEX_SIZE: Keys remembered per worker (default: 4096)
+- UPLOAD_DEDUPE_INDEX_TTL_SECONDS: How long a remembered key is trusted without a HEAD (default: 1 hour)
+- UPLOAD_DEDUPE_TOUCH_SECONDS: Reused objects older than this are re-stamped so the
+  temp sweeper doesn't delete an image that is still in use (default: 12 hours)
+"""
+
+import hashlib
+import os
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Dict, Optional, Tuple
+
+from services.storage import MINIO_BUCKET, storage
+
+UPLOAD_DEDUPE_ENABLED = os.getenv("UPLOAD_DEDUPE_ENABLED", "true").lower() != "false"
+UPLOAD_DEDUPE_INDEX_SIZE = int(os.getenv("UPLOAD_DEDUPE_INDEX_SIZE", "4096"))
+UPLOAD_DEDUPE_INDEX_TTL_SECONDS = int(os.getenv("UPLOAD_DEDUPE_INDEX_TTL_SECONDS", "3600"))
+UPLOAD_DEDUPE_TOUCH_SECONDS = int(os.getenv("UPLOAD_DEDUPE_TOUCH_SECONDS", str(12 * 60 * 60)))
+
+UPLOAD_PREFIX = "temp/uploads/"
+# Multipart uploads land here until their hash is known
+STAGING_PREFIX = "temp/uploads/.staging/"
+
+
+class UploadIndex:
+    """LRU of content-addressed keys known to exist, in front of HEAD requests"""
+
+    def __init__(
+        self,
+        enabled: bool = UPLOAD_DEDUPE_ENABLED,
+        max_entries: int = UPLOAD_DEDUPE_INDEX_SIZE,
+        ttl_seconds: int = UPLOAD_DEDUPE_INDEX_TTL_SECONDS,
+        touch_seconds: int = UPLOAD_DEDUPE_TOUCH_SECONDS,
+    ):
+        self.enabled = enabled
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.touch_seconds = touch_seconds
+        # key -> (checked_at, last_modified), both epoch seconds
+        self._keys: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+        self.counters = {
+            "uploads": 0,
+            "deduplicated": 0,
+            "index_hits": 0,
+            "head_requests": 0,
+            "touches": 0,
+            "bytes_skipped": 0,
+        }
+
+    async def exists(self, key: str, content_type: Optional[str] = None) -> bool:
+        entry = self._keys.get(key)
+        now = time.time()
+        # Entries close to sweeper age are re-checked: the object may be gone already
+        if entry and now - entry[0] < self.ttl_seconds and now - entry[1] <= self.touch_seconds:
+            self._keys.move_to_end(key)
+            self.counters["index_hits"] += 1
+            return True
+
+        self.counters["head_requests"] += 1
+        try:
+            head = await storage.run("head_object", Bucket=MINIO_BUCKET, Key=key)
+            last_modified = head["LastModified"].timestamp()
+            if now - last_modified > self.touch_seconds:
+                await self._touch(key, content_type or head.get("ContentType"))
+                last_modified = now
+        except Exception:
+            # Missing (or unreadable): let the caller write it
+            self._keys.pop(key, None)
+            return False
+        self.remember(key, last_modified)
+        return True
+
+    def remember(self, key: str, last_modified: Optional[float] = None) -> None:
+        now = time.time()
+        self._keys[key] = (now, last_modified or now)
+        self._keys.move_to_end(key)
+        while len(self._keys) > self.max_entries:
+            self._keys.popitem(last=False)
+
+    async def store(self, chunks: AsyncIterator[bytes], content_type: str, extension: str) -> Tuple[str, bool]:
+        """
+        Stream `chunks` into temp/uploads/<sha256>.<extension>.
+        Returns (key, deduplicated). Nothing is written when the content already exists.
+        """
+        self.counters["uploads"] += 1
+        hasher = hashlib.sha256()
+        writer = storage.multipart_writer(f"{STAGING_PREFIX}{uuid.uuid4().hex}", content_type)
+        staged = False
+        try:
+            async for chunk in chunks:
+                hasher.update(chunk)
+                await writer.write(chunk)
+
+            key = f"{UPLOAD_PREFIX}{hasher.hexdigest()}.{extension}"
+            if await self.exists(key, content_type):
+                await writer.abort()
+                self.counters["deduplicated"] += 1
+                self.counters["bytes_skipped"] += writer.bytes_written
+                return key, True
+
+            if not writer.is_multipart:
+                # Still a single buffered part: write it straight to the final key
+                writer.key = key
+                await writer.complete()
+            else:
+                await writer.complete()
+                staged = True
+                await storage.run(
+                    "copy_object",
+                    Bucket=MINIO_BUCKET,
+                    Key=key,
+                    CopySource={"Bucket": MINIO_BUCKET, "Key": writer.key},
+                    ContentType=content_type,
+                    MetadataDirective="REPLACE",
+                )
+                staged = False
+                await self._delete_staging(writer.key)
+        except BaseException:
+            if staged:
+                # The upload is already complete, only the staging object is left to remove
+                await self._delete_staging(writer.key)
+            else:
+                await writer.abort()
+            raise
+
+        self.remember(key)
+        return key, False
+
+    async def store_bytes(self, data: bytes, content_type: str, extension: str, prefix: str = UPLOAD_PREFIX) -> Tuple[str, bool]:
+        """In-memory variant of `store` for content that is already buffered"""
+        self.counters["uploads"] += 1
+        key = f"{prefix}{hashlib.sha256(data).hexdigest()}.{extension}"
+        if await self.exists(key, content_type):
+            self.counters["deduplicated"] += 1
+            self.counters["bytes_skipped"] += len(data)
+            return key, True
+        await storage.put_object(key, data, content_type)
+        self.remember(key)
+        return key, False
+
+    async def _delete_staging(self, key: str) -> None:
+        try:
+            await storage.run("delete_object", Bucket=MINIO_BUCKET, Key=key)
+        except Exception as e:
+            # The temp sweeper removes it eventually
+            print(f"⚠️  Could not delete staging object {key}: {e}")
+
+    async def _touch(self, key: str, content_type: Optional[str]) -> None:
+        """Copy the object onto itself to bump LastModified"""
+        self.counters["touches"] += 1
+        extra = {"ContentType": content_type} if content_type else {}
+        await storage.run(
+            "copy_object",
+            Bucket=MINIO_BUCKET,
+            Key=key,
+            CopySource={"Bucket": MINIO_BUCKET, "Key": key},
+            MetadataDirective="REPLACE",
+            **extra,
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self.counters,
+            "enabled": self.enabled,
+            "indexed_keys": len(self._keys),
+        }
+
+
+# Global instance
+upload_index = UploadIndex()
@@ -0,0 +1,145 @@
+"""
+Streaming Upload Parser
+
+Reads one file field out of a multipart/form-data request body as it arrives,
+so uploads can be forwarded to storage chunk-by-chunk instead of being spooled
+(or read fully into memory) by Starlette's form parser first.
+
+Environment Variables:
+- UPLOAD_MAX_BYTES: Largest accepted upload in bytes (default: 25 MB), also
+  enforced on presigned direct-to-storage uploads
+"""
+
+import os
+from typing import AsyncIterator, List, Optional, Tuple
+
+from fastapi import Request
+
+try:
+    from python_multipart.multipart import MultipartParser, parse_options_header
+except ImportError:
+    from multipart.multipart import MultipartParser, parse_options_header
+
+UPLOAD_MAX_BYTES = int(os.getenv("UPLOAD_MAX_BYTES", str(25 * 1024 * 1024)))
+
+
+class UploadError(Exception):
+    """The request body is not a usable upload"""
+
+    def __init__(self, status_code: int, detail: str):
+        self.status_code = status_code
+        self.detail = detail
+        super().__init__(detail)
+
+
+class StreamingFilePart:
+    """
+    The `field_name` file part of a multipart request. Call `open()` to read up to
+    the part's headers, then iterate `chunks()` for its body. Only the bytes of the
+    current network chunk are held in memory.
+    """
+
+    def __init__(self, request: Request, field_name: str = "file", max_bytes: int = UPLOAD_MAX_BYTES):
+        content_type, params = parse_options_header(request.headers.get("content-type", ""))
+        if content_type != b"multipart/form-data" or b"boundary" not in params:
+            raise UploadError(400, "Expected a multipart/form-data body")
+
+        declared = request.headers.get("content-length")
+        if declared and declared.isdigit() and int(declared) > max_bytes + 64 * 1024:
+            # Leave room for the multipart envelope; the streamed size is checked exactly
+            raise UploadError(413, f"File exceeds the {max_bytes // (1024 * 1024)} MB upload limit")
+
+        self.field_name = field_name
+        self.max_bytes = max_bytes
+        self.filename: Optional[str] = None
+        self.content_type: Optional[str] = None
+        self.size = 0
+
+        self._stream = request.stream().__aiter__()
+        self._pending: List[bytes] = []
+        self._headers: List[Tuple[bytes, bytes]] = []
+        self._header_field = b""
+        self._header_value = b""
+        self._in_target = False
+        self._target_seen = False
+        self._target_done = False
+        self._body_done = False
+
+        self._parser = MultipartParser(
+            params[b"boundary"],
+            callbacks={
+                "on_part_begin": self._on_part_begin,
+                "on_part_data": self._on_part_data,
+                "on_part_end": self._on_part_end,
+                "on_header_field": self._on_header_field,
+                "on_header_value": self._on_header_value,
+                "on_header_end": self._on_header_end,
+                "on_headers_finished": self._on_headers_finished,
+            },
+        )
+
+    async def open(self) -> "StreamingFilePart":
+        while not self._target_seen:
+            if not await self._feed():
+                raise UploadError(400, f"Missing '{self.field_name}' file field")
+        return self
+
+    async def chunks(self) -> AsyncIterator[bytes]:
+        while True:
+            while self._pending:
+                data = self._pending.pop(0)
+                self.size += len(data)
+                if self.size > self.max_bytes:
+                    raise UploadError(413, f"File exceeds the {self.max_bytes // (1024 * 1024)} MB upload limit")
+                yield data
+            if self._target_done or not await self._feed():
+                return
+
+    async def _feed(self) -> bool:
+        if self._body_done:
+            return False
+        try:
+            chunk = await self._stream.__anext__()
+        except StopAsyncIteration:
+            self._body_done = True
+            self._parser.finalize()
+            return False
+        if chunk:
+            self._parser.write(chunk)
+        return True
+
+    # --- python-multipart callbacks ---
+
+    def _on_part_begin(self) -> None:
+        self._headers = []
+
+    def _on_part_data(self, data: bytes, start: int, end: int) -> None:
+        if self._in_target:
+            self._pending.append(data[start:end])
+
+    def _on_part_end(self) -> None:
+        if self._in_target:
+            self._in_target = False
+            self._target_done = True
+
+    def _on_header_field(self, data: bytes, start: int, end: int) -> None:
+        self._header_field += data[start:end]
+
+    def _on_header_value(self, data: bytes, start: int, end: int) -> None:
+        self._header_value += data[start:end]
+
+    def _on_header_end(self) -> None:
+        self._headers.append((self._header_field.lower(), self._header_value))
+        self._header_field = b""
+        self._header_value = b""
+
+    def _on_headers_finished(self) -> None:
+        headers = dict(self._headers)
+        _, disposition = parse_options_header(headers.get(b"content-disposition", b""))
+        name = disposition.get(b"name", b"").decode("latin-1")
+        if self._target_seen or name != self.field_name or b"filename" not in disposition:
+            return
+        self.filename = disposition[b"filename"].decode("utf-8", errors="replace")
+        self.content_type = headers.get(b"content-type", b"").decode("latin-1") or None
+        self._in_target = True
+        self._target_seen = True
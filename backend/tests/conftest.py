@@ -0,0 +1,12 @@
+"""
+Backend tests
+
+Run from backend/:
+    python -m pytest tests
+"""
+
+import os
+import sys
+
+# Tests import services/ and routers/ the way main.py does
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
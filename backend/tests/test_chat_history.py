@@ -0,0 +1,76 @@
+import asyncio
+
+import services.chat_history as chat_history_module
+from services.chat_history import SUMMARY_PREFIX, ChatHistoryManager, message_tokens
+
+
+def turns(count, words=40):
+    history = []
+    for i in range(count):
+        history.append({"role": "user", "content": f"question {i} " + "word " * words})
+        history.append({"role": "assistant", "content": f"answer {i} " + "word " * words})
+    return history
+
+
+def fake_summarize(calls):
+    async def summarize(summary, new_messages):
+        calls.append(len(new_messages))
+        return f"{summary} +{len(new_messages)}".strip()
+
+    return summarize
+
+
+def test_history_under_budget_is_unchanged():
+    manager = ChatHistoryManager(token_budget=10_000, keep_turns=2)
+    history = turns(3) + [{"role": "system", "content": "ignored"}, {"role": "user", "content": ""}]
+    compacted = asyncio.run(manager.compact(history))
+    assert compacted.messages == turns(3)
+    assert compacted.saved_tokens == 0
+
+
+def test_old_messages_are_summarized_and_the_summary_reused(monkeypatch):
+    calls = []
+    monkeypatch.setattr(chat_history_module, "_summarize", fake_summarize(calls))
+    manager = ChatHistoryManager(token_budget=300, keep_turns=2)
+    history = turns(6)
+
+    compacted = asyncio.run(manager.compact(history))
+    assert calls == [8]
+    assert compacted.summarized_messages == 8
+    assert compacted.messages[0] == {"role": "system", "content": SUMMARY_PREFIX + "+8"}
+    assert compacted.messages[1:] == history[8:]
+    assert compacted.tokens <= 300 < compacted.original_tokens
+
+    # One more short turn still fits next to the cached summary: no new call
+    history.append({"role": "user", "content": "thanks"})
+    again = asyncio.run(manager.compact(history))
+    assert calls == [8]
+    assert again.messages[1:] == history[8:]
+    assert manager.counters["summary_reused"] == 1
+
+
+def test_the_summary_is_extended_with_only_the_new_messages(monkeypatch):
+    calls = []
+    monkeypatch.setattr(chat_history_module, "_summarize", fake_summarize(calls))
+    manager = ChatHistoryManager(token_budget=300, keep_turns=2)
+
+    asyncio.run(manager.compact(turns(6)))
+    compacted = asyncio.run(manager.compact(turns(8)))
+    assert calls == [8, 4]
+    assert compacted.messages[0]["content"] == SUMMARY_PREFIX + "+8 +4"
+    assert compacted.messages[1:] == turns(8)[12:]
+
+
+def test_a_failed_summary_drops_the_oldest_messages(monkeypatch):
+    async def failing(summary, new_messages):
+        raise ValueError("no LLM API key configured")
+
+    monkeypatch.setattr(chat_history_module, "_summarize", failing)
+    manager = ChatHistoryManager(token_budget=300, keep_turns=2)
+    history = turns(6)
+
+    compacted = asyncio.run(manager.compact(history))
+    assert manager.counters["summary_failures"] == 1
+    assert compacted.messages == history[-len(compacted.messages):]
+    assert compacted.dropped_messages == len(history) - len(compacted.messages)
+    assert sum(message_tokens(m) for m in compacted.messages) <= 300
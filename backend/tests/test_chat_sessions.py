@@ -0,0 +1,79 @@
+import asyncio
+import base64
+import hashlib
+import hmac
+import json
+
+import httpx
+from fastapi import FastAPI
+
+from services import auth
+from services.chat_sessions import ChatSessionStore
+
+SECRET = "test-secret"
+
+
+def token_for(user_id: str, secret: str = SECRET) -> str:
+    def encode(data):
+        return base64.urlsafe_b64encode(json.dumps(data).encode()).rstrip(b"=").decode()
+
+    signing_input = f"{encode({'alg': 'HS256', 'typ': 'JWT'})}.{encode({'sub': user_id})}"
+    signature = hmac.new(secret.encode(), signing_input.encode(), hashlib.sha256).digest()
+    return f"{signing_input}.{base64.urlsafe_b64encode(signature).rstrip(b'=').decode()}"
+
+
+def test_decode_token_rejects_forged_and_expired_tokens():
+    assert auth.decode_token(token_for("7"), SECRET)["sub"] == "7"
+    assert auth.decode_token(token_for("7", secret="other"), SECRET) is None
+    assert auth.decode_token(token_for("7"), "") is None
+    assert auth.decode_token("not-a-token", SECRET) is None
+
+
+def test_sessions_are_bound_to_their_owner(tmp_path):
+    async def scenario(url):
+        store = ChatSessionStore(url=url)
+        session_id, _ = await store.open(None, "alice")
+        await store.append_turn(session_id, "hi", "hello")
+
+        # Someone else gets a fresh session instead of alice's history
+        other_id, history = await store.open(session_id, "mallory")
+        assert other_id != session_id and history == []
+        assert not await store.delete(session_id, "mallory")
+        assert not await store.delete(session_id, None)
+
+        resumed_id, history = await store.open(session_id, "alice")
+        assert resumed_id == session_id and [m["content"] for m in history] == ["hi", "hello"]
+        assert await store.delete(session_id, "alice")
+
+        # Guest sessions are keyed by their id alone
+        guest_id, _ = await store.open(None, None)
+        assert await store.delete(guest_id, None)
+        await store.close()
+
+    asyncio.run(scenario(""))
+    asyncio.run(scenario(f"sqlite:///{tmp_path}/sessions.db"))
+
+
+def test_delete_route_uses_the_token_not_the_body(monkeypatch):
+    from routers import akito
+
+    store = ChatSessionStore(url="")
+    monkeypatch.setattr(akito, "chat_sessions", store)
+    monkeypatch.setattr(auth, "AUTH_JWT_SECRET", SECRET)
+    app = FastAPI()
+    app.include_router(akito.router)
+
+    async def scenario():
+        session_id, _ = await store.open(None, "alice")
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            url = f"/api/akito/sessions/{session_id}"
+            anonymous = await client.delete(url)
+            foreign = await client.delete(url, headers={"Authorization": f"Bearer {token_for('mallory')}"})
+            owner = await client.delete(url, headers={"Authorization": f"Bearer {token_for('alice')}"})
+        return anonymous, foreign, owner
+
+    anonymous, foreign, owner = asyncio.run(scenario())
+    assert anonymous.status_code == 404
+    assert foreign.status_code == 404
+    assert owner.status_code == 200
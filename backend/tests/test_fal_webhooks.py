@@ -0,0 +1,166 @@
+import asyncio
+import os
+import re
+import socket
+import subprocess
+import sys
+
+import fal_client
+import httpx
+import pytest
+from fastapi import FastAPI
+
+from services.fal_webhooks import FalWebhookError, FalWebhooks
+from services.job_queue import JobQueue
+
+FAL_RESULT = {"video": {"url": "https://fal.media/real.mp4"}, "seed": 7}
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class FakeHandle:
+    """Stands in for fal_client.AsyncRequestHandle: a status sequence, then the result"""
+
+    def __init__(self, statuses, result=FAL_RESULT):
+        self.request_id = "req-1"
+        self.statuses = list(statuses)
+        self.result = result
+        self.status_calls = 0
+
+    async def status(self, with_logs: bool = False):
+        self.status_calls += 1
+        return self.statuses.pop(0) if len(self.statuses) > 1 else self.statuses[0]
+
+    async def get(self):
+        return self.result
+
+
+def in_progress():
+    return fal_client.InProgress(logs=None)
+
+
+def completed(error=None):
+    return fal_client.Completed(logs=None, metrics={}, error=error)
+
+
+def test_signature_is_bound_to_the_job_id():
+    webhooks = FalWebhooks(base_url="https://api.example", secret="s3cret")
+    signature = webhooks.sign("job-a")
+    assert webhooks.verify("job-a", signature)
+    assert not webhooks.verify("job-b", signature)
+    assert not webhooks.verify("job-a", "")
+    assert webhooks.counters["rejected_signatures"] == 2
+
+
+def test_result_comes_from_fal_not_from_the_webhook():
+    async def scenario():
+        webhooks = FalWebhooks(base_url="https://api.example", secret="s3cret", recheck_seconds=30)
+        handle = FakeHandle([in_progress(), completed()])
+        future = webhooks.expect("job-1")
+        waiting = asyncio.create_task(webhooks.wait("job-1", future, handle))
+
+        # A forged wake-up while FAL is still running doesn't finish the job
+        await asyncio.sleep(0)
+        assert webhooks.resolve("job-1")
+        await asyncio.sleep(0.01)
+        assert not waiting.done()
+        assert webhooks.counters["spurious"] == 1
+
+        # The real one does, with the result read from FAL
+        assert webhooks.resolve("job-1")
+        result = await asyncio.wait_for(waiting, timeout=1)
+        return webhooks, handle, result
+
+    webhooks, handle, result = asyncio.run(scenario())
+    assert result == FAL_RESULT
+    assert handle.status_calls == 2
+    assert webhooks.stats()["waiting"] == 0
+
+
+def test_failed_request_raises():
+    async def scenario():
+        webhooks = FalWebhooks(base_url="https://api.example", secret="s3cret", recheck_seconds=30)
+        future = webhooks.expect("job-1")
+        waiting = asyncio.create_task(webhooks.wait("job-1", future, FakeHandle([completed(error="NSFW")])))
+        await asyncio.sleep(0)
+        webhooks.resolve("job-1")
+        await waiting
+
+    with pytest.raises(FalWebhookError, match="NSFW"):
+        asyncio.run(scenario())
+
+
+def test_lost_webhook_is_recovered_by_the_status_recheck():
+    async def scenario():
+        webhooks = FalWebhooks(base_url="https://api.example", secret="s3cret", recheck_seconds=0.01)
+        future = webhooks.expect("job-1")
+        result = await webhooks.wait("job-1", future, FakeHandle([in_progress(), completed()]))
+        return webhooks, result
+
+    webhooks, result = asyncio.run(scenario())
+    assert result == FAL_RESULT
+    assert webhooks.counters["recovered_by_poll"] == 1
+
+
+def test_webhook_route_parks_a_wakeup_on_the_durable_row(tmp_path, monkeypatch):
+    from routers import generate
+
+    queue = JobQueue(url=f"sqlite:///{tmp_path}/jobs.db")
+    webhooks = FalWebhooks(base_url="https://api.example", secret="s3cret")
+    monkeypatch.setattr(generate, "fal_webhooks", webhooks)
+    monkeypatch.setattr(generate, "job_queue", queue)
+    monkeypatch.setattr(generate.generation_jobs, "queue", queue)
+    app = FastAPI()
+    app.include_router(generate.router)
+
+    async def scenario():
+        await queue.start()
+        await queue.enqueue({
+            "id": "job-1", "kind": "video", "model_id": "kling-pro", "fal_model_id": "fal-ai/kling",
+            "arguments": {}, "status": "queued", "logs": [],
+        })
+        forged = {"request_id": "req-1", "status": "OK", "payload": {"video": {"url": "https://evil.example/x.mp4"}}}
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            def post(job_id, signature):
+                return client.post(
+                    "/api/generate/webhooks/fal", params={"job_id": job_id, "signature": signature}, json=forged
+                )
+
+            bad_signature = await post("job-1", webhooks.sign("job-2"))
+            accepted = await post("job-1", webhooks.sign("job-1"))
+            unknown = await post("job-2", webhooks.sign("job-2"))
+        row = await queue.fetch("job-1")
+        await queue.close()
+        return bad_signature, accepted, unknown, row
+
+    bad_signature, accepted, unknown, row = asyncio.run(scenario())
+    assert bad_signature.status_code == 403
+    assert accepted.status_code == 200
+    assert unknown.status_code == 404
+    # Only the wake-up is stored: the worker never sees the posted payload
+    assert row["webhook_body"]["request_id"] == "req-1"
+    assert "payload" not in row["webhook_body"]
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def test_roundtrip_against_the_fake_fal_server():
+    # A separate process: the round trip configures the queue and webhooks through the environment
+    env = {**os.environ, "PYDANTIC_AI_NO_BANNER": "1"}
+    for name in ("JOB_LEASE_SECONDS", "JOB_WORKER_WEBHOOK_POLL_SECONDS"):
+        env.pop(name, None)
+    completed_run = subprocess.run(
+        [
+            sys.executable, os.path.join(BACKEND_DIR, "scripts", "fake_fal_server.py"), "--roundtrip",
+            "--latency", "0.5", "--port", str(free_port()), "--backend-port", str(free_port()),
+        ],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True, timeout=120,
+    )
+    assert completed_run.returncode == 0, completed_run.stdout + completed_run.stderr
+    elapsed = float(re.search(r"Job completed in ([\d.]+)s", completed_run.stdout).group(1))
+    # With the default 60 s lease the worker heartbeats every 20 s; the webhook must not wait for that
+    assert elapsed < 5
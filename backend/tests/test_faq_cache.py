@@ -0,0 +1,134 @@
+import asyncio
+
+import pytest
+
+from services.faq_cache import DEFAULT_FAQ_QUESTIONS, FaqCache, normalize_question
+
+
+@pytest.fixture
+def cache():
+    return FaqCache(enabled=True, answers_file=None)
+
+
+def test_normalize_question_folds_case_accents_and_punctuation():
+    assert normalize_question("  ¿Cómo   me REGISTRO? ") == "como me registro"
+
+
+@pytest.mark.parametrize("message, key", [
+    ("¿Cómo me registro?", "signup"),
+    ("What plans are available?", "plans_en"),
+    ("WHAT IS PICTUREME.NOW", "about_en"),
+])
+def test_known_phrasings_match_exactly(cache, message, key):
+    assert cache.match(message) == (key, True)
+
+
+@pytest.mark.parametrize("message, key", [
+    ("que planes tienen disponibles", "plans"),
+    ("How do I sign up, please?", "signup_en"),
+    ("pricing and plans", "plans_en"),
+    ("como creo mi cuenta", "signup"),
+    ("pictureme, que es?", "about"),
+    ("what is picture me", "about_en"),
+])
+def test_rephrasings_match_by_keywords(cache, message, key):
+    assert cache.match(message) == (key, False)
+
+
+@pytest.mark.parametrize("message", [
+    # Different key noun or verb
+    "How do I sign out?",
+    "How do I sign in?",
+    "como me retiro",
+    "¿Cuáles son los planetas?",
+    # Negations
+    "What plans are not available?",
+    "¿Qué planes no están disponibles?",
+    "how do i use it without an account",
+    # Extra content the canned answer doesn't cover
+    "what plans do you have for weddings",
+    "How do I delete my account?",
+    # Nothing to go on
+    "hola",
+    "",
+])
+def test_near_misses_go_to_the_model(cache, message):
+    assert cache.match(message) == (None, False)
+
+
+def fake_model(answers=None):
+    """Generator stand-in that records the questions it was asked"""
+    asked = []
+
+    async def generate(question):
+        asked.append(question)
+        return (answers or {}).get(question, f"answer to {question}")
+
+    generate.asked = asked
+    return generate
+
+
+def test_answers_are_pre_generated_with_no_request_input():
+    generate = fake_model()
+    cache = FaqCache(enabled=True, answers_file=None, generate=generate)
+    assert cache.get("¿Cómo me registro?") is None
+    assert cache.counters["not_ready"] == 1
+
+    assert asyncio.run(cache.refresh())
+    # Only the canonical questions are ever sent to the model
+    assert generate.asked == [entry["question"] for entry in DEFAULT_FAQ_QUESTIONS.values()]
+    assert cache.get("como creo una cuenta") == "answer to ¿Cómo me registro?"
+    assert not hasattr(cache, "remember")
+
+
+def test_refresh_regenerates_only_due_answers_and_keeps_failures(monkeypatch):
+    cache = FaqCache(enabled=True, answers_file=None, generate=fake_model())
+    asyncio.run(cache.refresh())
+
+    failing = fake_model({"How do I sign up?": None})
+    cache.generate = failing
+    assert asyncio.run(cache.refresh())
+    assert failing.asked == []
+
+    monkeypatch.setattr(cache, "refresh_seconds", 0)
+    assert not asyncio.run(cache.refresh())
+    assert cache.counters["refresh_failures"] == 1
+    # The previous answer is served until a refresh succeeds
+    assert cache.get("How do I sign up?") == "answer to How do I sign up?"
+
+
+def test_workers_share_answers_through_the_file(tmp_path):
+    answers_file = str(tmp_path / "faq_answers.json")
+    first = FaqCache(enabled=True, answers_file=answers_file, generate=fake_model())
+    asyncio.run(first.refresh())
+
+    second_model = fake_model()
+    second = FaqCache(enabled=True, answers_file=answers_file, generate=second_model)
+    assert asyncio.run(second.refresh())
+    assert second_model.asked == []
+    assert second.get("What plans are available?") == "answer to What plans are available?"
+    assert second.counters["loaded"] == len(DEFAULT_FAQ_QUESTIONS)
+
+
+def test_workers_starting_together_generate_once(tmp_path):
+    answers_file = str(tmp_path / "faq_answers.json")
+    models = [fake_model() for _ in range(3)]
+    caches = [FaqCache(enabled=True, answers_file=answers_file, generate=model) for model in models]
+
+    async def start_together():
+        return await asyncio.gather(*[cache.refresh() for cache in caches])
+
+    assert all(asyncio.run(start_together()))
+    assert sum(len(model.asked) for model in models) == len(DEFAULT_FAQ_QUESTIONS)
+    assert all(cache.stats()["answers_ready"] == len(DEFAULT_FAQ_QUESTIONS) for cache in caches)
+
+
+def test_an_edited_question_gets_a_new_answer(tmp_path):
+    answers_file = str(tmp_path / "faq_answers.json")
+    asyncio.run(FaqCache(enabled=True, answers_file=answers_file, generate=fake_model()).refresh())
+
+    questions = {**DEFAULT_FAQ_QUESTIONS, "signup_en": {**DEFAULT_FAQ_QUESTIONS["signup_en"], "question": "How do I join?"}}
+    generate = fake_model()
+    cache = FaqCache(questions=questions, enabled=True, answers_file=answers_file, generate=generate)
+    asyncio.run(cache.refresh())
+    assert generate.asked == ["How do I join?"]
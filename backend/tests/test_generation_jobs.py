@@ -0,0 +1,56 @@
+from services.generation_jobs import MAX_LOG_LINES, GenerationJob
+
+
+def make_job() -> GenerationJob:
+    return GenerationJob(id="job", kind="video", model_id="kling-pro", fal_model_id="fal-ai/kling")
+
+
+def logs(*messages):
+    return [{"message": message} for message in messages]
+
+
+def test_append_logs_keeps_only_new_lines():
+    job = make_job()
+    # FAL sends the whole log list with every status
+    job.append_logs(logs("a", "b"))
+    job.append_logs(logs("a", "b", "c"))
+    job.append_logs(logs("a", "b", "c"))
+    assert job.logs == ["a", "b", "c"]
+
+
+def test_append_logs_bumps_the_version_only_on_change():
+    job = make_job()
+    job.append_logs(logs("a"))
+    version = job.version
+    job.append_logs(logs("a"))
+    job.append_logs([])
+    job.append_logs(None)
+    job.append_logs([{"message": ""}])
+    assert job.version == version
+
+
+def test_append_logs_has_no_duplicates_past_the_cap():
+    job = make_job()
+    messages = [f"line {i}" for i in range(MAX_LOG_LINES + 50)]
+    job.append_logs(logs(*messages))
+    job.append_logs(logs(*messages, "last"))
+    assert len(job.logs) == MAX_LOG_LINES
+    assert job.logs[-2:] == [messages[-1], "last"]
+    assert len(set(job.logs)) == MAX_LOG_LINES
+
+
+def test_a_shorter_log_list_starts_over():
+    job = make_job()
+    job.append_logs(logs("a", "b", "c"))
+    # A retried FAL request reports its own, shorter log
+    job.append_logs(logs("retry 1"))
+    assert job.logs == ["a", "b", "c", "retry 1"]
+
+
+def test_from_row_resumes_after_the_stored_logs():
+    job = make_job()
+    job.append_logs(logs("a", "b"))
+    row = {**job.to_row(), **job.state(), "created_at": 0, "updated_at": 0, "version": 1, "attempts": 1}
+    resumed = GenerationJob.from_row(row)
+    resumed.append_logs(logs("a", "b", "c"))
+    assert resumed.logs == ["a", "b", "c"]
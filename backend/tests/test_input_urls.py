@@ -0,0 +1,79 @@
+import asyncio
+
+import pytest
+
+import services.generation_cache as generation_cache_module
+import services.image_prep as image_prep_module
+from services.generation_cache import GenerationCache
+from services.image_prep import ImagePreparer
+from services.input_urls import is_trusted_image_url
+from services.storage import public_url
+
+
+@pytest.mark.parametrize("url", [
+    public_url("temp/abc.png"),
+    "https://v3.fal.media/files/rabbit/abc.png",
+    "https://fal.media/files/abc.png",
+])
+def test_bucket_and_fal_urls_are_trusted(url):
+    assert is_trusted_image_url(url)
+
+
+@pytest.mark.parametrize("url", [
+    "http://169.254.169.254/latest/meta-data/",
+    "http://localhost:8000/health",
+    "http://v3.fal.media/files/abc.png",
+    "https://v3.fal.media:8443/files/abc.png",
+    "https://user@v3.fal.media/files/abc.png",
+    "https://fal.media.attacker.example/abc.png",
+    "https://evilfal.media/abc.png",
+    public_url("temp/../../other-bucket/secret"),
+    "file:///etc/passwd",
+    None,
+])
+def test_other_urls_are_not_fetched(url):
+    assert not is_trusted_image_url(url)
+
+
+def test_foreign_images_skip_the_cache_without_a_fetch(monkeypatch):
+    async def fail(url, *args):
+        raise AssertionError("fetched an untrusted URL")
+        yield b""
+
+    monkeypatch.setattr(generation_cache_module, "stream_image", fail)
+    cache = GenerationCache(disk_dir=None)
+    assert asyncio.run(cache.image_digest("http://10.0.0.5/admin.png")) is None
+    assert cache.counters["untrusted_images"] == 1
+
+
+def test_image_digests_expire(monkeypatch):
+    fetches = []
+
+    async def stream(url, *args):
+        fetches.append(url)
+        yield f"body {len(fetches)}".encode()
+
+    monkeypatch.setattr(generation_cache_module, "stream_image", stream)
+    cache = GenerationCache(disk_dir=None)
+    url = "https://v3.fal.media/files/template.png"
+    first = asyncio.run(cache.image_digest(url))
+    assert asyncio.run(cache.image_digest(url)) == first
+    assert len(fetches) == 1
+
+    monkeypatch.setattr(generation_cache_module, "IMAGE_DIGEST_TTL_SECONDS", 0)
+    cache._image_digests.clear()
+    asyncio.run(cache.image_digest(url))
+    assert asyncio.run(cache.image_digest(url)) != first
+    assert len(fetches) == 3
+
+
+def test_foreign_images_are_not_prepared(monkeypatch):
+    async def fail(url, *args):
+        raise AssertionError("fetched an untrusted URL")
+        yield b""
+
+    monkeypatch.setattr(image_prep_module, "stream_image", fail)
+    preparer = ImagePreparer(enabled=True)
+    url = "http://metadata.internal/photo.png"
+    assert asyncio.run(preparer.prepare_url(url)) == url
+    assert preparer.counters["untrusted"] == 1 and preparer.counters["failures"] == 0
@@ -0,0 +1,149 @@
+import asyncio
+import time
+
+import pytest
+
+from services.job_queue import JobQueue, LeaseLost, PriorityScheduler
+
+CLASSES = {"event": {"weight": 3, "plans": ["business_eventpro"]}, "standard": {"weight": 1}}
+
+
+def row(job_id, priority_class="standard", age=0.0):
+    now = time.time()
+    return {
+        "id": job_id, "kind": "video", "model_id": "kling-pro", "fal_model_id": "fal-ai/kling",
+        "arguments": {}, "status": "queued", "logs": [], "priority_class": priority_class,
+        "attempts": 0, "version": 0, "created_at": now - age, "updated_at": now,
+    }
+
+
+def run_with_queue(tmp_path, scenario, **options):
+    async def wrapper():
+        queue = JobQueue(url=f"sqlite:///{tmp_path}/jobs.db", scheduler=PriorityScheduler(CLASSES), **options)
+        await queue.start()
+        try:
+            return await scenario(queue)
+        finally:
+            await queue.close()
+
+    return asyncio.run(wrapper())
+
+
+def test_stride_order_shares_claims_by_weight():
+    scheduler = PriorityScheduler(CLASSES)
+    picks = []
+    for _ in range(8):
+        name = scheduler.order()[0]
+        scheduler.charge(name)
+        picks.append(name)
+    assert picks.count("event") == 6 and picks.count("standard") == 2
+
+
+def test_an_idle_class_does_not_bank_credit():
+    scheduler = PriorityScheduler(CLASSES)
+    for _ in range(30):
+        scheduler.charge("event")
+    # standard sat idle: it restarts at the current virtual time, not at zero
+    picks = []
+    for _ in range(4):
+        name = scheduler.order()[0]
+        scheduler.charge(name)
+        picks.append(name)
+    assert picks.count("standard") <= 2
+
+
+def test_plans_map_to_classes():
+    scheduler = PriorityScheduler(CLASSES)
+    assert scheduler.class_for_plan("business_eventpro") == "event"
+    assert scheduler.class_for_plan("free") == "standard"
+    assert scheduler.class_for_plan(None) == "standard"
+
+
+def test_claims_follow_the_class_weights(tmp_path):
+    async def scenario(queue):
+        for i in range(4):
+            await queue.enqueue(row(f"e{i}", "event"))
+            await queue.enqueue(row(f"s{i}", "standard"))
+        return [(await queue.claim("w"))["id"] for _ in range(8)]
+
+    claimed = run_with_queue(tmp_path, scenario, starvation_seconds=3600)
+    assert claimed[:4].count("s0") == 1
+    assert sorted(claimed) == sorted([f"e{i}" for i in range(4)] + [f"s{i}" for i in range(4)])
+
+
+def test_starved_classes_go_first_but_still_share_by_weight(tmp_path):
+    async def scenario(queue):
+        for i in range(3):
+            await queue.backend.insert(row(f"s{i}", "standard", age=300 - i))
+            await queue.backend.insert(row(f"e{i}", "event", age=200 - i))
+        await queue.backend.insert(row("fresh", "event"))
+        claimed = [(await queue.claim("w"))["id"] for _ in range(7)]
+        return claimed, dict(queue.starved_claims)
+
+    claimed, starved = run_with_queue(tmp_path, scenario, starvation_seconds=60)
+    # Every starved job is claimed before the fresh one, in weighted turns
+    assert claimed[-1] == "fresh"
+    assert claimed[:4] == ["e0", "s0", "e1", "e2"]
+    assert starved == {"event": 3, "standard": 3}
+
+
+def test_per_class_starvation_threshold(tmp_path):
+    classes = {"event": {"weight": 3, "starvation_seconds": 10}, "standard": {"weight": 1}}
+
+    async def scenario():
+        queue = JobQueue(url=f"sqlite:///{tmp_path}/jobs.db", scheduler=PriorityScheduler(classes), starvation_seconds=600)
+        await queue.start()
+        assert queue.starvation_seconds_for("event") == 10
+        assert queue.starvation_seconds_for("standard") == 600
+        await queue.close()
+
+    asyncio.run(scenario())
+
+
+def test_lease_is_exclusive_until_it_runs_out(tmp_path):
+    async def scenario(queue):
+        await queue.enqueue(row("job"))
+        first = await queue.claim("w1")
+        assert await queue.claim("w2") is None
+
+        saved = await queue.save("job", "w1", {"status": "in_progress", "logs": ["x"]})
+        assert saved["version"] == 1 and saved["logs"] == ["x"]
+
+        # Let the lease lapse: another worker takes over and the first one is locked out
+        await queue.backend.update("job", {"locked_until": time.time() - 1})
+        second = await queue.claim("w2")
+        with pytest.raises(LeaseLost):
+            await queue.save("job", "w1")
+        return first, second
+
+    first, second = run_with_queue(tmp_path, scenario)
+    assert first["attempts"] == 1
+    assert second["id"] == "job" and second["attempts"] == 2
+
+
+def test_release_hands_the_job_back(tmp_path):
+    async def scenario(queue):
+        await queue.enqueue(row("job"))
+        await queue.claim("w1")
+        await queue.release("job", "w1")
+        again = await queue.claim("w2")
+        await queue.release("job", "w2", delay_seconds=60)
+        delayed = await queue.claim("w3")
+        return again, delayed
+
+    again, delayed = run_with_queue(tmp_path, scenario)
+    # A released claim is refunded, so it doesn't count towards JOB_MAX_ATTEMPTS
+    assert again["attempts"] == 1
+    assert delayed is None
+
+
+def test_finished_jobs_are_not_claimed(tmp_path):
+    async def scenario(queue):
+        await queue.enqueue(row("job"))
+        await queue.claim("w1")
+        finished = await queue.save("job", "w1", {"status": "completed", "result": {"ok": True}})
+        return finished, await queue.claim("w2")
+
+    finished, claimed = run_with_queue(tmp_path, scenario)
+    assert finished["locked_until"] is None
+    assert claimed is None
@@ -0,0 +1,28 @@
+import json
+
+from services.metrics import Histogram
+
+
+def test_quantile_is_the_upper_bound_of_its_bucket():
+    histogram = Histogram((1, 10, 100))
+    for value in (0.5, 0.5, 5, 50):
+        histogram.observe(value)
+    assert histogram.quantile(0.5) == 1
+    assert histogram.quantile(0.75) == 10
+    assert histogram.quantile(1.0) == 100
+
+
+def test_overflow_quantiles_are_none_and_the_snapshot_stays_json_safe():
+    histogram = Histogram((1, 10))
+    for value in (0.5, 20, 30, 40):
+        histogram.observe(value)
+    snapshot = histogram.snapshot()
+    assert snapshot["p50"] is None and snapshot["p95"] is None
+    assert snapshot["buckets"]["+Inf"] == 4
+    json.dumps(snapshot, allow_nan=False)
+
+
+def test_default_buckets_cover_the_video_timeout():
+    histogram = Histogram()
+    histogram.observe(850)
+    assert histogram.quantile(0.95) == 900
@@ -0,0 +1,55 @@
+from services.model_registry import (
+    EDIT, IMAGE_TO_VIDEO, TEXT_TO_IMAGE, VIDEO_TO_VIDEO, ModelRegistry, model_registry,
+)
+
+
+def test_registered_ids_resolve_to_their_spec():
+    spec = model_registry.resolve("kling-pro", "video")
+    assert spec.registered
+    assert spec.endpoint == "fal-ai/kling-video/v2.5-turbo/pro/image-to-video"
+    assert spec.supports(IMAGE_TO_VIDEO)
+
+
+def test_lookup_is_per_kind():
+    # An image id asked for as a video is a raw endpoint, not the image spec
+    spec = model_registry.resolve("flux-dev", "video")
+    assert not spec.registered
+    assert spec.endpoint == "flux-dev"
+
+
+def test_nano_banana_ids_resolve_to_the_aliases():
+    assert model_registry.resolve("fal-ai/nano-banana/edit", "image").id == "nano-banana"
+    assert model_registry.resolve("fal-ai/nano-banana-pro/edit", "image").id == "nano-banana-pro"
+    assert model_registry.resolve("nano-banana", "image").endpoint == "fal-ai/flux/dev"
+
+
+def test_unknown_ids_are_inferred_from_the_endpoint():
+    assert model_registry.resolve("fal-ai/some-model/edit", "image").capabilities == (EDIT,)
+    assert model_registry.resolve("fal-ai/some-model", "image").capabilities == (TEXT_TO_IMAGE,)
+    assert model_registry.resolve("fal-ai/x/video-to-video", "video").capabilities == (VIDEO_TO_VIDEO,)
+    assert model_registry.resolve("fal-ai/x/image-to-video", "video").capabilities == (IMAGE_TO_VIDEO,)
+
+
+def test_transform_arguments_applies_defaults_renames_and_drops():
+    registry = ModelRegistry([{
+        "id": "custom",
+        "endpoint": "fal-ai/custom",
+        "kind": "image",
+        "default_arguments": {"steps": 20, "size": "square"},
+        "rename_arguments": {"size": "image_size"},
+        "drop_arguments": ["seed"],
+    }])
+    spec = registry.resolve("custom", "image")
+    assert spec.transform_arguments({"prompt": "x", "seed": 1, "steps": 30}) == {
+        "prompt": "x", "steps": 30, "image_size": "square",
+    }
+
+
+def test_fallbacks_and_endpoint_limits():
+    registry = ModelRegistry([
+        {"id": "a", "endpoint": "fal-ai/shared", "kind": "video", "concurrency": 4, "fallbacks": ["b"]},
+        {"id": "b", "endpoint": "fal-ai/shared", "kind": "video", "concurrency": 2, "queue_size": 10},
+    ])
+    assert [spec.id for spec in registry.fallback_specs(registry.resolve("a", "video"))] == ["b"]
+    assert registry.limits_for_endpoint("fal-ai/shared") == {"concurrency": 2, "queue": 10}
+    assert registry.limits_for_endpoint("fal-ai/other") == {}
@@ -0,0 +1,79 @@
+import asyncio
+
+import pytest
+
+from services.single_flight import SingleFlight
+
+
+def test_concurrent_calls_share_one_execution():
+    async def scenario():
+        flights = SingleFlight()
+        calls = 0
+
+        async def fetch():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            return "result"
+
+        results = await asyncio.gather(*[flights.do("key", fetch) for _ in range(5)])
+        return flights, calls, results
+
+    flights, calls, results = asyncio.run(scenario())
+    assert calls == 1
+    assert results == ["result"] * 5
+    assert flights.stats() == {"calls": 5, "executions": 1, "coalesced": 4, "in_flight": 0}
+
+
+def test_different_keys_and_later_calls_run_again():
+    async def scenario():
+        flights = SingleFlight()
+        calls = []
+
+        async def fetch(key):
+            calls.append(key)
+            return key
+
+        await asyncio.gather(flights.do("a", lambda: fetch("a")), flights.do("b", lambda: fetch("b")))
+        await flights.do("a", lambda: fetch("a"))
+        return calls
+
+    assert asyncio.run(scenario()) == ["a", "b", "a"]
+
+
+def test_errors_reach_every_waiter_and_are_not_cached():
+    async def scenario():
+        flights = SingleFlight()
+
+        async def fail():
+            await asyncio.sleep(0.01)
+            raise ValueError("boom")
+
+        results = await asyncio.gather(*[flights.do("key", fail) for _ in range(3)], return_exceptions=True)
+        assert all(isinstance(result, ValueError) for result in results)
+        assert not flights.is_in_flight("key")
+        return await flights.do("key", lambda: asyncio.sleep(0, result="ok"))
+
+    assert asyncio.run(scenario()) == "ok"
+
+
+def test_a_cancelled_waiter_does_not_cancel_the_call():
+    async def scenario():
+        flights = SingleFlight()
+        release = asyncio.Event()
+
+        async def slow():
+            await release.wait()
+            return "done"
+
+        first = asyncio.create_task(flights.do("key", slow))
+        second = asyncio.create_task(flights.do("key", slow))
+        await asyncio.sleep(0)
+        assert flights.is_in_flight("key")
+        first.cancel()
+        release.set()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second
+
+    assert asyncio.run(scenario()) == "done"
@@ -30,6 +30,30 @@ import { ENV } from "@/config/env";
 import { getThumbnailUrl, getViewUrl as getOptimizedUrl, getDownloadUrl, getVideoUrl, getProxyDownloadUrl } from "@/services/cdn";
 import { useUserTier } from "@/services/userTier";
 
+// Background video jobs: poll interval and how long to wait before giving up
+const JOB_POLL_INTERVAL_MS = 3000;
+const JOB_POLL_TIMEOUT_MS = 15 * 60 * 1000;
+// Images are copied to our bucket after the response; how long to wait for the copy
+const REHOST_POLL_INTERVAL_MS = 2000;
+const REHOST_POLL_ATTEMPTS = 10;
+
+// Durable bucket URL for a FAL image once the backend's background copy is stored
+async function waitForDurableUrl(falUrl: string): Promise<string | null> {
+    for (let attempt = 0; attempt < REHOST_POLL_ATTEMPTS; attempt++) {
+        await new Promise(resolve => setTimeout(resolve, REHOST_POLL_INTERVAL_MS));
+        try {
+            const res = await fetch(`${ENV.API_URL}/api/generate/rehosted?url=${encodeURIComponent(falUrl)}`);
+            if (!res.ok) return null;
+            const { status, durable_url } = await res.json();
+            if (status === 'stored') return durable_url;
+            if (status === 'missing') return null;
+        } catch {
+            return null;
+        }
+    }
+    return null;
+}
+
 // AI Models Data
 const MODELS = [
     // Video Models
@@ -237,9 +261,30 @@ export default function StudioTab({ currentUser }: StudioTabProps) {
                 throw new Error(error.detail || "Generation failed");
             }
 
-            const data = await response.json();
+            let data = await response.json();
+
+            // Video generation runs as a background job; poll until it finishes
+            if (data.job_id) {
+                const pollDeadline = Date.now() + JOB_POLL_TIMEOUT_MS;
+                while (true) {
+                    if (Date.now() > pollDeadline) {
+                        throw new Error("Generation timed out, please try again");
+                    }
+                    await new Promise(resolve => setTimeout(resolve, JOB_POLL_INTERVAL_MS));
+                    const statusRes = await fetch(`${ENV.API_URL}${data.status_url}`);
+                    if (!statusRes.ok) throw new Error("Failed to fetch generation status");
+                    const job = await statusRes.json();
+                    if (job.status === 'failed') throw new Error(job.error || "Generation failed");
+                    if (job.status === 'completed') {
+                        data = job.result;
+                        break;
+                    }
+                }
+            }
+
             const newItem: HistoryItem = {
-                url: data.image_url || data.video_url,
+                // Prefer the copy in our bucket, FAL CDN links expire
+                url: data.durable_image_url || data.image_url || data.durable_video_url || data.video_url,
                 type: data.image_url ? 'image' : 'video',
                 timestamp: Date.now(),
                 prompt: prompt,
@@ -249,6 +294,16 @@ export default function StudioTab({ currentUser }: StudioTabProps) {
             setHistory(prev => [newItem, ...prev]);
             toast.success("Generation successful!");
 
+            // FAL CDN links expire: swap in the bucket copy once it exists
+            if (newItem.type === 'image' && !data.durable_image_url && data.image_url) {
+                waitForDurableUrl(data.image_url).then(durableUrl => {
+                    if (!durableUrl) return;
+                    setHistory(prev => prev.map(item =>
+                        item.timestamp === newItem.timestamp ? { ...item, url: durableUrl } : item
+                    ));
+                });
+            }
+
         } catch (error) {
             console.error(error);
             toast.error(error instanceof Error ? error.message : "Failed to generate");